@@ -1 +1,52 @@
 # adapters package
+from __future__ import annotations
+
+from importlib import import_module
+from importlib.util import find_spec
+from typing import Any
+
+from sources import CATALOG_ADAPTERS, MODEL_SOURCES, NEWS_SOURCES
+
+# Catalog adapters resolved so far, by name. Names declared under [adapters] in
+# sources.toml are imported on first use; plugins loaded some other way can
+# register an adapter object directly.
+_RESOLVED: dict[str, Any] = {}
+
+
+def register_catalog_adapter(name: str, adapter: Any) -> None:
+    _RESOLVED[name] = adapter
+
+
+def catalog_adapter(name: str) -> Any:
+    if name not in _RESOLVED:
+        target = CATALOG_ADAPTERS.get(name)
+        if target is None:
+            raise ValueError(f"Unknown catalog adapter: {name}")
+        module, _, attribute = target.partition(":")
+        adapter = getattr(import_module(module), attribute, None)
+        if adapter is None:
+            raise ValueError(f"Catalog adapter {name}: {module} has no attribute {attribute}")
+        _RESOLVED[name] = adapter
+    return _RESOLVED[name]
+
+
+def check_catalog_adapters() -> None:
+    # Startup check that every declared plugin module exists, without importing
+    # it (and its dependencies) before a source actually needs it.
+    for name, target in CATALOG_ADAPTERS.items():
+        module = target.partition(":")[0]
+        try:
+            found = find_spec(module) is not None
+        except ModuleNotFoundError:
+            found = False
+        if not found:
+            raise ValueError(f"Catalog adapter {name}: module {module} not found")
+
+
+def check_parser_backends() -> None:
+    # Startup check for `parser` backends other than the stdlib one: lxml and
+    # html5lib are optional packages, so a source naming one fails here rather
+    # than on its first page.
+    for source in (*MODEL_SOURCES, *NEWS_SOURCES):
+        if source.parser != "html.parser" and find_spec(source.parser) is None:
+            raise ValueError(f"Source {source.key}: parser {source.parser} needs the {source.parser} package installed")
@@ -1,13 +1,16 @@
 from __future__ import annotations
 
-from dataclasses import asdict
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
 from typing import Any
 
-from bs4 import BeautifulSoup
-
-from http_client import fetch_json, fetch_text
-from sources import Source
-from transform import dedupe_models_by_provider_name
+import profiling
+from adapters import catalog_adapter
+from http_client import PageLimitReached, fetch_text, iter_json_items
+from snapshots import CatalogSnapshot
+from sources import MODEL_CATALOG_MAX_PAGES, Source
+from transform import normalize_model_name
 from records import ModelRecord
 
 SCENARIO_MAP = {
@@ -38,82 +41,85 @@ def _safe_float(value: Any) -> float | None:
         return None
 
 
-def _openrouter(source: Source, limit: int) -> list[ModelRecord]:
-    endpoint = source.fallback or source.url
-    payload = fetch_json(endpoint)
-    rows = payload.get("data") if isinstance(payload, dict) else payload
-    if not isinstance(rows, list):
-        return []
+def _openrouter_record(source: Source, item: Any) -> ModelRecord | None:
+    if not isinstance(item, dict):
+        return None
+    name = item.get("name") or item.get("id")
+    if not name:
+        return None
+    pricing = item.get("pricing") or {}
+    arch = item.get("architecture") or {}
+    scenarios = []
+    modality = arch.get("modality")
+    if modality:
+        scenarios.append("多模态" if "image" in str(modality).lower() else "内容生成")
+
+    return ModelRecord(
+        name=str(name),
+        provider="OpenRouter",
+        description=str(item.get("description") or ""),
+        cost_input=_safe_float(pricing.get("prompt")),
+        cost_output=_safe_float(pricing.get("completion")),
+        docs_url=str(item.get("id") or ""),
+        business_scenarios=scenarios,
+        source_url=f"https://openrouter.ai/models/{item.get('id')}" if item.get("id") else source.url,
+    )
+
+
+def _huggingface_record(source: Source, item: Any) -> ModelRecord | None:
+    if not isinstance(item, dict):
+        return None
+    model_id = item.get("id")
+    if not model_id:
+        return None
+    pipeline_tag = str(item.get("pipeline_tag") or "").lower()
+    scenario = SCENARIO_MAP.get(pipeline_tag, "内容生成")
+    return ModelRecord(
+        name=str(model_id),
+        provider="HuggingFace",
+        description=f"pipeline={pipeline_tag or 'unknown'}",
+        business_scenarios=[scenario],
+        source_url=f"https://huggingface.co/{model_id}",
+    )
+
+
+def _litellm_record(source: Source, item: Any) -> ModelRecord | None:
+    name = str(item or "").strip()
+    if not name:
+        return None
+    return ModelRecord(
+        name=name,
+        provider="LiteLLM",
+        description="LiteLLM provider/model catalog entry",
+        business_scenarios=["自动化工作流"],
+        source_url=source.url,
+    )
+
 
-    records: list[ModelRecord] = []
-    for item in rows[: limit * 2]:
-        name = item.get("name") or item.get("id")
-        if not name:
-            continue
-        pricing = item.get("pricing") or {}
-        arch = item.get("architecture") or {}
-        scenarios = []
-        modality = arch.get("modality")
-        if modality:
-            scenarios.append("多模态" if "image" in str(modality).lower() else "内容生成")
-
-        records.append(
-            ModelRecord(
-                name=str(name),
-                provider="OpenRouter",
-                description=str(item.get("description") or ""),
-                cost_input=_safe_float(pricing.get("prompt")),
-                cost_output=_safe_float(pricing.get("completion")),
-                docs_url=str(item.get("id") or ""),
-                business_scenarios=scenarios,
-                source_url=f"https://openrouter.ai/models/{item.get('id')}"
-                if item.get("id")
-                else source.url,
-            )
-        )
-
-    return records[:limit]
-
-
-def _huggingface(source: Source, limit: int) -> list[ModelRecord]:
-    endpoint = source.fallback or source.url
-    rows = fetch_json(endpoint)
-    if not isinstance(rows, list):
-        return []
+def _openrouter_items(source: Source) -> Iterator[Any]:
+    max_pages = source.max_pages or MODEL_CATALOG_MAX_PAGES
+    return iter_json_items(source.fallback or source.url, key="data", max_pages=max_pages)
 
-    records: list[ModelRecord] = []
-    for item in rows[: limit * 2]:
-        model_id = item.get("id")
-        if not model_id:
-            continue
-        pipeline_tag = str(item.get("pipeline_tag") or "").lower()
-        scenario = SCENARIO_MAP.get(pipeline_tag, "内容生成")
-        records.append(
-            ModelRecord(
-                name=str(model_id),
-                provider="HuggingFace",
-                description=f"pipeline={pipeline_tag or 'unknown'}",
-                business_scenarios=[scenario],
-                source_url=f"https://huggingface.co/{model_id}",
-            )
-        )
-
-    return records[:limit]
-
-
-def _litellm(source: Source, limit: int) -> list[ModelRecord]:
-    html = fetch_text(source.fallback or source.url)
-    soup = BeautifulSoup(html, "html.parser")
 
+def _huggingface_items(source: Source) -> Iterator[Any]:
+    return iter_json_items(source.fallback or source.url, max_pages=source.max_pages or MODEL_CATALOG_MAX_PAGES)
+
+
+def _litellm_items(source: Source) -> Iterator[Any]:
+    html = fetch_text(source.fallback or source.url)
     candidates: list[str] = []
-    for code in soup.select("code"):
-        text = code.get_text(" ", strip=True)
-        if 2 <= len(text) <= 80 and "/" in text:
-            candidates.append(text)
-    for heading in soup.select("h2, h3, h4"):
-        text = heading.get_text(" ", strip=True)
-        if 4 <= len(text) <= 80:
-            candidates.append(text)
+    with profiling.stage("parse"):
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(html, "html.parser")
+        for code in soup.select("code"):
+            text = code.get_text(" ", strip=True)
+            if 2 <= len(text) <= 80 and "/" in text:
+                candidates.append(text)
+        for heading in soup.select("h2, h3, h4"):
+            text = heading.get_text(" ", strip=True)
+            if 4 <= len(text) <= 80:
+                candidates.append(text)
 
     deduped = []
     seen = set()
@@ -126,29 +132,62 @@ def _litellm(source: Source, limit: int) -> list[ModelRecord]:
 
     if not deduped:
         deduped = ["gpt-4o-mini", "claude-3-5-sonnet", "deepseek-chat"]
+    return iter(deduped)
+
+
+def _item_key(item: Any) -> str:
+    if isinstance(item, dict):
+        return str(item.get("id") or item.get("name") or "")
+    return str(item or "").strip().lower()
 
-    records = [
-        ModelRecord(
-            name=name,
-            provider="LiteLLM",
-            description="LiteLLM provider/model catalog entry",
-            business_scenarios=["自动化工作流"],
-            source_url=source.url,
-        )
-        for name in deduped[:limit]
-    ]
-    return records
 
+@dataclass(frozen=True)
+class CatalogAdapter:
+    items: Callable[[Source], Iterator[Any]]
+    record: Callable[[Source, Any], ModelRecord | None]
+    key: Callable[[Any], str] = _item_key
 
-def fetch_models_for_source(source: Source, limit: int) -> list[ModelRecord]:
-    if source.key == "openrouter":
-        records = _openrouter(source, limit)
-    elif source.key == "huggingface":
-        records = _huggingface(source, limit)
-    elif source.key == "litellm":
-        records = _litellm(source, limit)
-    else:
-        records = []
 
-    deduped = dedupe_models_by_provider_name([asdict(item) for item in records])
-    return [ModelRecord(**item) for item in deduped][:limit]
+# Built-in catalogs, referenced by name from the [adapters] table in sources.toml.
+OPENROUTER = CatalogAdapter(items=_openrouter_items, record=_openrouter_record)
+HUGGINGFACE = CatalogAdapter(items=_huggingface_items, record=_huggingface_record)
+LITELLM = CatalogAdapter(items=_litellm_items, record=_litellm_record)
+
+
+def fetch_models_for_source(
+    source: Source, limit: int, snapshot: CatalogSnapshot | None = None, deadline: float | None = None
+) -> list[ModelRecord]:
+    adapter = catalog_adapter(source.adapter or source.key)
+
+    # Items are consumed lazily so a 10k+ model catalog is never held in memory.
+    # With a snapshot, unchanged entries are skipped and paging stops once `limit`
+    # new or changed models have been collected.
+    records: list[ModelRecord] = []
+    seen: set[tuple[str, str]] = set()
+    try:
+        for item in adapter.items(source):
+            # Checked before anything else: unchanged and duplicate entries are
+            # skipped below, and an unchanged catalog must not be walked to the end.
+            if deadline is not None and time.monotonic() >= deadline:
+                # A partial walk never counts as complete, so nothing is marked removed.
+                break
+            record = adapter.record(source, item)
+            if record is None:
+                continue
+            key = (record.provider.strip().lower(), normalize_model_name(record.name))
+            if not key[0] or not key[1] or key in seen:
+                continue
+            seen.add(key)
+            if snapshot is not None and not snapshot.observe(adapter.key(item), item, record):
+                continue
+            records.append(record)
+            if len(records) >= limit:
+                break
+        else:
+            if snapshot is not None:
+                snapshot.mark_complete()
+    except PageLimitReached:
+        # Paging stopped at max_pages with more of the catalog left (HuggingFace
+        # lists millions of models): also a partial walk.
+        pass
+    return records
@@ -1,20 +1,40 @@
 from __future__ import annotations
 
+import time
 import xml.etree.ElementTree as ET
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import asdict
 from datetime import datetime
+from functools import partial
 from urllib.parse import urljoin, urlparse
 
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Tag
 
-from http_client import fetch_text
+import profiling
+from http_client import decode_body, fetch_bytes, fetch_text
+from parser_pool import ParserPool
 from sources import NEWS_DETAIL_RETRY, Source
-from transform import dedupe_by_url
+from transform import dedupe_by_url, normalize_url
+from url_patterns import LinkFilter, UrlPatternStats
 from records import ArticleRecord
+from sitemaps import SitemapState, discover
+from timeparse import TimestampParser
 
+MIN_CONTENT_BLOCK_CHARS = 20
+MAX_CONTENT_BLOCKS = 60
+# Feed bodies shorter than this are treated as teasers and the page is fetched.
+MIN_FEED_CONTENT_CHARS = 200
+CONTENT_ENCODED = "{http://purl.org/rss/1.0/modules/content/}encoded"
+PUBLISHED_META = ("article:published_time", "og:published_time", "pubdate", "publishdate")
+# Wrappers a paragraph's container is looked up through: CMS output often puts
+# each <p> in its own <span>/<font>, which must not split the body apart.
+INLINE_TAGS = frozenset({"a", "b", "em", "font", "i", "label", "mark", "small", "span", "strong", "u"})
 
-def _extract_links_from_listing(html: str, base_url: str, max_candidates: int = 200) -> list[dict[str, str]]:
-    soup = BeautifulSoup(html, "html.parser")
+
+def _extract_links_from_listing(
+    html: str, base_url: str, max_candidates: int = 200, features: str = "html.parser"
+) -> list[dict[str, str]]:
+    soup = BeautifulSoup(html, features)
     base_domain = urlparse(base_url).netloc
 
     links: list[dict[str, str]] = []
@@ -40,7 +60,9 @@ def _extract_links_from_listing(html: str, base_url: str, max_candidates: int =
     return dedupe_by_url(links)
 
 
-def _extract_rss_items(xml_text: str, source_url: str) -> list[dict[str, str]]:
+def _extract_rss_items(xml_text: str, source_url: str, features: str = "html.parser") -> list[dict[str, str]]:
+    # Items whose <content:encoded> (or <description>) holds the full article
+    # carry it as "content", and are not fetched again.
     items: list[dict[str, str]] = []
     try:
         root = ET.fromstring(xml_text)
@@ -53,77 +75,327 @@ def _extract_rss_items(xml_text: str, source_url: str) -> list[dict[str, str]]:
         pub = (node.findtext("pubDate") or node.findtext("published") or "").strip()
         if not title or not link:
             continue
-        items.append(
-            {
-                "title": title,
-                "url": urljoin(source_url, link),
-                "published_at": pub,
-            }
-        )
+        item = {"title": title, "url": urljoin(source_url, link), "published_at": pub}
+        content = _feed_content(node.findtext(CONTENT_ENCODED) or node.findtext("description") or "", features)
+        if content:
+            item["content"] = content
+        items.append(item)
 
     return dedupe_by_url(items)
 
 
-def _extract_article_content(html: str) -> tuple[str, str, str | None]:
-    soup = BeautifulSoup(html, "html.parser")
+def _link_text_length(node: Tag) -> int:
+    return sum(len(anchor.get_text(" ", strip=True)) for anchor in node.find_all("a"))
 
-    title_node = soup.select_one("h1") or soup.select_one("title")
-    title = title_node.get_text(" ", strip=True) if title_node else ""
 
-    time_node = soup.select_one("time")
-    published_at = None
-    if time_node:
-        published_at = time_node.get("datetime") or time_node.get_text(" ", strip=True)
+def _content_block(node: Tag) -> tuple[str, int] | None:
+    # A paragraph counts as body text when it is long enough and not mostly links.
+    text = node.get_text(" ", strip=True)
+    if len(text) < MIN_CONTENT_BLOCK_CHARS:
+        return None
+    link_chars = _link_text_length(node)
+    if link_chars * 2 > len(text):
+        return None
+    return text, link_chars
 
-    blocks = []
-    article = soup.select_one("article")
-    if article:
-        blocks = [p.get_text(" ", strip=True) for p in article.find_all("p")]
 
-    if not blocks:
-        blocks = [p.get_text(" ", strip=True) for p in soup.find_all("p")]
+def _feed_content(html: str, features: str = "html.parser") -> str:
+    # Same paragraph rules as page extraction; a plain-text body is one block.
+    if len(html) < MIN_FEED_CONTENT_CHARS:
+        return ""
+    soup = BeautifulSoup(html, features)
+    paragraphs = soup.find_all("p")
+    if paragraphs:
+        blocks = [block[0] for block in map(_content_block, paragraphs) if block is not None]
+    else:
+        text = soup.get_text(" ", strip=True)
+        blocks = [text] if len(text) >= MIN_CONTENT_BLOCK_CHARS else []
+    content = "\n".join(blocks[:MAX_CONTENT_BLOCKS])
+    return content if len(content) >= MIN_FEED_CONTENT_CHARS else ""
 
-    content = "\n".join([line for line in blocks if len(line) >= 20][:60])
-    return title, content, published_at
 
+def _block_container(node: Tag) -> Tag | None:
+    parent = node.parent
+    while parent is not None and parent.name in INLINE_TAGS:
+        parent = parent.parent
+    return parent
 
-def _fetch_detail_with_retry(url: str, retries: int) -> tuple[str, str, str | None]:
-    last_title = ""
-    for _ in range(retries):
-        try:
-            html = fetch_text(url, retries=1)
-            title, content, published_at = _extract_article_content(html)
-            last_title = title or last_title
-            if title:
-                return title, content, published_at
-        except Exception:  # noqa: BLE001
+
+def _extract_article_content(html: str, features: str = "html.parser") -> tuple[str, str, str | None]:
+    # One walk over the tree collects h1/title/time and scores qualifying <p>
+    # blocks by their nearest block-level container. Paragraphs under <article>
+    # win, otherwise the container with the most non-link text does. The walk
+    # stops once an <article> holds MAX_CONTENT_BLOCKS paragraphs; any other
+    # container filling up first may still be outscored by a later one.
+    soup = BeautifulSoup(html, features)
+
+    heading = ""
+    page_title = ""
+    time_node: Tag | None = None
+    meta_published = ""
+    blocks: dict[int, list[str]] = {}
+    scores: dict[int, int] = {}
+    in_article: set[int] = set()
+
+    for node in soup.descendants:
+        if not isinstance(node, Tag):
+            continue
+        if node.name == "h1":
+            if not heading:
+                heading = node.get_text(" ", strip=True)
+            continue
+        if node.name == "title":
+            if not page_title:
+                page_title = node.get_text(" ", strip=True)
+            continue
+        if node.name == "time":
+            if time_node is None:
+                time_node = node
+            continue
+        if node.name == "meta":
+            if not meta_published and (node.get("property") or node.get("name")) in PUBLISHED_META:
+                meta_published = str(node.get("content") or "")
+            continue
+        if node.name != "p":
             continue
-    return last_title, "", None
 
+        block = _content_block(node)
+        if block is None:
+            continue
+        text, link_chars = block
 
-def fetch_news_for_source(source: Source, limit: int) -> list[ArticleRecord]:
-    candidates: list[dict[str, str]] = []
+        article = node.find_parent("article")
+        container = article or _block_container(node)
+        container_id = id(container)
+        if article is not None:
+            in_article.add(container_id)
+        kept = blocks.setdefault(container_id, [])
+        if len(kept) < MAX_CONTENT_BLOCKS:
+            kept.append(text)
+        scores[container_id] = scores.get(container_id, 0) + len(text) - link_chars
+        if article is not None and len(kept) >= MAX_CONTENT_BLOCKS:
+            break
 
+    candidates = in_article or set(blocks)
+    best = max(candidates, key=lambda container_id: scores[container_id], default=None)
+    content = "\n".join(blocks[best][:MAX_CONTENT_BLOCKS]) if best is not None else ""
+
+    published_at = meta_published or None
+    if time_node is not None:
+        published_at = time_node.get("datetime") or meta_published or time_node.get_text(" ", strip=True)
+    return heading or page_title, content, published_at
+
+
+def parse_listing_bytes(
+    content: bytes, encoding: str | None, base_url: str, max_candidates: int, features: str = "html.parser"
+) -> list[dict[str, str]]:
+    with profiling.stage("parse"):
+        return _extract_links_from_listing(decode_body(content, encoding), base_url, max_candidates, features)
+
+
+def parse_article_bytes(
+    content: bytes, encoding: str | None, features: str = "html.parser"
+) -> tuple[str, str, str | None]:
+    with profiling.stage("parse"):
+        return _extract_article_content(decode_body(content, encoding), features)
+
+
+_FETCHERS: dict[int, ThreadPoolExecutor] = {}
+
+
+def _fetchers(workers: int) -> ThreadPoolExecutor:
+    # Kept for the life of the process, one pool per concurrency setting: each
+    # thread's session (see http_client.session) and its pooled connections then
+    # survive from one call, and one daemon cycle, to the next.
+    if workers not in _FETCHERS:
+        _FETCHERS[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"detail-fetch-{workers}")
+    return _FETCHERS[workers]
+
+
+def _fetch_page(url: str, deadline: float | None) -> tuple[bytes, str | None] | None:
+    if deadline is not None and time.monotonic() >= deadline:
+        return None
     try:
-        listing_html = fetch_text(source.url, retries=1)
-        candidates.extend(_extract_links_from_listing(listing_html, source.url, max_candidates=limit * 10))
+        return fetch_bytes(url, retries=1)
     except Exception:  # noqa: BLE001
-        pass
+        return None
+
+
+def fetch_details(
+    urls: list[str],
+    retries: int,
+    parser: ParserPool,
+    deadline: float | None = None,
+    concurrency: int = 1,
+    features: str = "html.parser",
+) -> dict[str, tuple[str, str, str | None]]:
+    # Each round fetches every outstanding page and hands the bytes to the pool
+    # without waiting, so parsing of one page overlaps the download of the next.
+    # With concurrency > 1 that many downloads run at once on a long-lived pool
+    # (each thread keeps its own session). Past `deadline` (a time.monotonic()
+    # value) no new page is requested; pages already downloaded are still parsed.
+    results: dict[str, tuple[str, str, str | None]] = {url: ("", "", None) for url in urls}
+    remaining = list(urls)
+    fetch = partial(_fetch_page, deadline=deadline)
+    fetchers = _fetchers(concurrency) if concurrency > 1 else None
+    for _ in range(retries):
+        if not remaining:
+            break
+        pages = fetchers.map(fetch, remaining) if fetchers is not None else map(fetch, remaining)
+        futures: dict[str, Future[tuple[str, str, str | None]]] = {}
+        for url, page in zip(list(remaining), pages):
+            if page is not None:
+                futures[url] = parser.submit(parse_article_bytes, *page, features)
 
-    if len(candidates) < limit and source.fallback:
+        for url, future in futures.items():
+            try:
+                title, content, published_at = future.result()
+            except Exception:  # noqa: BLE001
+                continue
+            if title:
+                results[url] = (title, content, published_at)
+                remaining.remove(url)
+    return results
+
+
+def _fetch_listing(source: Source, limit: int, parser: ParserPool) -> list[dict[str, str]]:
+    content, encoding = fetch_bytes(source.url, retries=1)
+    return parser.submit(parse_listing_bytes, content, encoding, source.url, limit * 10, source.parser).result()
+
+
+def _newer_items(
+    items: list[dict[str, str]], since: datetime | None, timestamps: TimestampParser, limit: int
+) -> list[dict[str, str]]:
+    # Up to `limit` items dated after `since`, the newest article already
+    # stored for the source; undated items are always eligible. Without a
+    # watermark they come in listing order. With one, the oldest dated items go
+    # first (undated ones after them), so whatever the limit leaves out is newer
+    # than everything taken and a watermark moved to the newest stored date
+    # cannot skip it. Items dated like the first one left out wait for the next
+    # run with it.
+    if since is None:
+        return items[:limit]
+    dated: list[tuple[datetime, dict[str, str]]] = []
+    undated: list[dict[str, str]] = []
+    for item in items:
+        published = timestamps.parse(item.get("published_at"))
+        if published is None:
+            undated.append(item)
+        elif published > since:
+            dated.append((published, item))
+    dated.sort(key=lambda pair: pair[0])
+    if len(dated) > limit:
+        cut = dated[limit][0]
+        dated = [pair for pair in dated[:limit] if pair[0] < cut] or dated[:limit]
+    return ([item for _published, item in dated] + undated)[:limit]
+
+
+def _fetch_rss_records(source: Source, limit: int, since: datetime | None = None) -> list[ArticleRecord]:
+    timestamps = TimestampParser(source.key)
+    rss = fetch_text(source.fallback, retries=1)
+    records = [
+        ArticleRecord(
+            title=item["title"],
+            source=source.name,
+            url=item["url"],
+            content=item.get("content", ""),
+            published_at=timestamps.normalize(item.get("published_at")),
+        )
+        for item in _newer_items(_extract_rss_items(rss, source.url, source.parser), since, timestamps, limit)
+    ]
+    timestamps.save()
+    return records
+
+
+def _sitemap_candidates(
+    source: Source, limit: int, link_filter: LinkFilter, state: SitemapState | None
+) -> list[dict[str, str]]:
+    # With a state, only entries modified (or, without <lastmod>, first listed)
+    # since its last commit come back, so unchanged articles cost nothing; the
+    # caller commits it once the articles are stored.
+    timestamps = TimestampParser(f"{source.key}:sitemap")
+    entries = discover(source.sitemaps, limit, state, timestamps, accept=link_filter.accepts)
+    timestamps.save()
+    return [
+        {"title": entry.title, "url": entry.url, "published_at": entry.published_at}
+        for entry in entries
+    ]
+
+
+def discover_candidates(
+    source: Source,
+    limit: int,
+    parser: ParserPool | None = None,
+    since: datetime | None = None,
+    sitemap_state: SitemapState | None = None,
+) -> list[dict[str, str]]:
+    # Sitemaps when the source has them; otherwise listing page first and RSS
+    # to top up, or the feed first for `rss_first` sources. Each candidate is
+    # {title, url, published_at?, content?}; feed items with a full body carry
+    # it as content, which makes their detail fetch unnecessary.
+    link_filter = LinkFilter(source, learned=UrlPatternStats(source.key).learned_patterns())
+    feed: list[dict[str, str]] = []
+    if source.rss_first and source.fallback:
+        try:
+            feed = _extract_rss_items(fetch_text(source.fallback, retries=1), source.url, source.parser)
+        except Exception:  # noqa: BLE001
+            pass
+    if source.sitemaps:
+        try:
+            found = _sitemap_candidates(source, limit, link_filter, sitemap_state)
+            bodies = {item["url"]: item for item in feed if item.get("content")}
+            return [bodies.get(normalize_url(item["url"]), item) for item in found]
+        except Exception:  # noqa: BLE001
+            pass
+
+    parser = parser or ParserPool()
+    timestamps = TimestampParser(source.key)
+    candidates: list[dict[str, str]] = list(feed)
+
+    if len(candidates) < limit:
+        try:
+            # Non-article links (tags, authors, columns...) are dropped here so
+            # they never cost a detail request.
+            candidates.extend(
+                item
+                for item in _fetch_listing(source, limit, parser)
+                if link_filter.accepts(item["url"], item.get("title", ""))
+            )
+        except Exception:  # noqa: BLE001
+            pass
+
+    if len(candidates) < limit and source.fallback and not source.rss_first:
         try:
             rss = fetch_text(source.fallback, retries=1)
-            candidates.extend(_extract_rss_items(rss, source.url))
+            candidates.extend(_extract_rss_items(rss, source.url, source.parser))
         except Exception:  # noqa: BLE001
             pass
 
-    unique_candidates = dedupe_by_url(candidates)[:limit]
+    return _newer_items(dedupe_by_url(candidates), since, timestamps, limit)
+
+
+def feed_details(candidates: list[dict[str, str]]) -> dict[str, tuple[str, str, str | None]]:
+    return {
+        item["url"]: (item["title"], item["content"], item.get("published_at") or None)
+        for item in candidates
+        if item.get("content")
+    }
+
 
+def build_article_records(
+    source: Source,
+    candidates: list[dict[str, str]],
+    details: dict[str, tuple[str, str, str | None]],
+) -> list[ArticleRecord]:
+    timestamps = TimestampParser(source.key)
+    pattern_stats = UrlPatternStats(source.key)
     records: list[ArticleRecord] = []
-    for item in unique_candidates:
-        title, content, published_at = _fetch_detail_with_retry(item["url"], NEWS_DETAIL_RETRY)
+    for item in candidates:
+        title, content, published_at = details.get(item["url"], ("", "", None))
+        pattern_stats.record(item["url"], success=bool(title and content))
         final_title = title or item.get("title") or "Untitled"
-        final_published = published_at or datetime.utcnow().isoformat()
+        # Undated articles stay undated rather than looking freshly published.
+        final_published = timestamps.normalize(published_at) or timestamps.normalize(item.get("published_at"))
 
         records.append(
             ArticleRecord(
@@ -135,5 +407,35 @@ def fetch_news_for_source(source: Source, limit: int) -> list[ArticleRecord]:
             )
         )
 
+    pattern_stats.save()
+    timestamps.save()
     deduped = dedupe_by_url([asdict(row) for row in records])
-    return [ArticleRecord(**row) for row in deduped][:limit]
+    return [ArticleRecord(**row) for row in deduped]
+
+
+def fetch_news_for_source(
+    source: Source,
+    limit: int,
+    parser: ParserPool | None = None,
+    rss_only: bool = False,
+    deadline: float | None = None,
+    since: datetime | None = None,
+    sitemap_state: SitemapState | None = None,
+) -> list[ArticleRecord]:
+    # `rss_only` is the cheapest degradation for a short time budget: titles and
+    # dates straight from the feed, without the listing page or detail fetches.
+    if rss_only and source.fallback:
+        return _fetch_rss_records(source, limit, since)
+
+    parser = parser or ParserPool()
+    candidates = discover_candidates(source, limit, parser, since, sitemap_state)
+    details = fetch_details(
+        [item["url"] for item in candidates if not item.get("content")],
+        source.retries or NEWS_DETAIL_RETRY,
+        parser,
+        deadline,
+        concurrency=source.concurrency,
+        features=source.parser,
+    )
+    details.update(feed_details(candidates))
+    return build_article_records(source, candidates, details)[:limit]
@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import IO, Any
+from uuid import uuid4
+
+from paths import state_dir
+from sources import ARCHIVE_ZSTD_LEVEL
+
+# Index record: url key, run key, fetched_at, sha256 of the body, then the
+# offset and length of the entry's JSON metadata in meta.log. Records are
+# fixed-width, so the index is scanned straight from an mmap without parsing.
+_RECORD = struct.Struct("<16s16sd32sQI")
+
+
+def _key(value: str) -> bytes:
+    return hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+
+
+@dataclass(frozen=True)
+class ArchiveEntry:
+    url: str
+    run_id: str
+    fetched_at: float
+    digest: str
+    encoding: str | None = None
+    next_url: str | None = None
+    complete: bool = True
+    size: int = 0
+
+
+class BlobWriter:
+    # Hashes and zstd-compresses a body as it is written, so streamed catalogs
+    # are archived without ever being held in memory.
+    def __init__(self, blobs: Path, level: int) -> None:
+        import zstandard
+
+        self.blobs = blobs
+        self.tmp = blobs / f".{os.getpid()}.{uuid4().hex}.tmp"
+        self.handle = self.tmp.open("wb")
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        self.hasher = hashlib.sha256()
+        self.size = 0
+
+    def write(self, chunk: bytes) -> None:
+        self.hasher.update(chunk)
+        self.size += len(chunk)
+        self.handle.write(self.compressor.compress(chunk))
+
+    def finish(self) -> str:
+        # Identical bodies share one blob; the temp copy of a duplicate is dropped.
+        self.handle.write(self.compressor.flush())
+        self.handle.close()
+        digest = self.hasher.hexdigest()
+        path = self.blobs / digest[:2] / f"{digest}.zst"
+        if path.exists():
+            self.tmp.unlink()
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(self.tmp, path)
+        return digest
+
+    def abort(self) -> None:
+        self.handle.close()
+        self.tmp.unlink(missing_ok=True)
+
+
+class RawArchive:
+    # Content-addressed store of raw fetched bodies (HTML, RSS, JSON) keyed by
+    # URL and fetch time. Appends take an exclusive flock, so every process of a
+    # run (workers included) can share one archive directory.
+    def __init__(
+        self, root: str | Path | None = None, level: int = ARCHIVE_ZSTD_LEVEL, clock: Callable[[], float] = time.time
+    ) -> None:
+        self.root = Path(root) if root else state_dir() / "archive"
+        self.blobs = self.root / "blobs"
+        self.blobs.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.root / "index.bin"
+        self.meta_path = self.root / "meta.log"
+        self.level = level
+        self.clock = clock
+        self._lock = threading.Lock()
+
+    def blob_path(self, digest: str) -> Path:
+        return self.blobs / digest[:2] / f"{digest}.zst"
+
+    def writer(self) -> BlobWriter:
+        return BlobWriter(self.blobs, self.level)
+
+    def commit(
+        self,
+        writer: BlobWriter,
+        url: str,
+        run_id: str,
+        encoding: str | None = None,
+        next_url: str | None = None,
+        complete: bool = True,
+    ) -> ArchiveEntry:
+        with self._lock, self._locked():
+            # The blob is moved into place (or found to exist) under the lock, so
+            # a concurrent prune cannot drop it before its entry is indexed.
+            digest = writer.finish()
+            entry = ArchiveEntry(
+                url=url,
+                run_id=run_id,
+                fetched_at=self.clock(),
+                digest=digest,
+                encoding=encoding,
+                next_url=next_url,
+                complete=complete,
+                size=writer.size,
+            )
+            meta = (json.dumps(asdict(entry), ensure_ascii=False) + "\n").encode("utf-8")
+            # Metadata lands before its index record, so a reader never sees a
+            # record pointing past the end of meta.log.
+            with self.meta_path.open("ab") as handle:
+                offset = handle.seek(0, os.SEEK_END)
+                handle.write(meta)
+            with self.index_path.open("ab") as handle:
+                handle.write(
+                    _RECORD.pack(_key(url), _key(run_id), entry.fetched_at, bytes.fromhex(digest), offset, len(meta))
+                )
+        return entry
+
+    def put(
+        self, url: str, body: bytes, run_id: str, encoding: str | None = None, next_url: str | None = None
+    ) -> ArchiveEntry:
+        writer = self.writer()
+        try:
+            writer.write(body)
+        except BaseException:
+            writer.abort()
+            raise
+        return self.commit(writer, url, run_id, encoding=encoding, next_url=next_url)
+
+    def read(self, entry: ArchiveEntry) -> bytes:
+        import zstandard
+
+        with self.blob_path(entry.digest).open("rb") as handle:
+            return zstandard.ZstdDecompressor().decompressobj().decompress(handle.read())
+
+    def entries(self, run_id: str | None = None, url: str | None = None) -> list[ArchiveEntry]:
+        # Matching is done on the fixed-width keys; metadata is only read for hits.
+        run_key = _key(run_id) if run_id is not None else None
+        url_key = _key(url) if url is not None else None
+        hits = [
+            (offset, length)
+            for record_url, record_run, _fetched_at, _digest, offset, length in self._records()
+            if (run_key is None or record_run == run_key) and (url_key is None or record_url == url_key)
+        ]
+        if not hits:
+            return []
+        with self.meta_path.open("rb") as handle:
+            return [_read_entry(handle, offset, length) for offset, length in hits]
+
+    def latest(self, url: str, at: float | None = None) -> ArchiveEntry | None:
+        # Most recent fetch of `url`, optionally as of time `at`.
+        candidates = [entry for entry in self.entries(url=url) if at is None or entry.fetched_at <= at]
+        return max(candidates, key=lambda entry: entry.fetched_at, default=None)
+
+    def prune(self, older_than: float) -> int:
+        # Drops index entries older than `older_than` seconds, then any blob no
+        # remaining entry refers to. Rewrites happen under the append lock.
+        cutoff = self.clock() - older_than
+        with self._lock, self._locked():
+            records = list(self._records())
+            kept = [record for record in records if record[2] >= cutoff]
+            if len(kept) == len(records):
+                return 0
+            with self.meta_path.open("rb") as handle:
+                metas = [_read_raw(handle, record[4], record[5]) for record in kept]
+            index_tmp = self.index_path.with_name(f"index.bin.{os.getpid()}.tmp")
+            meta_tmp = self.meta_path.with_name(f"meta.log.{os.getpid()}.tmp")
+            with index_tmp.open("wb") as index, meta_tmp.open("wb") as meta_log:
+                for record, meta in zip(kept, metas):
+                    index.write(_RECORD.pack(*record[:4], meta_log.tell(), len(meta)))
+                    meta_log.write(meta)
+            os.replace(meta_tmp, self.meta_path)
+            os.replace(index_tmp, self.index_path)
+            referenced = {record[3].hex() for record in kept}
+            for path in self.blobs.glob("*/*.zst"):
+                if path.stem not in referenced:
+                    path.unlink(missing_ok=True)
+        return len(records) - len(kept)
+
+    def _records(self) -> list[tuple[bytes, bytes, float, bytes, int, int]]:
+        if not self.index_path.exists() or self.index_path.stat().st_size < _RECORD.size:
+            return []
+        with self.index_path.open("rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            # A record being appended concurrently may be cut short; it is skipped.
+            usable = len(view) - len(view) % _RECORD.size
+            return list(_RECORD.iter_unpack(view[:usable]))
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with (self.root / "lock").open("a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _read_raw(handle: IO[bytes], offset: int, length: int) -> bytes:
+    handle.seek(offset)
+    return handle.read(length)
+
+
+def _read_entry(handle: IO[bytes], offset: int, length: int) -> ArchiveEntry:
+    fields: dict[str, Any] = json.loads(_read_raw(handle, offset, length))
+    return ArchiveEntry(**fields)
+
+
+class ArchiveSession:
+    # Binds the archive to one run. Recording stores every body http_client
+    # fetches, tagged with the run id; replaying serves a past run's bodies back
+    # to http_client in fetch order, so extraction and everything downstream
+    # re-run without touching the network.
+    def __init__(self, archive: RawArchive, run_id: str, replay: bool = False) -> None:
+        self.archive = archive
+        self.run_id = run_id
+        self.replaying = replay
+        self.recorded = 0
+        self.failures = 0
+        self._pending: dict[str, deque[ArchiveEntry]] = {}
+        self._last: dict[str, ArchiveEntry] = {}
+        if replay:
+            entries = archive.entries(run_id=run_id)
+            if not entries:
+                raise ValueError(f"No archived pages for run {run_id}")
+            for entry in sorted(entries, key=lambda entry: entry.fetched_at):
+                self._pending.setdefault(entry.url, deque()).append(entry)
+
+    def record(self, url: str, body: bytes, encoding: str | None, next_url: str | None = None) -> None:
+        # Archiving is best effort: a full disk must not fail the crawl.
+        try:
+            self.archive.put(url, body, self.run_id, encoding=encoding, next_url=next_url)
+            self.recorded += 1
+        except OSError:
+            self.failures += 1
+
+    def tee(
+        self, url: str, chunks: Iterable[bytes], encoding: str | None, next_url: str | None = None
+    ) -> Iterator[bytes]:
+        # Passes a streamed body through while archiving it. A consumer that
+        # stops early (e.g. a catalog walk that reached its limit) leaves an
+        # entry marked incomplete, which replays as the same prefix.
+        writer = self.archive.writer()
+        complete = False
+        try:
+            for chunk in chunks:
+                writer.write(chunk)
+                yield chunk
+            complete = True
+        finally:
+            try:
+                self.archive.commit(writer, url, self.run_id, encoding=encoding, next_url=next_url, complete=complete)
+                self.recorded += 1
+            except OSError:
+                writer.abort()
+                self.failures += 1
+
+    def replay(self, url: str) -> tuple[bytes, ArchiveEntry]:
+        # A URL fetched several times in the run (detail retries) replays each
+        # body in turn; further requests keep getting the last one.
+        pending = self._pending.get(url)
+        if pending:
+            self._last[url] = pending.popleft()
+        entry = self._last.get(url)
+        if entry is None:
+            raise RuntimeError(f"{url} was not archived in run {self.run_id}")
+        return self.archive.read(entry), entry
+
+
+_ACTIVE: ArchiveSession | None = None
+
+
+def activate(session: ArchiveSession | None) -> None:
+    global _ACTIVE
+    _ACTIVE = session
+
+
+def active() -> ArchiveSession | None:
+    return _ACTIVE
+
+
+def record(url: str, body: bytes, encoding: str | None, next_url: str | None = None) -> None:
+    if _ACTIVE is not None and not _ACTIVE.replaying:
+        _ACTIVE.record(url, body, encoding, next_url)
+
+
+def replayed(url: str) -> tuple[bytes, ArchiveEntry] | None:
+    if _ACTIVE is None or not _ACTIVE.replaying:
+        return None
+    return _ACTIVE.replay(url)
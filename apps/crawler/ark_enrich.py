@@ -2,22 +2,31 @@ from __future__ import annotations
 
 import json
 import os
+import random
 import re
+import threading
 import time
-from dataclasses import replace
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, replace
 from typing import Any
 
+from prompt_compact import compact_text, estimate_tokens
 from records import ArticleRecord, ModelRecord
-from sources import ARK_RETRY
-
-try:
-    from openai import OpenAI
-except Exception:  # noqa: BLE001
-    OpenAI = None  # type: ignore[assignment]
-
+from sources import (
+    ARK_ARTICLE_PROMPT_TOKENS,
+    ARK_CALL_TIMEOUT,
+    ARK_ENRICH_BUDGET,
+    ARK_HEDGE_MIN_SAMPLES,
+    ARK_HEDGE_WORKERS,
+    ARK_LATENCY_WINDOW,
+    ARK_MAX_BACKOFF,
+    ARK_RETRY,
+)
 
 ARK_BASE_URL = os.getenv("ARK_BASE_URL", "https://ark-ap-southeast.byteintl.net/api/v3")
 ARK_MODEL = os.getenv("ARK_MODEL", "ep-20250831170629-d8d45")
+SYSTEM_PROMPT = "You are an assistant that only returns valid JSON."
 
 TAG_KEYWORDS = {
     "知识问答": ["知识库", "问答", "rag", "检索"],
@@ -44,11 +53,126 @@ TAG_ALIASES = {
 }
 
 
+class LatencyTracker:
+    def __init__(self, window: int = ARK_LATENCY_WINDOW) -> None:
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float, min_samples: int = 1) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < max(1, min_samples):
+            return None
+        index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+        return samples[index]
+
+
+# Process-wide so hedging thresholds survive across enrichment batches.
+_LATENCY = LatencyTracker()
+_CLIENT: tuple[tuple[str, str], Any] | None = None
+
+
+def typical_call_seconds() -> float | None:
+    return _LATENCY.percentile(0.5)
+
+
+@dataclass(frozen=True)
+class ArkCallPolicy:
+    call_timeout: float = ARK_CALL_TIMEOUT
+    budget_seconds: float | None = ARK_ENRICH_BUDGET
+    hedge: bool = False
+    local_tagger: bool = True
+    # Log Ark's labels as tagger training examples; off for synthetic rows
+    # (load tests, mock endpoints), which would teach the tagger mock output.
+    record_examples: bool = True
+
+
+@dataclass
+class ArkStats:
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    estimated_calls: int = 0
+    timeouts: int = 0
+    hedged: int = 0
+    hedge_wins: int = 0
+    budget_skipped: int = 0
+    local_tagged: int = 0
+    latency: LatencyTracker = field(default_factory=LatencyTracker, repr=False, compare=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record(self, prompt: str, content: str, usage: Any | None) -> None:
+        prompt_tokens = getattr(usage, "prompt_tokens", None) if usage is not None else None
+        completion_tokens = getattr(usage, "completion_tokens", None) if usage is not None else None
+        estimated = prompt_tokens is None or completion_tokens is None
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += (
+                int(prompt_tokens) if prompt_tokens is not None else estimate_tokens(SYSTEM_PROMPT + prompt)
+            )
+            self.completion_tokens += (
+                int(completion_tokens) if completion_tokens is not None else estimate_tokens(content)
+            )
+            self.estimated_calls += int(estimated)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def as_dict(self) -> dict[str, int]:
+        p50 = self.latency.percentile(0.5)
+        p95 = self.latency.percentile(0.95)
+        p99 = self.latency.percentile(0.99)
+        return {
+            "ark_calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "estimated_calls": self.estimated_calls,
+            "ark_timeouts": self.timeouts,
+            "ark_hedged": self.hedged,
+            "ark_hedge_wins": self.hedge_wins,
+            "ark_budget_skipped": self.budget_skipped,
+            "local_tagged": self.local_tagged,
+            "ark_latency_p50_ms": int(p50 * 1000) if p50 is not None else 0,
+            "ark_latency_p95_ms": int(p95 * 1000) if p95 is not None else 0,
+            "ark_latency_p99_ms": int(p99 * 1000) if p99 is not None else 0,
+        }
+
+
+_HEDGE_EXECUTOR: ThreadPoolExecutor | None = None
+
+
+def _hedge_executor() -> ThreadPoolExecutor:
+    global _HEDGE_EXECUTOR
+    if _HEDGE_EXECUTOR is None:
+        _HEDGE_EXECUTOR = ThreadPoolExecutor(max_workers=ARK_HEDGE_WORKERS, thread_name_prefix="ark-hedge")
+    return _HEDGE_EXECUTOR
+
+
 def _build_client() -> Any | None:
+    global _CLIENT
     api_key = os.getenv("ARK_API_KEY", "").strip()
-    if not api_key or OpenAI is None:
+    if not api_key:
         return None
-    return OpenAI(base_url=ARK_BASE_URL, api_key=api_key)
+    # The client (and its connection pool) is reused while the endpoint and key
+    # stay the same, so a resident daemon keeps its Ark connections warm.
+    if _CLIENT is not None and _CLIENT[0] == (ARK_BASE_URL, api_key):
+        return _CLIENT[1]
+    # Imported here: the openai package alone costs more than half a second of
+    # startup, which dominates short runs that never reach enrichment.
+    try:
+        from openai import OpenAI
+    except Exception:  # noqa: BLE001
+        return None
+    # The SDK's own retries would stack under ARK_RETRY and stretch one call past
+    # its timeout; every retry goes through _call_ark_json.
+    client = OpenAI(base_url=ARK_BASE_URL, api_key=api_key, max_retries=0)
+    _CLIENT = ((ARK_BASE_URL, api_key), client)
+    return client
 
 
 def _extract_json_payload(text: str) -> dict[str, Any] | None:
@@ -74,35 +198,107 @@ def _extract_json_payload(text: str) -> dict[str, Any] | None:
         return None
 
 
-def _call_ark_json(client: Any, prompt: str) -> dict[str, Any] | None:
+def _complete(client: Any, prompt: str, timeout: float) -> tuple[str, Any | None, float]:
+    started = time.monotonic()
+    completion = client.chat.completions.create(
+        model=ARK_MODEL,
+        temperature=0.1,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+        timeout=timeout,
+    )
+    content = completion.choices[0].message.content if completion.choices else ""
+    if isinstance(content, list):
+        content = "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    if not isinstance(content, str):
+        content = str(content or "")
+    return content, getattr(completion, "usage", None), time.monotonic() - started
+
+
+def _complete_hedged(
+    client: Any, prompt: str, timeout: float, stats: ArkStats | None
+) -> tuple[str, Any | None, float]:
+    # Fire a duplicate request once the primary outlives the rolling p95 and
+    # take whichever answers first; the loser finishes (or times out) unobserved.
+    threshold = _LATENCY.percentile(0.95, min_samples=ARK_HEDGE_MIN_SAMPLES)
+    executor = _hedge_executor()
+    primary = executor.submit(_complete, client, prompt, timeout)
+    if threshold is None or threshold >= timeout:
+        return primary.result()
+    done, _pending = wait([primary], timeout=threshold)
+    if done:
+        return primary.result()
+
+    if stats is not None:
+        stats.count("hedged")
+    hedge = executor.submit(_complete, client, prompt, max(0.1, timeout - threshold))
+    pending = {primary, hedge}
+    last_error: BaseException | None = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            error = future.exception()
+            if error is not None:
+                last_error = error
+                continue
+            if future is hedge and stats is not None:
+                stats.count("hedge_wins")
+            return future.result()
+    raise last_error or RuntimeError("Ark hedged request failed")
+
+
+def _is_timeout(error: Exception) -> bool:
+    return isinstance(error, TimeoutError) or "timeout" in type(error).__name__.lower()
+
+
+class _BudgetExpired:
+    pass
+
+
+# Returned by _call_ark_json when the run's Ark budget ran out before a usable
+# answer: the row was never really tried, so it is skipped, not failed.
+BUDGET_EXPIRED = _BudgetExpired()
+
+
+def _call_ark_json(
+    client: Any,
+    prompt: str,
+    stats: ArkStats | None = None,
+    policy: ArkCallPolicy | None = None,
+    deadline: float | None = None,
+) -> dict[str, Any] | _BudgetExpired | None:
+    policy = policy or ArkCallPolicy()
     last_error: Exception | None = None
     for attempt in range(ARK_RETRY + 1):
+        remaining = deadline - time.monotonic() if deadline is not None else policy.call_timeout
+        timeout = min(policy.call_timeout, remaining)
+        if timeout <= 0:
+            break
         try:
-            completion = client.chat.completions.create(
-                model=ARK_MODEL,
-                temperature=0.1,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an assistant that only returns valid JSON.",
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-            )
-            content = completion.choices[0].message.content if completion.choices else ""
-            if isinstance(content, list):
-                content = "".join(
-                    part.get("text", "") if isinstance(part, dict) else str(part) for part in content
-                )
-            if not isinstance(content, str):
-                content = str(content or "")
+            if policy.hedge:
+                content, usage, elapsed = _complete_hedged(client, prompt, timeout, stats)
+            else:
+                content, usage, elapsed = _complete(client, prompt, timeout)
+            _LATENCY.add(elapsed)
+            if stats is not None:
+                stats.latency.add(elapsed)
+                stats.record(prompt, content, usage)
             payload = _extract_json_payload(content)
             if payload is not None:
                 return payload
         except Exception as error:  # noqa: BLE001
             last_error = error
+            if stats is not None and _is_timeout(error):
+                stats.count("timeouts")
             if attempt < ARK_RETRY:
-                time.sleep(2**attempt)
+                backoff = min(2**attempt, ARK_MAX_BACKOFF) * random.uniform(0.5, 1.0)
+                if deadline is not None:
+                    backoff = min(backoff, max(0.0, deadline - time.monotonic()))
+                time.sleep(backoff)
+    if deadline is not None and time.monotonic() >= deadline:
+        return BUDGET_EXPIRED
     return None
 
 
@@ -134,60 +330,152 @@ def _normalize_tag_list(tags: list[str]) -> list[str]:
     return result[:3]
 
 
-def enrich_articles(records: list[ArticleRecord]) -> list[ArticleRecord]:
+def _budget_deadline(policy: ArkCallPolicy) -> float | None:
+    return time.monotonic() + policy.budget_seconds if policy.budget_seconds else None
+
+
+def _local_labels(kind: str, texts: list[str], policy: ArkCallPolicy) -> list[list[str] | None]:
+    # Labels from the local tagger (see tagger.py) for rows it is confident
+    # about; those rows only ask Ark for the summary/description.
+    if not policy.local_tagger:
+        return [None] * len(texts)
+    from tagger import load_tagger
+
+    model = load_tagger(kind)
+    return model.predict(texts) if model is not None else [None] * len(texts)
+
+
+def _fail(failures: list[tuple[Any, str]] | None, row: Any, reason: str) -> None:
+    if failures is None:
+        raise RuntimeError(reason)
+    failures.append((row, reason))
+
+
+def article_prompt_content(row: ArticleRecord) -> str:
+    keywords = tuple(word for words in TAG_KEYWORDS.values() for word in words)
+    return compact_text(row.content, ARK_ARTICLE_PROMPT_TOKENS, title=row.title, keywords=keywords)
+
+
+def enrich_articles(
+    records: list[ArticleRecord],
+    stats: ArkStats | None = None,
+    policy: ArkCallPolicy | None = None,
+    failures: list[tuple[ArticleRecord, str]] | None = None,
+) -> list[ArticleRecord]:
+    # With `failures`, a row whose Ark payload is empty or invalid is appended
+    # there with the reason and the rest of the batch carries on; without it the
+    # first such row raises RuntimeError.
+    if not records:
+        return []
     client = _build_client()
     if client is None:
         raise RuntimeError("ARK_API_KEY is required for article enrichment")
 
+    from tagger import article_text, record_example
+
+    policy = policy or ArkCallPolicy()
+    deadline = _budget_deadline(policy)
+    texts = [article_text(row.title, row.content) for row in records]
+    local = _local_labels("article", texts, policy)
     enriched: list[ArticleRecord] = []
-    for row in records:
+    for index, row in enumerate(records):
+        if deadline is not None and time.monotonic() >= deadline:
+            if stats is not None:
+                stats.count("budget_skipped", len(records) - index)
+            break
+        shape = '{"summary":"不超过120字"}' if local[index] else '{"summary":"不超过120字","tags":["最多3个中文标签"]}'
         prompt = (
-            "请返回 JSON，结构为 "
-            '{"summary":"不超过120字","tags":["最多3个中文标签"]}。\n'
+            f"请返回 JSON，结构为 {shape}。\n"
             f"title={row.title}\n"
             f"source={row.source}\n"
-            f"content={row.content[:1000]}"
+            f"content={article_prompt_content(row)}"
         )
-        payload = _call_ark_json(client, prompt)
-        if not payload:
-            raise RuntimeError(f"Ark enrich failed for article: {row.url}")
+        payload = _call_ark_json(client, prompt, stats=stats, policy=policy, deadline=deadline)
+        if payload is BUDGET_EXPIRED:
+            if stats is not None:
+                stats.count("budget_skipped", len(records) - index)
+            break
+        if not isinstance(payload, dict) or not payload:
+            _fail(failures, row, f"Ark enrich failed for article: {row.url}")
+            continue
         summary = str(payload.get("summary") or "").strip()
         tags = payload.get("tags")
         safe_tags = (
             _normalize_tag_list([str(item).strip() for item in tags]) if isinstance(tags, list) else []
         )
+        if local[index]:
+            safe_tags = local[index] or []
+            if stats is not None:
+                stats.count("local_tagged")
 
         if not summary or not safe_tags:
-            raise RuntimeError(f"Ark returned invalid article payload: {row.url}")
+            _fail(failures, row, f"Ark returned invalid article payload: {row.url}")
+            continue
+        if not local[index] and policy.record_examples:
+            record_example("article", texts[index], safe_tags)
         enriched.append(replace(row, summary=summary[:120], tags=safe_tags[:3]))
     return enriched
 
 
-def enrich_models(records: list[ModelRecord]) -> list[ModelRecord]:
+def enrich_models(
+    records: list[ModelRecord],
+    stats: ArkStats | None = None,
+    policy: ArkCallPolicy | None = None,
+    failures: list[tuple[ModelRecord, str]] | None = None,
+) -> list[ModelRecord]:
+    # Failure handling as in enrich_articles.
+    if not records:
+        return []
     client = _build_client()
     if client is None:
         raise RuntimeError("ARK_API_KEY is required for model enrichment")
 
+    from tagger import model_text, record_example
+
+    policy = policy or ArkCallPolicy()
+    deadline = _budget_deadline(policy)
+    texts = [model_text(row.name, row.provider, row.description) for row in records]
+    local = _local_labels("model", texts, policy)
     enriched: list[ModelRecord] = []
-    for row in records:
+    for index, row in enumerate(records):
+        if deadline is not None and time.monotonic() >= deadline:
+            if stats is not None:
+                stats.count("budget_skipped", len(records) - index)
+            break
+        shape = (
+            '{"description":"不超过80字中文描述"}'
+            if local[index]
+            else '{"description":"不超过80字中文描述","business_scenarios":["最多3个中文业务标签"]}'
+        )
         prompt = (
-            "请返回 JSON，结构为 "
-            '{"description":"不超过80字中文描述","business_scenarios":["最多3个中文业务标签"]}。\n'
+            f"请返回 JSON，结构为 {shape}。\n"
             f"name={row.name}\n"
             f"provider={row.provider}\n"
             f"description={row.description}"
         )
-        payload = _call_ark_json(client, prompt)
-        if not payload:
-            raise RuntimeError(f"Ark enrich failed for model: {row.provider}/{row.name}")
+        payload = _call_ark_json(client, prompt, stats=stats, policy=policy, deadline=deadline)
+        if payload is BUDGET_EXPIRED:
+            if stats is not None:
+                stats.count("budget_skipped", len(records) - index)
+            break
+        if not isinstance(payload, dict) or not payload:
+            _fail(failures, row, f"Ark enrich failed for model: {row.provider}/{row.name}")
+            continue
         description = str(payload.get("description") or "").strip()
         scenarios = payload.get("business_scenarios")
         safe_scenarios = (
             _normalize_tag_list([str(item).strip() for item in scenarios]) if isinstance(scenarios, list) else []
         )
+        if local[index]:
+            safe_scenarios = local[index] or []
+            if stats is not None:
+                stats.count("local_tagged")
 
         if not description or not safe_scenarios:
-            raise RuntimeError(f"Ark returned invalid model payload: {row.provider}/{row.name}")
+            _fail(failures, row, f"Ark returned invalid model payload: {row.provider}/{row.name}")
+            continue
+        if not local[index] and policy.record_examples:
+            record_example("model", texts[index], safe_scenarios)
         enriched.append(
             replace(
                 row,
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import math
+import time
+from collections.abc import Callable
+
+# Degradation ladder, applied in this order as time runs short.
+RSS_ONLY = "rss_only"
+SKIP_LOW_PRIORITY_ENRICH = "skip_low_priority_enrich"
+PERSIST_ONLY = "persist_only"
+
+RSS_ONLY_MIN_SOURCE_SECONDS = 20.0
+PERSIST_ONLY_MIN_SECONDS = 5.0
+ESTIMATED_ARK_CALL_SECONDS = 3.0
+
+
+class RunBudget:
+    # A wall-clock deadline that can be split into child slices. Children share
+    # the root's degradation log so the run reports every step that was taken.
+    def __init__(
+        self,
+        seconds: float | None,
+        name: str = "run",
+        clock: Callable[[], float] = time.monotonic,
+        _degradations: list[str] | None = None,
+    ) -> None:
+        self.name = name
+        self.clock = clock
+        self.deadline = clock() + seconds if seconds else math.inf
+        self.degradations: list[str] = _degradations if _degradations is not None else []
+
+    @property
+    def bounded(self) -> bool:
+        return self.deadline != math.inf
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - self.clock())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def slice(self, name: str, share: float, reserve: float = 0.0) -> RunBudget:
+        child = RunBudget(None, name=f"{self.name}.{name}", clock=self.clock, _degradations=self.degradations)
+        if self.bounded:
+            available = max(0.0, self.remaining() - reserve)
+            child.deadline = self.clock() + available * min(1.0, max(0.0, share))
+        return child
+
+    def degrade(self, step: str, detail: str = "") -> None:
+        entry = f"{self.name}:{step}" + (f" ({detail})" if detail else "")
+        if entry not in self.degradations:
+            self.degradations.append(entry)
+
+
+def enrichment_plan(count: int, budget: RunBudget, seconds_per_call: float | None) -> tuple[int, str | None]:
+    # How many of `count` priority-ordered rows can be enriched in this slice,
+    # and which degradation (if any) that implies.
+    if not budget.bounded or count == 0:
+        return count, None
+    available = budget.remaining()
+    if available < PERSIST_ONLY_MIN_SECONDS:
+        return 0, PERSIST_ONLY
+    per_call = seconds_per_call or ESTIMATED_ARK_CALL_SECONDS
+    affordable = int(available // per_call)
+    if affordable >= count:
+        return count, None
+    return max(1, affordable), SKIP_LOW_PRIORITY_ENRICH
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import json
+import signal
+import threading
+import time
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from parser_pool import ParserPool
+from sinks import Sink, get_sink
+from sources import (
+    DAEMON_MODEL_INTERVAL,
+    DAEMON_NEWS_INTERVAL,
+    DAEMON_TICK_SECONDS,
+    MODEL_SOURCES,
+    NEWS_SOURCES,
+    Source,
+)
+
+PIPELINE_SOURCES = {"models": MODEL_SOURCES, "news": NEWS_SOURCES}
+DEFAULT_INTERVALS = {"models": DAEMON_MODEL_INTERVAL, "news": DAEMON_NEWS_INTERVAL}
+
+
+def source_interval(pipeline: str, source: Source) -> int:
+    return source.interval or DEFAULT_INTERVALS[pipeline]
+
+
+class CrawlDaemon:
+    # Runs crawl cycles in-process on a per-source cadence. The sink, parser
+    # pool, HTTP sessions and Ark client live as long as the daemon, so a cycle
+    # only pays for the work it does. Stop with SIGTERM/SIGINT: the current
+    # cycle finishes and persists before the loop exits.
+    def __init__(
+        self,
+        run_cycle: Callable[..., dict[str, object]],
+        sink: Sink,
+        parser: ParserPool,
+        selection: dict[str, list[Source]] | None = None,
+        tick: float = DAEMON_TICK_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.run_cycle = run_cycle
+        self.sink = sink
+        self.parser = parser
+        self.selection = selection or PIPELINE_SOURCES
+        self.tick = tick
+        self.clock = clock
+        self.stop_event = threading.Event()
+        self.started_at = clock()
+        self.next_due: dict[str, float] = {
+            source.key: 0.0 for sources in self.selection.values() for source in sources
+        }
+        self.cycles = 0
+        self.failed_cycles = 0
+        self.last_cycle: dict[str, Any] = {}
+        self.persisted = {"models": 0, "news": 0}
+        self.source_runs: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def due(self, now: float | None = None) -> dict[str, list[Source]]:
+        now = self.clock() if now is None else now
+        due: dict[str, list[Source]] = {}
+        for pipeline, sources in self.selection.items():
+            ready = [source for source in sources if self.next_due[source.key] <= now]
+            if ready:
+                due[pipeline] = ready
+        return due
+
+    def seconds_until_next(self, now: float | None = None) -> float:
+        now = self.clock() if now is None else now
+        return max(0.0, min(self.next_due.values(), default=now + self.tick) - now)
+
+    def run_once(self, now: float | None = None) -> dict[str, object] | None:
+        now = self.clock() if now is None else now
+        due = self.due(now)
+        if not due:
+            return None
+        started = self.clock()
+        # Adaptive backoff counts in units of each source's own interval; the
+        # default unit is sized for a daily cron and would bench a source the
+        # daemon runs hourly for most of a day.
+        intervals = {
+            source.key: float(source_interval(pipeline, source))
+            for pipeline, sources in due.items()
+            for source in sources
+        }
+        try:
+            output = self.run_cycle(selection=due, sink=self.sink, parser=self.parser, intervals=intervals)
+        except Exception as error:  # noqa: BLE001
+            output = {"status": "failed", "errors": [str(error)]}
+        finished = self.clock()
+        with self._lock:
+            self.cycles += 1
+            if output.get("status") == "failed":
+                self.failed_cycles += 1
+            for pipeline, key in (("models", "models"), ("news", "articles")):
+                stats = output.get(key)
+                if isinstance(stats, dict):
+                    self.persisted[pipeline] += int(stats.get("persisted", 0))
+            for pipeline, sources in due.items():
+                for source in sources:
+                    self.next_due[source.key] = now + source_interval(pipeline, source)
+                    self.source_runs[source.key] = finished
+            self.last_cycle = {
+                "run_id": output.get("run_id"),
+                "status": output.get("status"),
+                "started_at": started,
+                "seconds": round(finished - started, 3),
+                "sources": [source.key for sources in due.values() for source in sources],
+            }
+        return output
+
+    def serve_forever(self) -> None:
+        while not self.stop_event.is_set():
+            self.run_once()
+            self.stop_event.wait(max(1.0, min(self.tick, self.seconds_until_next())))
+
+    def stop(self, *_args: object) -> None:
+        self.stop_event.set()
+
+    def health(self) -> dict[str, object]:
+        with self._lock:
+            return {
+                "status": "stopping" if self.stop_event.is_set() else "ok",
+                "uptime_seconds": round(self.clock() - self.started_at, 1),
+                "cycles": self.cycles,
+                "failed_cycles": self.failed_cycles,
+                "last_cycle": dict(self.last_cycle),
+                "next_due": {key: round(due, 1) for key, due in self.next_due.items()},
+            }
+
+    def metrics(self) -> str:
+        # Prometheus text exposition format.
+        with self._lock:
+            lines = [
+                "# TYPE crawler_cycles_total counter",
+                f"crawler_cycles_total {self.cycles}",
+                "# TYPE crawler_failed_cycles_total counter",
+                f"crawler_failed_cycles_total {self.failed_cycles}",
+                "# TYPE crawler_persisted_total counter",
+            ]
+            lines += [f'crawler_persisted_total{{pipeline="{name}"}} {count}' for name, count in self.persisted.items()]
+            lines.append("# TYPE crawler_last_cycle_seconds gauge")
+            lines.append(f"crawler_last_cycle_seconds {self.last_cycle.get('seconds', 0)}")
+            lines.append("# TYPE crawler_source_last_run_timestamp gauge")
+            lines += [
+                f'crawler_source_last_run_timestamp{{source="{key}"}} {stamp:.0f}'
+                for key, stamp in sorted(self.source_runs.items())
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def _handler(daemon: CrawlDaemon) -> type[BaseHTTPRequestHandler]:
+    class HealthHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802
+            if self.path == "/healthz":
+                health = daemon.health()
+                self._send(200 if health["status"] == "ok" else 503, "application/json", json.dumps(health))
+            elif self.path == "/metrics":
+                self._send(200, "text/plain; version=0.0.4", daemon.metrics())
+            else:
+                self._send(404, "text/plain", "not found\n")
+
+        def _send(self, status: int, content_type: str, body: str) -> None:
+            payload = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+            return
+
+    return HealthHandler
+
+
+def start_health_server(daemon: CrawlDaemon, host: str, port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), _handler(daemon))
+    threading.Thread(target=server.serve_forever, name="crawler-health", daemon=True).start()
+    return server
+
+
+def run_daemon(
+    run_cycle: Callable[..., dict[str, object]],
+    sink_name: str,
+    sink_path: str | None,
+    parse_workers: int,
+    selection: dict[str, list[Source]] | None,
+    health_host: str,
+    health_port: int,
+) -> None:
+    sink = get_sink(sink_name, sink_path)
+    parser = ParserPool(parse_workers)
+    daemon = CrawlDaemon(run_cycle, sink=sink, parser=parser, selection=selection)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    server = start_health_server(daemon, health_host, health_port) if health_port else None
+    try:
+        daemon.serve_forever()
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        parser.close()
+        sink.close()
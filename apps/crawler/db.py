@@ -1,13 +1,24 @@
 from __future__ import annotations
 
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from email.utils import parsedate_to_datetime
 from urllib.parse import quote
 
-import requests
-
-from records import ArticleRecord, ModelRecord
+from http_client import session
+from records import ArticleRecord, ModelAlias, ModelRecord
+from sources import (
+    ARTICLE_UPSERT_CONCURRENCY,
+    ARTICLE_UPSERT_MAX_BYTES,
+    ARTICLE_UPSERT_MAX_ROWS,
+    SCENARIO_TOP_N,
+    SUPABASE_RETRY,
+    SUPABASE_TIMEOUT,
+)
+from timeparse import normalize_timestamp
 
 
 def _supabase_config() -> tuple[str, str]:
@@ -33,22 +44,46 @@ def _headers(key: str, prefer: str | None = None) -> dict[str, str]:
     return headers
 
 
+_UPSERT_EXECUTOR: ThreadPoolExecutor | None = None
+
+
+def _upsert_executor() -> ThreadPoolExecutor:
+    # Long-lived, so its threads' sessions (see http_client.session) keep their
+    # Supabase connections warm across chunks, runs and daemon cycles.
+    global _UPSERT_EXECUTOR
+    if _UPSERT_EXECUTOR is None:
+        _UPSERT_EXECUTOR = ThreadPoolExecutor(max_workers=ARTICLE_UPSERT_CONCURRENCY, thread_name_prefix="upsert")
+    return _UPSERT_EXECUTOR
+
+
+class SupabaseError(RuntimeError):
+    def __init__(self, status_code: int, message: str) -> None:
+        super().__init__(f"Supabase request failed [{status_code}] {message}")
+        self.status_code = status_code
+
+
+def _encode(payload: dict[str, object] | list[dict[str, object]]) -> bytes:
+    # UTF-8 instead of requests' ASCII escaping keeps CJK article bodies ~2x smaller.
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
 def _request(
     method: str,
     url: str,
     key: str,
     payload: dict[str, object] | list[dict[str, object]] | None = None,
     prefer: str | None = None,
+    timeout: int = SUPABASE_TIMEOUT,
 ) -> list[dict[str, object]]:
-    response = requests.request(
+    response = session().request(
         method,
         url,
-        json=payload,
+        data=_encode(payload) if payload is not None else None,
         headers=_headers(key, prefer),
-        timeout=30,
+        timeout=timeout,
     )
     if response.status_code >= 400:
-        raise RuntimeError(f"Supabase request failed [{response.status_code}] {response.text}")
+        raise SupabaseError(response.status_code, response.text)
     if not response.text.strip():
         return []
     parsed = response.json()
@@ -63,25 +98,26 @@ def _is_missing_column_error(error: Exception, column: str) -> bool:
     return column in str(error)
 
 
+OPTIONAL_MODEL_COLUMNS = ("crawl_run_id", "last_crawled_at", "deprecated_at")
+OPTIONAL_ARTICLE_COLUMNS = ("crawl_run_id", "last_crawled_at")
+# Written by Ark enrichment; rows stored raw (without Ark) leave them out so the
+# stored values survive the upsert.
+ENRICHED_MODEL_COLUMNS = ("description", "business_scenarios")
+ENRICHED_ARTICLE_COLUMNS = ("summary", "tags")
+
+
 def _normalize_timestamp(value: str | None) -> str | None:
-    if not value:
-        return None
-    raw = value.strip()
-    if not raw:
-        return None
+    return normalize_timestamp(value)
 
-    try:
-        parsed = datetime.fromisoformat(raw.replace("Z", "+00:00"))
-    except ValueError:
-        try:
-            parsed = parsedate_to_datetime(raw)
-        except Exception:  # noqa: BLE001
-            return None
-    return parsed.astimezone(timezone.utc).isoformat()
 
+def _partial(payload: dict[str, object], keep: tuple[str, ...] = ()) -> dict[str, object]:
+    # Only the fields the row carries, so an upsert leaves the stored values of
+    # the others alone.
+    return {name: value for name, value in payload.items() if name in keep or value not in (None, "", [])}
 
-def _model_payload(row: ModelRecord) -> dict[str, object]:
-    return {
+
+def model_payload(row: ModelRecord, partial: bool = False, raw: bool = False) -> dict[str, object]:
+    payload: dict[str, object] = {
         "name": row.name.strip(),
         "provider": row.provider.strip(),
         "description": row.description.strip() if row.description else None,
@@ -93,11 +129,17 @@ def _model_payload(row: ModelRecord) -> dict[str, object]:
         "release_date": row.release_date,
         "source_url": row.source_url,
         "updated_at": datetime.now(timezone.utc).isoformat(),
+        "deprecated_at": None,
     }
+    if raw:
+        for column in ENRICHED_MODEL_COLUMNS:
+            payload.pop(column)
+    # A model seen in a catalog again is no longer deprecated, partial or not.
+    return _partial(payload, keep=("deprecated_at",)) if partial else payload
 
 
-def _article_payload(row: ArticleRecord) -> dict[str, object]:
-    return {
+def article_payload(row: ArticleRecord, raw: bool = False) -> dict[str, object]:
+    payload: dict[str, object] = {
         "title": row.title.strip(),
         "summary": row.summary.strip() if row.summary else None,
         "content": row.content.strip() if row.content else None,
@@ -106,9 +148,26 @@ def _article_payload(row: ArticleRecord) -> dict[str, object]:
         "tags": row.tags,
         "published_at": _normalize_timestamp(row.published_at),
     }
+    if raw:
+        for column in ENRICHED_ARTICLE_COLUMNS:
+            payload.pop(column)
+    return payload
+
+
+def alias_payload(row: ModelAlias) -> dict[str, object]:
+    return {
+        "alias_provider": row.alias_provider.strip(),
+        "alias_name": row.alias_name.strip(),
+        "canonical_provider": row.canonical_provider.strip(),
+        "canonical_name": row.canonical_name.strip(),
+    }
 
 
-def upsert_models(rows: list[ModelRecord], run_id: str | None = None) -> int:
+def upsert_models(
+    rows: list[ModelRecord], run_id: str | None = None, partial: bool = False, raw: bool = False
+) -> int:
+    # `partial` writes only the fields each row carries (see model_payload);
+    # `raw` leaves out the Ark-enriched ones.
     if not rows:
         return 0
     base_url, key = _supabase_config()
@@ -127,7 +186,7 @@ def upsert_models(rows: list[ModelRecord], run_id: str | None = None) -> int:
             f"&provider=eq.{quote(provider, safe='')}&limit=1"
         )
         existing = _request("GET", existing_url, key)
-        payload = _model_payload(row)
+        payload = model_payload(row, partial=partial, raw=raw)
         if run_id:
             payload["crawl_run_id"] = run_id
         payload["last_crawled_at"] = crawled_at
@@ -141,12 +200,10 @@ def upsert_models(rows: list[ModelRecord], run_id: str | None = None) -> int:
                 insert_url = f"{base_url}/rest/v1/models"
                 _request("POST", insert_url, key, payload=payload, prefer="return=minimal")
         except RuntimeError as error:
-            if _is_missing_column_error(error, "crawl_run_id") or _is_missing_column_error(
-                error, "last_crawled_at"
-            ):
+            if any(_is_missing_column_error(error, column) for column in OPTIONAL_MODEL_COLUMNS):
                 fallback_payload = dict(payload)
-                fallback_payload.pop("crawl_run_id", None)
-                fallback_payload.pop("last_crawled_at", None)
+                for column in OPTIONAL_MODEL_COLUMNS:
+                    fallback_payload.pop(column, None)
                 if existing:
                     model_id = str(existing[0]["id"])
                     patch_url = f"{base_url}/rest/v1/models?id=eq.{quote(model_id, safe='')}"
@@ -161,7 +218,79 @@ def upsert_models(rows: list[ModelRecord], run_id: str | None = None) -> int:
     return persisted
 
 
-def upsert_articles(rows: list[ArticleRecord], run_id: str | None = None) -> int:
+def _chunk_payloads(
+    payloads: list[dict[str, object]], max_rows: int, max_bytes: int
+) -> list[list[dict[str, object]]]:
+    chunks: list[list[dict[str, object]]] = []
+    current: list[dict[str, object]] = []
+    current_bytes = 2
+    for payload in payloads:
+        size = len(_encode(payload)) + 1
+        if current and (len(current) >= max_rows or current_bytes + size > max_bytes):
+            chunks.append(current)
+            current, current_bytes = [], 2
+        current.append(payload)
+        current_bytes += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _is_retryable(error: RuntimeError) -> bool:
+    status = getattr(error, "status_code", None)
+    return status is None or status == 429 or status >= 500
+
+
+def _upsert_article_chunk(
+    upsert_url: str,
+    key: str,
+    chunk: list[dict[str, object]],
+    strip_optional: threading.Event,
+) -> str | None:
+    last_error: RuntimeError | None = None
+    attempt = 0
+    while attempt <= SUPABASE_RETRY:
+        # Decided once per attempt: the error is judged against the payload this
+        # attempt actually sent, not against the shared hint, which another
+        # chunk may set while this request is in flight.
+        stripped = strip_optional.is_set()
+        payload = chunk
+        if stripped:
+            payload = [
+                {name: value for name, value in row.items() if name not in OPTIONAL_ARTICLE_COLUMNS}
+                for row in chunk
+            ]
+        try:
+            _request(
+                "POST",
+                upsert_url,
+                key,
+                payload=payload,
+                prefer="resolution=merge-duplicates,return=minimal",
+            )
+            return None
+        except RuntimeError as error:
+            last_error = error
+            if not stripped and any(_is_missing_column_error(error, column) for column in OPTIONAL_ARTICLE_COLUMNS):
+                # A hint for chunks not sent yet, so they start stripped.
+                strip_optional.set()
+                continue
+            if not _is_retryable(error):
+                break
+        attempt += 1
+        if attempt <= SUPABASE_RETRY:
+            time.sleep(2 ** (attempt - 1))
+    return str(last_error)
+
+
+def upsert_articles(
+    rows: list[ArticleRecord],
+    run_id: str | None = None,
+    errors: list[str] | None = None,
+    raw: bool = False,
+) -> int:
+    # `raw` rows were not enriched: their payloads leave out summary and tags so
+    # a stored article keeps the ones an earlier run wrote.
     if not rows:
         return 0
 
@@ -171,7 +300,7 @@ def upsert_articles(rows: list[ArticleRecord], run_id: str | None = None) -> int
     for row in rows:
         if not row.url.strip() or not row.title.strip():
             continue
-        payload = _article_payload(row)
+        payload = article_payload(row, raw=raw)
         if run_id:
             payload["crawl_run_id"] = run_id
         payload["last_crawled_at"] = crawled_at
@@ -180,36 +309,97 @@ def upsert_articles(rows: list[ArticleRecord], run_id: str | None = None) -> int
         return 0
 
     upsert_url = f"{base_url}/rest/v1/articles?on_conflict=url"
-    try:
-        _request(
-            "POST",
-            upsert_url,
-            key,
-            payload=payloads,
-            prefer="resolution=merge-duplicates,return=minimal",
-        )
-    except RuntimeError as error:
-        if _is_missing_column_error(error, "crawl_run_id") or _is_missing_column_error(
-            error, "last_crawled_at"
-        ):
-            fallback_payloads: list[dict[str, object]] = []
-            for payload in payloads:
-                fallback = dict(payload)
-                fallback.pop("crawl_run_id", None)
-                fallback.pop("last_crawled_at", None)
-                fallback_payloads.append(fallback)
-            _request(
-                "POST",
-                upsert_url,
-                key,
-                payload=fallback_payloads,
-                prefer="resolution=merge-duplicates,return=minimal",
-            )
+    chunks = _chunk_payloads(payloads, ARTICLE_UPSERT_MAX_ROWS, ARTICLE_UPSERT_MAX_BYTES)
+    strip_optional = threading.Event()
+    persisted = 0
+    failures: list[str] = []
+    executor = _upsert_executor()
+    futures = [executor.submit(_upsert_article_chunk, upsert_url, key, chunk, strip_optional) for chunk in chunks]
+    for index, (chunk, future) in enumerate(zip(chunks, futures)):
+        failure = future.result()
+        if failure is None:
+            persisted += len(chunk)
         else:
-            raise
+            failures.append(f"articles chunk {index + 1}/{len(chunks)} ({len(chunk)} rows): {failure}")
+
+    if failures and persisted == 0:
+        raise RuntimeError("\n".join(failures))
+    if errors is not None:
+        errors.extend(failures)
+    return persisted
+
+
+def mark_models_deprecated(models: list[tuple[str, str]], run_id: str | None = None) -> int:
+    if not models:
+        return 0
+    base_url, key = _supabase_config()
+    deprecated_at = datetime.now(timezone.utc).isoformat()
+    payload: dict[str, object] = {"deprecated_at": deprecated_at}
+    if run_id:
+        payload["crawl_run_id"] = run_id
+
+    marked = 0
+    for provider, name in models:
+        if not provider.strip() or not name.strip():
+            continue
+        patch_url = (
+            f"{base_url}/rest/v1/models"
+            f"?name=eq.{quote(name.strip(), safe='')}"
+            f"&provider=eq.{quote(provider.strip(), safe='')}"
+            "&deprecated_at=is.null"
+        )
+        _request("PATCH", patch_url, key, payload=payload, prefer="return=minimal")
+        marked += 1
+    return marked
+
+
+def upsert_model_aliases(rows: list[ModelAlias], run_id: str | None = None) -> int:
+    if not rows:
+        return 0
+    base_url, key = _supabase_config()
+    updated_at = datetime.now(timezone.utc).isoformat()
+    payloads = [{**alias_payload(row), "crawl_run_id": run_id, "updated_at": updated_at} for row in rows]
+    upsert_url = f"{base_url}/rest/v1/model_aliases?on_conflict=alias_provider,alias_name"
+    for chunk in _chunk_payloads(payloads, ARTICLE_UPSERT_MAX_ROWS, ARTICLE_UPSERT_MAX_BYTES):
+        _request("POST", upsert_url, key, payload=chunk, prefer="resolution=merge-duplicates,return=minimal")
     return len(payloads)
 
 
+def refresh_scenario_stats(scenarios: list[str], run_id: str | None = None) -> int:
+    # Server-side recompute of the touched scenario_stats rows, plus those the
+    # database marked dirty (see the scenario_stats migrations), so it is worth
+    # calling with no scenarios after a run that only deprecated models. A
+    # database without the function yet is skipped like a missing crawler_runs
+    # table.
+    base_url, key = _supabase_config()
+    payload = {"scenarios": scenarios, "top_n": SCENARIO_TOP_N, "run_id": run_id}
+    try:
+        _request("POST", f"{base_url}/rest/v1/rpc/refresh_scenario_stats", key, payload=payload)
+    except RuntimeError as error:
+        if "refresh_scenario_stats" in str(error):
+            return 0
+        raise
+    return len(scenarios)
+
+
+def fetch_rows(
+    table: str, select: str, filters: str = "", limit: int = 5000, page_size: int = 1000
+) -> list[dict[str, object]]:
+    # Newest rows first, paged so a large table never comes back in one response.
+    base_url, key = _supabase_config()
+    rows: list[dict[str, object]] = []
+    while len(rows) < limit:
+        size = min(page_size, limit - len(rows))
+        query = f"select={quote(select, safe=',')}&order=created_at.desc,id&limit={size}&offset={len(rows)}"
+        if filters:
+            query += f"&{filters}"
+        page = _request("GET", f"{base_url}/rest/v1/{table}?{query}", key)
+        rows.extend(page)
+        if len(page) < size:
+            break
+    return rows
+
+
 def insert_crawler_run(
     *,
     run_id: str,
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from paths import state_path
+from sources import DLQ_MAX_ATTEMPTS, DLQ_RETRY_BASE
+
+SCHEMA = """
+create table if not exists dead_letters (
+  kind text not null,
+  key text not null,
+  payload text not null,
+  reason text not null,
+  attempts integer not null default 1,
+  first_failed_at real not null,
+  last_failed_at real not null,
+  retry_at real,
+  primary key (kind, key)
+);
+
+create index if not exists dead_letters_due on dead_letters (kind, retry_at);
+"""
+
+
+class DeadLetters:
+    # Records whose enrichment failed, keyed by (kind, key), with the last reason
+    # and attempt count. Each failure pushes the next retry out exponentially;
+    # after max_attempts the record is parked (retry_at null) for inspection.
+    # A pipeline run retries the due ones next to its fresh rows and resolves
+    # them once they are enriched.
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        clock: Callable[[], float] = time.time,
+        max_attempts: int = DLQ_MAX_ATTEMPTS,
+    ) -> None:
+        self.path = Path(path) if path else state_path("deadletter.sqlite3")
+        self.clock = clock
+        self.max_attempts = max_attempts
+        self.connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self.connection.execute("pragma journal_mode=wal")
+        self.connection.executescript(SCHEMA)
+
+    def add(self, kind: str, key: str, payload: dict[str, Any], reason: str) -> int:
+        now = self.clock()
+        self.connection.execute(
+            "insert into dead_letters (kind, key, payload, reason, first_failed_at, last_failed_at, retry_at) "
+            "values (?, ?, ?, ?, ?, ?, case when ? <= 1 then null else ? + ? end) "
+            "on conflict (kind, key) do update set "
+            "payload = excluded.payload, reason = excluded.reason, last_failed_at = excluded.last_failed_at, "
+            "attempts = attempts + 1, "
+            "retry_at = case when attempts + 1 >= ? then null else ? + ? * (1 << min(attempts, 10)) end",
+            (
+                kind,
+                key,
+                json.dumps(payload, ensure_ascii=False),
+                reason[:2000],
+                now,
+                now,
+                self.max_attempts,
+                now,
+                DLQ_RETRY_BASE,
+                self.max_attempts,
+                now,
+                DLQ_RETRY_BASE,
+            ),
+        )
+        row = self.connection.execute(
+            "select attempts from dead_letters where kind = ? and key = ?", (kind, key)
+        ).fetchone()
+        return int(row[0])
+
+    def due(self, kind: str, limit: int) -> list[tuple[str, dict[str, Any]]]:
+        rows = self.connection.execute(
+            "select key, payload from dead_letters where kind = ? and retry_at <= ? order by retry_at limit ?",
+            (kind, self.clock(), limit),
+        ).fetchall()
+        return [(key, json.loads(payload)) for key, payload in rows]
+
+    def resolve(self, kind: str, keys: list[str]) -> int:
+        cursor = self.connection.executemany(
+            "delete from dead_letters where kind = ? and key = ?", [(kind, key) for key in keys]
+        )
+        return cursor.rowcount
+
+    def depth(self, kind: str | None = None) -> int:
+        if kind is None:
+            row = self.connection.execute("select count(*) from dead_letters").fetchone()
+        else:
+            row = self.connection.execute("select count(*) from dead_letters where kind = ?", (kind,)).fetchone()
+        return int(row[0])
+
+    def counts(self) -> dict[str, dict[str, int]]:
+        counts: dict[str, dict[str, int]] = {}
+        for kind, parked, count in self.connection.execute(
+            "select kind, retry_at is null, count(*) from dead_letters group by kind, retry_at is null"
+        ):
+            counts.setdefault(kind, {})["parked" if parked else "retrying"] = count
+        return counts
+
+    def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+
+from paths import locked, state_path, write_atomic
+from records import ModelAlias, ModelRecord
+
+# Org prefixes (HF orgs, OpenRouter vendor names) mapped to one vendor id.
+# Unknown orgs are treated as mirrors that may re-host any vendor's model.
+VENDOR_ALIASES = {
+    "openai": "openai",
+    "anthropic": "anthropic",
+    "meta": "meta",
+    "meta-llama": "meta",
+    "google": "google",
+    "mistral": "mistral",
+    "mistralai": "mistral",
+    "qwen": "qwen",
+    "alibaba": "qwen",
+    "deepseek": "deepseek",
+    "deepseek-ai": "deepseek",
+    "x-ai": "xai",
+    "xai": "xai",
+    "cohere": "cohere",
+    "microsoft": "microsoft",
+    "moonshotai": "moonshot",
+    "thudm": "zhipu",
+    "zhipuai": "zhipu",
+    "z-ai": "zhipu",
+}
+
+# Vendor implied by the family when the name carries no (known) prefix.
+FAMILY_VENDORS = {
+    "gpt": "openai",
+    "o1": "openai",
+    "o3": "openai",
+    "o4": "openai",
+    "claude": "anthropic",
+    "llama": "meta",
+    "gemini": "google",
+    "gemma": "google",
+    "mistral": "mistral",
+    "mixtral": "mistral",
+    "codestral": "mistral",
+    "qwen": "qwen",
+    "qwq": "qwen",
+    "deepseek": "deepseek",
+    "grok": "xai",
+    "command": "cohere",
+    "phi": "microsoft",
+    "glm": "zhipu",
+    "kimi": "moonshot",
+}
+
+# Packaging/quantization markers and routing suffixes that do not make a
+# different model (HF mirrors, OpenRouter ":free", "-latest" pointers).
+IGNORED_TOKENS = frozenset(
+    {"gguf", "ggml", "awq", "gptq", "exl2", "mlx", "onnx", "hf", "bnb", "4bit", "8bit", "fp8", "fp16", "bf16"}
+    | {"int4", "int8", "latest", "free"}
+)
+
+_SPLIT = re.compile(r"[\s/_:\-()\[\],]+")
+_GLUED = re.compile(r"^([a-z]{3,})(\d[\d.]*)$")
+_SIZE = re.compile(r"^\d+(?:\.\d+)?[bmk]$|^\d+x\d+(?:\.\d+)?b$")
+_VERSION = re.compile(r"^\d{1,2}(?:\.\d{1,2})*$")
+
+
+@dataclass(frozen=True)
+class EntityKey:
+    vendor: str
+    family: str
+    version: str
+    size: str
+    variants: tuple[str, ...]
+
+    def terms(self) -> tuple[str, ...]:
+        return (f"family={self.family}", f"version={self.version}", f"size={self.size}")
+
+    def matches(self, other: EntityKey) -> bool:
+        # A missing vendor (mirror org, bare LiteLLM name) is compatible with any.
+        same = (self.family, self.version, self.size, self.variants) == (
+            other.family,
+            other.version,
+            other.size,
+            other.variants,
+        )
+        return same and (not self.vendor or not other.vendor or self.vendor == other.vendor)
+
+
+def entity_key(name: str) -> EntityKey | None:
+    # "OpenAI: GPT-4o", "openai/gpt-4o" and "gpt-4o" all parse to
+    # (openai, gpt, 4o, "", ()); "meta-llama/Llama-3.1-8B-Instruct" to
+    # (meta, llama, 3.1, 8b, ("instruct",)).
+    text = name.strip().lower()
+    vendor = ""
+    head, sep, tail = text.partition(": ")
+    if sep and "/" not in head:
+        vendor, text = head.strip(), tail
+    if "/" in text:
+        org, _, text = text.rpartition("/")
+        vendor = vendor or org.rpartition("/")[2]
+
+    tokens: list[str] = []
+    for token in _SPLIT.split(text):
+        if not token:
+            continue
+        glued = _GLUED.match(token)
+        tokens.extend(glued.groups() if glued else [token])
+    # "claude-3-5-sonnet" and "claude-3.5-sonnet" name the same version.
+    merged: list[str] = []
+    for token in tokens:
+        if token.isdigit() and len(token) <= 2 and merged and _VERSION.match(merged[-1]):
+            merged[-1] = f"{merged[-1]}.{token}"
+        else:
+            merged.append(token)
+
+    family = version = size = ""
+    variants: list[str] = []
+    for token in merged:
+        if token in IGNORED_TOKENS:
+            continue
+        if not family:
+            if not token[0].isalpha():
+                return None
+            family = token
+        elif not size and _SIZE.match(token):
+            size = token
+        elif not version and any(char.isdigit() for char in token):
+            version = token
+        else:
+            variants.append(token)
+    if not family:
+        return None
+    vendor = VENDOR_ALIASES.get(vendor, "") or FAMILY_VENDORS.get(family, "")
+    return EntityKey(vendor=vendor, family=family, version=version, size=size, variants=tuple(sorted(variants)))
+
+
+@dataclass(frozen=True)
+class Entity:
+    provider: str
+    name: str
+    key: EntityKey
+
+
+def _canonical_priority(row: ModelRecord) -> tuple[bool, bool]:
+    # Within one run, the row with pricing and a description becomes canonical.
+    return (row.cost_input is None, not row.description)
+
+
+def _merge(canonical: ModelRecord, alias: ModelRecord) -> ModelRecord:
+    return replace(
+        canonical,
+        description=canonical.description or alias.description,
+        cost_input=canonical.cost_input if canonical.cost_input is not None else alias.cost_input,
+        cost_output=canonical.cost_output if canonical.cost_output is not None else alias.cost_output,
+        api_url=canonical.api_url or alias.api_url,
+        docs_url=canonical.docs_url or alias.docs_url,
+        release_date=canonical.release_date or alias.release_date,
+        business_scenarios=canonical.business_scenarios or alias.business_scenarios,
+    )
+
+
+class EntityIndex:
+    # Canonical model entities with an inverted index from family/version/size
+    # terms to entity ids. Resolving a row intersects three posting sets and
+    # compares only the few entities left, so clustering a catalog stays close
+    # to linear in its size. The first row seen for an entity stays canonical
+    # across runs; later rows from any provider become aliases of it.
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = path or state_path("entities.json")
+        self.entities: list[Entity] = []
+        self.postings: dict[str, set[int]] = {}
+        # (provider, name) of canonical rows last resolved from alias data only.
+        self.partial: set[tuple[str, str]] = set()
+        self._load()
+
+    def _load(self) -> None:
+        self.entities = []
+        self.postings = {}
+        if self.path.exists():
+            for entry in json.loads(self.path.read_text(encoding="utf-8")):
+                key = EntityKey(**{**entry["key"], "variants": tuple(entry["key"]["variants"])})
+                self._add(Entity(provider=entry["provider"], name=entry["name"], key=key))
+        # Entities past this index were created by this process since loading.
+        self._loaded = len(self.entities)
+
+    def _add(self, entity: Entity) -> int:
+        index = len(self.entities)
+        self.entities.append(entity)
+        for term in entity.key.terms():
+            self.postings.setdefault(term, set()).add(index)
+        return index
+
+    def find(self, key: EntityKey) -> int | None:
+        postings = sorted((self.postings.get(term, set()) for term in key.terms()), key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        for index in sorted(candidates):
+            if self.entities[index].key.matches(key):
+                return index
+        return None
+
+    def resolve(self, rows: list[ModelRecord]) -> tuple[list[ModelRecord], list[ModelAlias]]:
+        # Returns one row per entity (in input order, with gaps such as missing
+        # prices filled from its aliases) and the alias links for the rest.
+        # When only aliases of a stored canonical were crawled (the canonical's
+        # own catalog entry is unchanged, say), their merged data is returned
+        # under the canonical identity and listed in `partial`: it is to be
+        # written over the stored row field by field, never replace it.
+        self.partial = set()
+        members: dict[int, list[int]] = {}
+        kept: dict[int, ModelRecord] = {}
+        for position in sorted(range(len(rows)), key=lambda position: _canonical_priority(rows[position])):
+            key = entity_key(rows[position].name)
+            if key is None:
+                kept[position] = rows[position]
+                continue
+            index = self.find(key)
+            if index is None:
+                index = self._add(Entity(provider=rows[position].provider, name=rows[position].name, key=key))
+            members.setdefault(index, []).append(position)
+
+        aliases: list[ModelAlias] = []
+        for index, positions in members.items():
+            entity = self.entities[index]
+            identity = (entity.provider, entity.name)
+            canonical = next(
+                (position for position in positions if (rows[position].provider, rows[position].name) == identity),
+                None,
+            )
+            if canonical is None:
+                # The canonical keeps its own catalog link.
+                merged = replace(rows[positions[0]], provider=entity.provider, name=entity.name, source_url="")
+                self.partial.add(identity)
+            else:
+                merged = rows[canonical]
+            for position in positions:
+                if position == canonical:
+                    continue
+                aliases.append(ModelAlias(rows[position].provider, rows[position].name, entity.provider, entity.name))
+                merged = _merge(merged, rows[position])
+            kept[canonical if canonical is not None else min(positions)] = merged
+        return [kept[position] for position in sorted(kept)], aliases
+
+    def save(self) -> None:
+        # Other workers may have saved entities since this index was loaded.
+        # Under the lock the file is re-read and this index's new entities are
+        # appended, except those another worker already stored under a matching
+        # key: the entity saved first stays canonical.
+        added = self.entities[self._loaded :]
+        with locked(self.path):
+            self._load()
+            for entity in added:
+                if self.find(entity.key) is None:
+                    self._add(entity)
+            payload = [
+                {"provider": entity.provider, "name": entity.name, "key": asdict(entity.key)}
+                for entity in self.entities
+            ]
+            write_atomic(self.path, json.dumps(payload, ensure_ascii=False))
+        self._loaded = len(self.entities)
@@ -1,9 +1,21 @@
 from __future__ import annotations
 
+import json
+import re
+import threading
 import time
+from collections.abc import Iterable, Iterator
+from contextlib import closing
+from dataclasses import dataclass, field
 from typing import Any
+from urllib.parse import urlsplit
 
 import requests
+from requests.compat import chardet
+from requests.utils import stream_decode_response_unicode
+
+import archive
+from sources import MODEL_SOURCES, NEWS_SOURCES, Source
 
 HEADERS = {
     "User-Agent": (
@@ -12,15 +24,126 @@ HEADERS = {
     )
 }
 
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+_LOCAL = threading.local()
+_POLICY_LOCK = threading.Lock()
+_POLICIES: dict[str, HostPolicy] | None = None
+
+
+class ResponseTooLarge(RuntimeError):
+    pass
+
+
+class PageLimitReached(Exception):
+    # Raised by iter_json_items after its last page when `max_pages` stopped it
+    # with a next link still unread: the walk did not cover the whole listing.
+    def __init__(self, next_url: str) -> None:
+        super().__init__(f"Stopped at max_pages before {next_url}")
+        self.next_url = next_url
+
+
+@dataclass
+class HostPolicy:
+    # Per-host request pacing and body cap, from the sources' rate_limit and
+    # max_bytes settings; slots are handed out in order across threads.
+    rate_limit: float = 0.0
+    max_bytes: int = 0
+    next_at: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def wait(self) -> None:
+        if self.rate_limit <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_at)
+            self.next_at = start + 1.0 / self.rate_limit
+        if start > now:
+            time.sleep(start - now)
+
+
+def _strictest(current: float, value: float) -> float:
+    return min(limit for limit in (current, value) if limit) if current or value else 0
+
+
+def configure_hosts(sources: Iterable[Source]) -> None:
+    # A host shared by several sources gets the strictest of their settings.
+    global _POLICIES
+    policies: dict[str, HostPolicy] = {}
+    for source in sources:
+        if not source.rate_limit and not source.max_bytes:
+            continue
+        for url in (source.url, source.fallback):
+            if not url:
+                continue
+            policy = policies.setdefault(urlsplit(url).netloc.lower(), HostPolicy())
+            policy.rate_limit = _strictest(policy.rate_limit, source.rate_limit)
+            policy.max_bytes = int(_strictest(policy.max_bytes, source.max_bytes))
+    with _POLICY_LOCK:
+        _POLICIES = policies
+
+
+def _host_policy(url: str) -> HostPolicy | None:
+    if _POLICIES is None:
+        configure_hosts([*MODEL_SOURCES, *NEWS_SOURCES])
+    assert _POLICIES is not None
+    return _POLICIES.get(urlsplit(url).netloc.lower())
+
+
+def _get(url: str, timeout: int, stream: bool = False) -> requests.Response:
+    policy = _host_policy(url)
+    if policy is None:
+        return session().get(url, timeout=timeout, headers=HEADERS, stream=stream)
+    policy.wait()
+    # Streamed bodies are consumed incrementally, so only whole-body reads are capped.
+    if stream or not policy.max_bytes:
+        return session().get(url, timeout=timeout, headers=HEADERS, stream=stream)
+    response = session().get(url, timeout=timeout, headers=HEADERS, stream=True)
+    declared = response.headers.get("Content-Length", "")
+    too_large = declared.isdigit() and int(declared) > policy.max_bytes
+    body = bytearray()
+    if not too_large:
+        for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+            body += chunk
+            if len(body) > policy.max_bytes:
+                too_large = True
+                break
+    if too_large:
+        response.close()
+        raise ResponseTooLarge(f"{url} is larger than {policy.max_bytes} bytes")
+    # The same attributes requests sets after reading a non-streamed body.
+    response._content = bytes(body)
+    response._content_consumed = True
+    return response
+
+
+def session() -> requests.Session:
+    # One keep-alive session per thread, so repeated requests to a host (and,
+    # in daemon mode, every later cycle) reuse pooled connections and TLS.
+    current = getattr(_LOCAL, "session", None)
+    if current is None:
+        current = requests.Session()
+        _LOCAL.session = current
+    return current
+
 
 def fetch_text(url: str, timeout: int = 20, retries: int = 2) -> str:
+    replayed = archive.replayed(url)
+    if replayed is not None:
+        return decode_body(replayed[0], replayed[1].encoding)
     last_error: Exception | None = None
     for attempt in range(retries + 1):
         try:
-            response = requests.get(url, timeout=timeout, headers=HEADERS)
+            response = _get(url, timeout)
             response.raise_for_status()
+            archive.record(url, response.content, response.encoding)
             response.encoding = response.apparent_encoding or response.encoding
             return response.text
+        except ResponseTooLarge:
+            raise
         except Exception as error:  # noqa: BLE001
             last_error = error
             if attempt < retries:
@@ -28,15 +151,180 @@ def fetch_text(url: str, timeout: int = 20, retries: int = 2) -> str:
     raise RuntimeError(f"Failed to fetch text from {url}: {last_error}")
 
 
+def fetch_bytes(url: str, timeout: int = 20, retries: int = 2) -> tuple[bytes, str | None]:
+    replayed = archive.replayed(url)
+    if replayed is not None:
+        return replayed[0], replayed[1].encoding
+    last_error: Exception | None = None
+    for attempt in range(retries + 1):
+        try:
+            response = _get(url, timeout)
+            response.raise_for_status()
+            archive.record(url, response.content, response.encoding)
+            return response.content, response.encoding
+        except ResponseTooLarge:
+            raise
+        except Exception as error:  # noqa: BLE001
+            last_error = error
+            if attempt < retries:
+                time.sleep(2**attempt)
+    raise RuntimeError(f"Failed to fetch bytes from {url}: {last_error}")
+
+
+def decode_body(content: bytes, declared_encoding: str | None = None) -> str:
+    # Same precedence as fetch_text: detected charset first, then the header.
+    detected = chardet.detect(content)["encoding"] if chardet is not None else None
+    encoding = detected or declared_encoding or "utf-8"
+    return content.decode(encoding, errors="replace")
+
+
 def fetch_json(url: str, timeout: int = 20, retries: int = 2) -> Any:
+    replayed = archive.replayed(url)
+    if replayed is not None:
+        return json.loads(replayed[0])
     last_error: Exception | None = None
     for attempt in range(retries + 1):
         try:
-            response = requests.get(url, timeout=timeout, headers=HEADERS)
+            response = _get(url, timeout)
             response.raise_for_status()
+            archive.record(url, response.content, response.encoding)
             return response.json()
+        except ResponseTooLarge:
+            raise
         except Exception as error:  # noqa: BLE001
             last_error = error
             if attempt < retries:
                 time.sleep(2**attempt)
     raise RuntimeError(f"Failed to fetch json from {url}: {last_error}")
+
+
+def _open_stream(url: str, timeout: int, retries: int) -> requests.Response:
+    last_error: Exception | None = None
+    for attempt in range(retries + 1):
+        try:
+            response = _get(url, timeout, stream=True)
+            response.raise_for_status()
+            return response
+        except Exception as error:  # noqa: BLE001
+            last_error = error
+            if attempt < retries:
+                time.sleep(2**attempt)
+    raise RuntimeError(f"Failed to open stream from {url}: {last_error}")
+
+
+def iter_json_array(chunks: Iterable[str], key: str | None = None) -> Iterator[Any]:
+    # Decodes one array element at a time so memory stays bounded by the largest
+    # element rather than the whole document. With `key`, the array is the value
+    # of that object key (e.g. OpenRouter's {"data": [...]}).
+    stream = iter(chunks)
+    buffer = ""
+    exhausted = False
+
+    def read_more() -> bool:
+        nonlocal buffer, exhausted
+        if exhausted:
+            return False
+        chunk = next(stream, None)
+        if chunk is None:
+            exhausted = True
+            return False
+        buffer += chunk
+        return True
+
+    marker = re.compile(r'"%s"\s*:\s*\[' % re.escape(key)) if key else re.compile(r"\s*\[")
+    while True:
+        match = marker.search(buffer) if key else marker.match(buffer)
+        if match:
+            buffer = buffer[match.end() :]
+            break
+        if not key and buffer.strip():
+            return
+        if not read_more():
+            return
+
+    while True:
+        buffer = buffer.lstrip(_WHITESPACE)
+        if not buffer:
+            if read_more():
+                continue
+            return
+        if buffer[0] == "]":
+            return
+        if buffer[0] == ",":
+            buffer = buffer[1:]
+            continue
+        try:
+            item, end = _DECODER.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if read_more():
+                continue
+            raise
+        if end >= len(buffer) and read_more():
+            # A scalar at the very end of the buffer may still be truncated.
+            continue
+        buffer = buffer[end:]
+        yield item
+
+
+def iter_json_items(
+    url: str,
+    key: str | None = None,
+    max_pages: int | None = None,
+    timeout: int = 20,
+    retries: int = 2,
+) -> Iterator[Any]:
+    active = archive.active()
+    if active is not None and active.replaying:
+        yield from _replay_json_items(active, url, key, max_pages)
+        return
+    next_url: str | None = url
+    pages = 0
+    while next_url and (max_pages is None or pages < max_pages):
+        response = _open_stream(next_url, timeout, retries)
+        with response:
+            if not response.encoding:
+                response.encoding = "utf-8"
+            page_url, next_url = next_url, response.links.get("next", {}).get("url")
+            raw = response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+            if active is not None:
+                raw = active.tee(page_url, raw, response.encoding, next_url)
+            with closing(raw):
+                yield from iter_json_array(stream_decode_response_unicode(raw, response), key=key)
+        pages += 1
+    if next_url:
+        raise PageLimitReached(next_url)
+
+
+def iter_bytes(url: str, timeout: int = 20, retries: int = 2) -> Iterator[bytes]:
+    # Raw body chunks of one response for incremental parsers (sitemaps),
+    # archived and replayed like the JSON streams.
+    active = archive.active()
+    if active is not None and active.replaying:
+        yield active.replay(url)[0]
+        return
+    with _open_stream(url, timeout, retries) as response:
+        raw = response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+        if active is not None:
+            raw = active.tee(url, raw, response.encoding, None)
+        with closing(raw):
+            yield from raw
+
+
+def _replay_json_items(
+    active: archive.ArchiveSession, url: str, key: str | None, max_pages: int | None
+) -> Iterator[Any]:
+    next_url: str | None = url
+    pages = 0
+    while next_url and (max_pages is None or pages < max_pages):
+        body, entry = active.replay(next_url)
+        try:
+            yield from iter_json_array([body.decode(entry.encoding or "utf-8", errors="replace")], key=key)
+        except json.JSONDecodeError:
+            # The original run stopped reading mid-page; its prefix is all there is.
+            if entry.complete:
+                raise
+            return
+        next_url = entry.next_url
+        pages += 1
+    if next_url:
+        raise PageLimitReached(next_url)
@@ -0,0 +1 @@
+# local load-testing tools (mock Ark endpoint + enrichment driver)
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from ark_enrich import CANONICAL_SCENARIOS
+from prompt_compact import estimate_tokens
+
+
+@dataclass(frozen=True)
+class LatencySpec:
+    kind: str = "fixed"
+    params: tuple[float, ...] = (0.0,)
+
+    @classmethod
+    def parse(cls, raw: str) -> LatencySpec:
+        # fixed:0.2 | uniform:0.1,0.5 | lognormal:<median>,<sigma>
+        kind, _, values = raw.partition(":")
+        params = tuple(float(value) for value in values.split(",") if value.strip()) or (0.0,)
+        if kind not in {"fixed", "uniform", "lognormal"}:
+            raise ValueError(f"Unknown latency distribution: {raw}")
+        return cls(kind=kind, params=params)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "uniform":
+            low, high = (self.params + (self.params[0],))[:2]
+            return rng.uniform(low, high)
+        if self.kind == "lognormal":
+            median, sigma = (self.params + (0.5,))[:2]
+            return rng.lognormvariate(math.log(max(median, 1e-6)), sigma)
+        return self.params[0]
+
+
+@dataclass
+class MockConfig:
+    latency: LatencySpec = field(default_factory=LatencySpec)
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    malformed_rate: float = 0.0
+    seed: int = 7
+
+
+def canned_payload(prompt: str, seed: int = 7) -> dict[str, Any]:
+    # Deterministic per prompt: the same record always gets the same answer.
+    digest = hashlib.sha256(f"{seed}:{prompt}".encode("utf-8")).digest()
+    tags = [CANONICAL_SCENARIOS[digest[i] % len(CANONICAL_SCENARIOS)] for i in range(1 + digest[3] % 3)]
+    if '"summary"' in prompt:
+        return {"summary": f"模拟摘要 {digest.hex()[:8]}", "tags": tags}
+    return {"description": f"模拟描述 {digest.hex()[:8]}", "business_scenarios": tags}
+
+
+class MockArkServer:
+    def __init__(self, config: MockConfig | None = None, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.config = config or MockConfig()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self.counts = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0, "malformed": 0}
+        self.prompts: list[str] = []
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v3"
+
+    def _decide(self) -> tuple[str, float]:
+        with self._lock:
+            self.counts["requests"] += 1
+            delay = max(0.0, self.config.latency.sample(self._rng))
+            roll = self._rng.random()
+        if roll < self.config.rate_limit_rate:
+            return "rate_limited", 0.0
+        roll -= self.config.rate_limit_rate
+        if roll < self.config.error_rate:
+            return "errors", delay
+        roll -= self.config.error_rate
+        if roll < self.config.malformed_rate:
+            return "malformed", delay
+        return "ok", delay
+
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *_args: Any) -> None:
+                return None
+
+            def _send(self, status: int, body: dict[str, Any], headers: dict[str, str] | None = None) -> None:
+                encoded = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(encoded)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def do_GET(self) -> None:  # noqa: N802
+                if self.path.rstrip("/").endswith("/stats"):
+                    with server._lock:
+                        self._send(200, dict(server.counts))
+                    return
+                self._send(200, {"status": "ok"})
+
+            def do_POST(self) -> None:  # noqa: N802
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send(404, {"error": {"message": "not found"}})
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                messages = request.get("messages") or []
+                prompt = str(messages[-1].get("content", "")) if messages else ""
+                with server._lock:
+                    server.prompts.append(prompt)
+
+                outcome, delay = server._decide()
+                server._count(outcome)
+                if delay:
+                    time.sleep(delay)
+                if outcome == "rate_limited":
+                    self._send(429, {"error": {"message": "rate limited"}}, {"Retry-After": "0"})
+                    return
+                if outcome == "errors":
+                    self._send(500, {"error": {"message": "injected failure"}})
+                    return
+
+                content = (
+                    '{"summary": "truncated'
+                    if outcome == "malformed"
+                    else json.dumps(canned_payload(prompt, server.config.seed), ensure_ascii=False)
+                )
+                prompt_tokens = sum(estimate_tokens(str(message.get("content", ""))) for message in messages)
+                completion_tokens = estimate_tokens(content)
+                self._send(
+                    200,
+                    {
+                        "id": f"mock-{time.time_ns()}",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": str(request.get("model") or "mock"),
+                        "choices": [
+                            {
+                                "index": 0,
+                                "message": {"role": "assistant", "content": content},
+                                "finish_reason": "stop",
+                            }
+                        ],
+                        "usage": {
+                            "prompt_tokens": prompt_tokens,
+                            "completion_tokens": completion_tokens,
+                            "total_tokens": prompt_tokens + completion_tokens,
+                        },
+                    },
+                )
+
+        return Handler
+
+    def start(self) -> MockArkServer:
+        self._thread = threading.Thread(target=self._server.serve_forever, name="ark-mock", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> MockArkServer:
+        return self.start()
+
+    def __exit__(self, *_exc: object) -> None:
+        self.stop()
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", default="fixed:0", help="fixed:S | uniform:LO,HI | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Share of responses with broken JSON")
+    parser.add_argument("--seed", type=int, default=7)
+
+
+def config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(
+        latency=LatencySpec.parse(args.latency),
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        malformed_rate=args.malformed_rate,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in for the Ark endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    mock = MockArkServer(config_from_args(args), host=args.host, port=args.port)
+    print(f"ARK_BASE_URL={mock.base_url}", flush=True)
+    try:
+        mock.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import ark_enrich
+from ark_enrich import ArkCallPolicy, ArkStats
+from loadtest.ark_mock import MockArkServer, add_mock_arguments, config_from_args
+from records import ArticleRecord, ModelRecord
+
+
+def synthetic_articles(count: int) -> list[ArticleRecord]:
+    body = "企业在落地大模型知识库时需要关注数据治理与检索质量。推理成本与延迟决定了客服场景的可用性。"
+    return [
+        ArticleRecord(
+            title=f"负载测试文章 {index}",
+            source="loadtest",
+            url=f"https://loadtest.local/articles/{index}",
+            content=body * (1 + index % 5),
+        )
+        for index in range(count)
+    ]
+
+
+def synthetic_models(count: int) -> list[ModelRecord]:
+    return [
+        ModelRecord(name=f"loadtest-model-{index}", provider="LoadTest", description="pipeline=text-generation")
+        for index in range(count)
+    ]
+
+
+def run_case(
+    kind: str,
+    records: list[Any],
+    concurrency: int,
+    batch_size: int,
+    policy: ArkCallPolicy,
+) -> dict[str, Any]:
+    enrich = ark_enrich.enrich_articles if kind == "articles" else ark_enrich.enrich_models
+    batches = [records[start : start + batch_size] for start in range(0, len(records), batch_size)]
+    stats = ArkStats()
+    failed_batches = 0
+    enriched = 0
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(enrich, batch, stats=stats, policy=policy) for batch in batches]
+        for future in futures:
+            try:
+                enriched += len(future.result())
+            except RuntimeError:
+                failed_batches += 1
+    elapsed = time.perf_counter() - started
+
+    return {
+        "kind": kind,
+        "concurrency": concurrency,
+        "batch_size": batch_size,
+        "records": len(records),
+        "enriched": enriched,
+        "failed_batches": failed_batches,
+        "seconds": round(elapsed, 3),
+        "records_per_second": round(enriched / elapsed, 2) if elapsed else 0.0,
+        **stats.as_dict(),
+    }
+
+
+def _int_list(raw: str) -> list[int]:
+    return [int(value) for value in raw.split(",") if value.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure enrichment throughput against a mock or given Ark endpoint.")
+    parser.add_argument("--kind", choices=("articles", "models", "both"), default="both")
+    parser.add_argument("--records", type=int, default=200)
+    parser.add_argument("--concurrency", default="1,4,8", help="Comma-separated worker counts")
+    parser.add_argument("--batch-size", default="1,10,50", help="Comma-separated records per enrich call")
+    parser.add_argument("--base-url", default="", help="Existing endpoint; a mock server is started when empty")
+    parser.add_argument("--ark-timeout", type=float, default=ark_enrich.ARK_CALL_TIMEOUT)
+    parser.add_argument("--ark-hedge", action="store_true")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    mock = None if args.base_url else MockArkServer(config_from_args(args)).start()
+    ark_enrich.ARK_BASE_URL = args.base_url or mock.base_url  # type: ignore[union-attr]
+    os.environ.setdefault("ARK_API_KEY", "loadtest")
+    # The rows are synthetic, so their labels are kept out of the tagger's examples.
+    policy = ArkCallPolicy(
+        call_timeout=args.ark_timeout, budget_seconds=None, hedge=args.ark_hedge, record_examples=False
+    )
+
+    kinds = ["articles", "models"] if args.kind == "both" else [args.kind]
+    try:
+        for kind in kinds:
+            records = synthetic_articles(args.records) if kind == "articles" else synthetic_models(args.records)
+            for concurrency in _int_list(args.concurrency):
+                for batch_size in _int_list(args.batch_size):
+                    print(json.dumps(run_case(kind, records, concurrency, batch_size, policy)), flush=True)
+    finally:
+        if mock is not None:
+            mock.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+CRAWLER_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_TARGETS = ("main", "pipelines.model_pipeline", "pipelines.news_pipeline", "ark_enrich", "sinks")
+
+
+def parse_importtime(stderr: str) -> dict[str, tuple[int, int]]:
+    # `-X importtime` lines: "import time: self [us] | cumulative | imported package".
+    timings: dict[str, tuple[int, int]] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def _import_timings(statement: str, python: str) -> dict[str, tuple[int, int]]:
+    # Every run is a fresh interpreter so nothing is already in sys.modules.
+    completed = subprocess.run(
+        [python, "-X", "importtime", "-c", statement],
+        cwd=CRAWLER_DIR,
+        env={**os.environ, "PYTHONPATH": str(CRAWLER_DIR)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(completed.stderr)
+
+
+def measure(target: str, runs: int, python: str = sys.executable) -> dict[str, object]:
+    # Modules the bare interpreter already loads (site, .pth hooks) are not
+    # attributed to the target.
+    startup = set(_import_timings("pass", python))
+    totals: list[float] = []
+    heaviest: dict[str, list[int]] = {}
+    for _ in range(runs):
+        timings = _import_timings(f"import {target}", python)
+        totals.append(timings[target][1] / 1000)
+        for name, (_, cumulative_us) in timings.items():
+            top_level = name.split(".")[0]
+            if name in startup or top_level == target.split(".")[0] or name != top_level:
+                continue
+            heaviest.setdefault(top_level, []).append(cumulative_us)
+
+    top = sorted(((statistics.median(values) / 1000, name) for name, values in heaviest.items()), reverse=True)
+    return {
+        "target": target,
+        "runs": runs,
+        "median_ms": round(statistics.median(totals), 1),
+        "max_ms": round(max(totals), 1),
+        "heaviest_deps_ms": {name: round(ms, 1) for ms, name in top[:5]},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure cold import time of crawler entry points.")
+    parser.add_argument("--targets", default=",".join(DEFAULT_TARGETS), help="Comma-separated module names")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    for target in [item.strip() for item in args.targets.split(",") if item.strip()]:
+        print(json.dumps(measure(target, args.runs), ensure_ascii=False), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,56 +2,224 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
 from datetime import datetime, timezone
+from functools import partial
 from uuid import uuid4
 
-from db import insert_crawler_run
-from pipelines.model_pipeline import run_model_pipeline
-from pipelines.news_pipeline import run_news_pipeline
-from sources import MODEL_DAILY_LIMIT, NEWS_DAILY_LIMIT
+import archive
+import profiling
+from adapters import check_catalog_adapters, check_parser_backends
+from archive import ArchiveSession, RawArchive
+from ark_enrich import ArkCallPolicy
+from budget import RunBudget
+from parser_pool import ParserPool
+from paths import state_dir
+from profiling import PROFILE_MODES, StageProfiler
+from scheduler import SourceHistory, plan_sources
+from sinks import SINK_NAMES, Sink, get_sink
+from sources import (
+    ARCHIVE_RETENTION,
+    ARK_CALL_TIMEOUT,
+    ARK_ENRICH_BUDGET,
+    DAEMON_HEALTH_PORT,
+    MODEL_DAILY_LIMIT,
+    MODEL_RUN_BUDGET_SHARE,
+    MODEL_SOURCES,
+    NEWS_DAILY_LIMIT,
+    NEWS_SOURCES,
+    QUEUE_IDLE_EXIT,
+    RUN_FINALIZE_RESERVE_SECONDS,
+    Source,
+)
+from url_patterns import UrlPatternStats
 
 
-def run(model_limit: int | None = None, news_limit: int | None = None) -> None:
+def suggest_url_patterns() -> dict[str, object]:
+    suggestions: dict[str, object] = {}
+    for source in NEWS_SOURCES:
+        stats = UrlPatternStats(source.key)
+        suggestions[source.key] = {
+            "configured": list(source.article_patterns),
+            "learned": list(stats.learned_patterns()),
+            "observed": stats.suggest()[:10],
+        }
+    return suggestions
+
+
+def select_sources(only: str | None) -> dict[str, list[Source]]:
+    # --only models | news | source=<key>; maps each pipeline to run onto its sources.
+    if not only:
+        return {"models": list(MODEL_SOURCES), "news": list(NEWS_SOURCES)}
+    if only == "models":
+        return {"models": list(MODEL_SOURCES)}
+    if only == "news":
+        return {"news": list(NEWS_SOURCES)}
+    if only.startswith("source="):
+        key = only.split("=", 1)[1].strip()
+        for pipeline, sources in (("models", MODEL_SOURCES), ("news", NEWS_SOURCES)):
+            matches = [source for source in sources if source.key == key]
+            if matches:
+                return {pipeline: matches}
+        raise ValueError(f"Unknown source: {key}")
+    raise ValueError(f"Invalid --only value: {only} (expected models, news or source=<key>)")
+
+
+def show_schedule(model_limit: int, news_limit: int) -> dict[str, object]:
+    report: dict[str, object] = {}
+    for pipeline, sources, limit in (("models", MODEL_SOURCES, model_limit), ("news", NEWS_SOURCES, news_limit)):
+        history = SourceHistory(pipeline)
+        plans, backed_off = plan_sources(sources, history, limit)
+        report[pipeline] = {
+            "planned": [
+                {
+                    "source": plan.source.key,
+                    "limit": plan.limit,
+                    "yield_rate": round(history.get(plan.source.key).yield_rate, 3),
+                    "failure_rate": round(history.get(plan.source.key).failure_rate, 3),
+                    "latency_s": round(history.get(plan.source.key).latency, 2),
+                }
+                for plan in plans
+            ],
+            "backed_off": backed_off,
+        }
+    return report
+
+
+def run(
+    model_limit: int | None = None,
+    news_limit: int | None = None,
+    mark_removed: bool = False,
+    parse_workers: int = 0,
+    sink_name: str = "supabase",
+    sink_path: str | None = None,
+    ark_policy: ArkCallPolicy | None = None,
+    profile: str | None = None,
+    time_budget: float | None = None,
+    adaptive: bool = True,
+    only: str | None = None,
+    selection: dict[str, list[Source]] | None = None,
+    sink: Sink | None = None,
+    parser: ParserPool | None = None,
+    archive_pages: bool = True,
+    reparse: str | None = None,
+    intervals: dict[str, float] | None = None,
+) -> dict[str, object]:
+    # `selection`, `sink` and `parser` let the daemon reuse warm resources; a
+    # sink passed in is left open for the caller. `intervals` is the daemon's
+    # per-source cadence, which scales adaptive backoff (see plan_sources).
+    selection = selection if selection is not None else select_sources(only)
+    # A single-source refresh is an explicit request, so it ignores backoff, and
+    # a reparse re-processes exactly what the archived run fetched.
+    adaptive = adaptive and not (only or "").startswith("source=") and not reparse
     run_id = f"run_{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}_{uuid4().hex[:8]}"
+    # Raw bodies are archived under the run id; --reparse serves a past run's
+    # bodies back to http_client instead of going to the network.
+    if reparse:
+        pages: ArchiveSession | None = ArchiveSession(RawArchive(), reparse, replay=True)
+    else:
+        pages = ArchiveSession(RawArchive(), run_id) if archive_pages else None
+    archive.activate(pages)
+    owns_sink = sink is None
+    sink = sink if sink is not None else get_sink(sink_name, sink_path)
+    profiler = StageProfiler(profile, state_dir() / "profiles" / run_id) if profile else None
+    profiling.activate(profiler)
     started_at = datetime.now(timezone.utc).isoformat()
     errors: list[str] = []
 
     model_stats = {"sources": 0, "fetched": 0, "deduped": 0, "persisted": 0}
     news_stats = {"sources": 0, "fetched": 0, "deduped": 0, "persisted": 0}
+    budget = RunBudget(time_budget)
 
+    # The crawler_runs row is written even if a stage is interrupted, so a run
+    # cut short by its budget (or by Ctrl-C) still leaves a record behind.
     try:
-        model_stats = run_model_pipeline(limit_per_source=model_limit or MODEL_DAILY_LIMIT, run_id=run_id)
-    except Exception as error:  # noqa: BLE001
-        errors.append(f"model_pipeline: {error}")
+        # Pipelines are imported only when selected, so a models-only or
+        # single-source run never loads the news stack (bs4, parser pool).
+        if "models" in selection:
+            from pipelines.model_pipeline import run_model_pipeline
 
-    try:
-        news_stats = run_news_pipeline(limit_per_source=news_limit or NEWS_DAILY_LIMIT, run_id=run_id)
-    except Exception as error:  # noqa: BLE001
-        errors.append(f"news_pipeline: {error}")
-
-    model_persisted = int(model_stats.get("persisted", 0))
-    article_persisted = int(news_stats.get("persisted", 0))
-
-    if errors:
-        status = "partial" if (model_persisted > 0 or article_persisted > 0) else "failed"
-    elif model_persisted > 0 and article_persisted > 0:
-        status = "success"
-    elif model_persisted > 0 or article_persisted > 0:
-        status = "partial"
-    else:
-        status = "failed"
+            share = MODEL_RUN_BUDGET_SHARE if "news" in selection else 1.0
+            model_errors: list[str] = []
+            try:
+                with profiling.stage("models"):
+                    model_stats = run_model_pipeline(
+                        limit_per_source=model_limit or MODEL_DAILY_LIMIT,
+                        run_id=run_id,
+                        mark_removed=mark_removed,
+                        sink=sink,
+                        ark_policy=ark_policy,
+                        budget=budget.slice("models", share, reserve=RUN_FINALIZE_RESERVE_SECONDS),
+                        adaptive=adaptive,
+                        sources=selection["models"],
+                        incremental=not reparse,
+                        errors=model_errors,
+                        intervals=intervals,
+                    )
+            except Exception as error:  # noqa: BLE001
+                model_errors.append(str(error))
+            errors.extend(f"model_pipeline: {error}" for error in model_errors)
 
-    finished_at = datetime.now(timezone.utc).isoformat()
-    error_message = "\n".join(errors) if errors else None
-    insert_crawler_run(
-        run_id=run_id,
-        started_at=started_at,
-        finished_at=finished_at,
-        status=status,
-        model_persisted=model_persisted,
-        article_persisted=article_persisted,
-        error_message=error_message,
-    )
+        if "news" in selection:
+            from pipelines.news_pipeline import run_news_pipeline
+
+            news_errors: list[str] = []
+            try:
+                with profiling.stage("news"):
+                    news_stats = run_news_pipeline(
+                        limit_per_source=news_limit or NEWS_DAILY_LIMIT,
+                        run_id=run_id,
+                        parse_workers=parse_workers,
+                        errors=news_errors,
+                        sink=sink,
+                        ark_policy=ark_policy,
+                        budget=budget.slice("news", 1.0, reserve=RUN_FINALIZE_RESERVE_SECONDS),
+                        adaptive=adaptive,
+                        sources=selection["news"],
+                        parser=parser,
+                        incremental=not reparse,
+                        intervals=intervals,
+                    )
+            except Exception as error:  # noqa: BLE001
+                news_errors.append(str(error))
+            errors.extend(f"news_pipeline: {error}" for error in news_errors)
+    finally:
+        model_persisted = int(model_stats.get("persisted", 0))
+        article_persisted = int(news_stats.get("persisted", 0))
+        persisted = {"models": model_persisted, "news": article_persisted}
+        selected = [persisted[pipeline] for pipeline in selection]
+
+        if errors:
+            status = "partial" if any(selected) else "failed"
+        elif all(selected):
+            status = "success"
+        elif any(selected):
+            status = "partial"
+        else:
+            status = "failed"
+
+        finished_at = datetime.now(timezone.utc).isoformat()
+        notes = errors + [f"degraded: {step}" for step in budget.degradations]
+        error_message = "\n".join(notes) if notes else None
+        try:
+            sink.insert_crawler_run(
+                run_id=run_id,
+                started_at=started_at,
+                finished_at=finished_at,
+                status=status,
+                model_persisted=model_persisted,
+                article_persisted=article_persisted,
+                error_message=error_message,
+            )
+        finally:
+            if owns_sink:
+                sink.close()
+            profiling.activate(None)
+            if profiler is not None:
+                profiler.close()
+            archive.activate(None)
+            if pages is not None and not pages.replaying:
+                pages.archive.prune(ARCHIVE_RETENTION)
 
     output = {
         "run_id": run_id,
@@ -60,13 +228,242 @@ def run(model_limit: int | None = None, news_limit: int | None = None) -> None:
         "errors": errors,
         "models": model_stats,
         "articles": news_stats,
+        "degradations": budget.degradations,
     }
+    if profiler is not None:
+        output["profile_dir"] = str(profiler.out_dir)
+    if reparse:
+        output["reparsed_from"] = reparse
+    elif pages is not None:
+        output["archived"] = pages.recorded
     print(json.dumps(output, ensure_ascii=False))
+    return output
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run crawler for models and articles.")
     parser.add_argument("--model-limit", type=int, default=0, help="Model limit per source")
     parser.add_argument("--news-limit", type=int, default=0, help="News limit per source")
+    parser.add_argument(
+        "--mark-removed",
+        action="store_true",
+        help="Mark models that disappeared from a fully walked catalog as deprecated",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=0,
+        help="HTML parser processes (0 parses in-process, -1 uses every core)",
+    )
+    parser.add_argument("--sink", choices=SINK_NAMES, default="supabase", help="Persistence backend")
+    parser.add_argument(
+        "--sink-path",
+        default=None,
+        help="SQLite file or JSONL directory for local sinks (defaults under the crawler state dir)",
+    )
+    parser.add_argument(
+        "--suggest-url-patterns",
+        action="store_true",
+        help="Print article URL patterns learned from past extractions and exit",
+    )
+    parser.add_argument("--ark-timeout", type=float, default=ARK_CALL_TIMEOUT, help="Per-call Ark deadline (s)")
+    parser.add_argument(
+        "--ark-budget",
+        type=float,
+        default=ARK_ENRICH_BUDGET,
+        help="Total enrichment time budget per pipeline in seconds (0 = unbounded)",
+    )
+    parser.add_argument(
+        "--ark-hedge",
+        action="store_true",
+        help="Issue a duplicate Ark request when a call exceeds the rolling p95 latency",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=PROFILE_MODES,
+        default=None,
+        help="Profile each stage: cpu (pstats + collapsed stacks) or mem (tracemalloc peaks)",
+    )
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        default=0,
+        help="Wall-clock budget for the whole run in seconds; degrades RSS-only/enrichment to fit (0 = unbounded)",
+    )
+    parser.add_argument(
+        "--no-adaptive",
+        action="store_true",
+        help="Crawl every source at the base limit, ignoring per-source yield history and backoff",
+    )
+    parser.add_argument(
+        "--show-schedule",
+        action="store_true",
+        help="Print which sources the next run would crawl, in order and with what limit, and exit",
+    )
+    parser.add_argument(
+        "--only",
+        default=None,
+        help="Run a subset: models, news, or source=<key> for a single-source refresh",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Stay resident and crawl each source on its own interval (see Source.interval)",
+    )
+    parser.add_argument("--health-host", default="127.0.0.1", help="Daemon health/metrics bind address")
+    parser.add_argument(
+        "--health-port",
+        type=int,
+        default=DAEMON_HEALTH_PORT,
+        help="Daemon port serving /healthz and /metrics (0 disables)",
+    )
+    parser.add_argument(
+        "--enqueue",
+        action="store_true",
+        help="Queue listing tasks for the selected sources (see --only) and exit; --worker processes drain them",
+    )
+    parser.add_argument("--worker", action="store_true", help="Lease and process tasks from the work queue")
+    parser.add_argument("--queue-path", default=None, help="Work queue SQLite file (defaults under the state dir)")
+    parser.add_argument(
+        "--worker-idle-exit",
+        type=float,
+        default=QUEUE_IDLE_EXIT,
+        help="Seconds a worker waits on an empty queue before exiting (0 = never)",
+    )
+    parser.add_argument(
+        "--worker-kinds",
+        default="",
+        help="Comma-separated task kinds this worker takes (listing,detail,enrich_article,enrich_models)",
+    )
+    parser.add_argument("--queue-stats", action="store_true", help="Print task counts by kind and status and exit")
+    parser.add_argument(
+        "--reparse",
+        default=None,
+        metavar="RUN_ID",
+        help="Re-run extraction, enrichment and persistence from the raw pages archived by RUN_ID (no network)",
+    )
+    parser.add_argument("--no-archive", action="store_true", help="Do not archive raw fetched pages")
+    parser.add_argument(
+        "--train-tagger",
+        action="store_true",
+        help="Train the local scenario tagger from Ark-labeled rows (see --tagger-examples) and exit",
+    )
+    parser.add_argument(
+        "--eval-tagger",
+        action="store_true",
+        help="Report held-out agreement between the local tagger and Ark labels and exit",
+    )
+    parser.add_argument(
+        "--tagger-examples",
+        choices=("local", "supabase"),
+        default="local",
+        help="Training rows: labels logged by past runs (local) or tags already stored in Supabase",
+    )
+    parser.add_argument(
+        "--no-local-tagger",
+        action="store_true",
+        help="Always ask Ark for tags/business scenarios, even when the local tagger is confident",
+    )
+    parser.add_argument(
+        "--no-tagger-examples",
+        action="store_true",
+        help="Do not log Ark's labels as tagger training examples (runs against the mock Ark endpoint)",
+    )
     args = parser.parse_args()
-    run(model_limit=args.model_limit, news_limit=args.news_limit)
+    try:
+        check_catalog_adapters()
+        check_parser_backends()
+    except ValueError as error:
+        parser.error(str(error))
+    if args.suggest_url_patterns:
+        print(json.dumps(suggest_url_patterns(), ensure_ascii=False, indent=2))
+        raise SystemExit(0)
+    if args.train_tagger or args.eval_tagger:
+        import tagger
+
+        action = tagger.train if args.train_tagger else tagger.evaluate_kind
+        report = {}
+        for kind in tagger.KINDS:
+            try:
+                report[kind] = action(kind, args.tagger_examples)
+            except ValueError as error:
+                report[kind] = {"kind": kind, "error": str(error)}
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        raise SystemExit(0)
+    if args.show_schedule:
+        report = show_schedule(args.model_limit or MODEL_DAILY_LIMIT, args.news_limit or NEWS_DAILY_LIMIT)
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        raise SystemExit(0)
+    parse_workers = (os.cpu_count() or 1) if args.parse_workers < 0 else args.parse_workers
+    options = {
+        "model_limit": args.model_limit,
+        "news_limit": args.news_limit,
+        "mark_removed": args.mark_removed,
+        "parse_workers": parse_workers,
+        "sink_name": args.sink,
+        "sink_path": args.sink_path,
+        "ark_policy": ArkCallPolicy(
+            call_timeout=args.ark_timeout,
+            budget_seconds=args.ark_budget or None,
+            hedge=args.ark_hedge,
+            local_tagger=not args.no_local_tagger,
+            record_examples=not args.no_tagger_examples,
+        ),
+        "time_budget": args.time_budget or None,
+        "adaptive": not args.no_adaptive,
+        "archive_pages": not args.no_archive,
+    }
+    if args.enqueue or args.worker or args.queue_stats:
+        from workqueue import WorkQueue
+
+        queue = WorkQueue(args.queue_path)
+        if args.queue_stats:
+            print(json.dumps(queue.counts(), ensure_ascii=False))
+        if args.enqueue:
+            from worker import enqueue_run
+
+            run_id = f"run_{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}_{uuid4().hex[:8]}"
+            limits = {"models": args.model_limit or MODEL_DAILY_LIMIT, "news": args.news_limit or NEWS_DAILY_LIMIT}
+            enqueued = enqueue_run(queue, select_sources(args.only), run_id, limits, adaptive=not args.no_adaptive)
+            print(json.dumps({"run_id": run_id, "enqueued": enqueued}))
+        if args.worker:
+            import signal
+            import threading
+
+            from worker import Worker
+
+            stop = threading.Event()
+            signal.signal(signal.SIGTERM, lambda *_args: stop.set())
+            signal.signal(signal.SIGINT, lambda *_args: stop.set())
+            sink = get_sink(args.sink, args.sink_path)
+            pool = ParserPool(parse_workers)
+            try:
+                worker = Worker(
+                    queue,
+                    sink,
+                    parser=pool,
+                    ark_policy=options["ark_policy"],
+                    archive=RawArchive() if not args.no_archive else None,
+                )
+                kinds = tuple(kind.strip() for kind in args.worker_kinds.split(",") if kind.strip())
+                summary = worker.drain(kinds=kinds, idle_exit=args.worker_idle_exit, stop_event=stop)
+                print(json.dumps({"worker": worker.owner, **summary, "queue": queue.counts()}, ensure_ascii=False))
+            finally:
+                pool.close()
+                sink.close()
+        queue.close()
+        raise SystemExit(0)
+    if args.daemon:
+        from daemon import run_daemon
+
+        run_daemon(
+            partial(run, **options),
+            sink_name=args.sink,
+            sink_path=args.sink_path,
+            parse_workers=parse_workers,
+            selection=select_sources(args.only),
+            health_host=args.health_host,
+            health_port=args.health_port,
+        )
+        raise SystemExit(0)
+    run(**options, only=args.only, profile=args.profile, reparse=args.reparse)
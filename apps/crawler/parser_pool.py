@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+class ParserPool:
+    # workers=0 parses in-process; workers>0 ships raw bytes to a process pool so
+    # BeautifulSoup runs outside the GIL of the fetching process.
+    def __init__(self, workers: int = 0) -> None:
+        self.workers = max(0, workers)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers) if self.workers else None
+
+    def submit(self, fn: Callable[..., T], *args: Any) -> Future[T]:
+        if self._executor is not None:
+            return self._executor.submit(fn, *args)
+        future: Future[T] = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as error:  # noqa: BLE001
+            future.set_exception(error)
+        return future
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self) -> ParserPool:
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        self.close()
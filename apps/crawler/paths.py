@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import fcntl
+import os
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+DEFAULT_STATE_DIR = Path(__file__).resolve().parent / ".state"
+
+
+def state_dir() -> Path:
+    raw = os.getenv("CRAWLER_STATE_DIR", "").strip()
+    path = Path(raw) if raw else DEFAULT_STATE_DIR
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def state_path(*parts: str) -> Path:
+    path = state_dir().joinpath(*parts)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def write_atomic(path: Path, text: str) -> None:
+    # Readers (other workers, the next cycle) never see a half-written file.
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+@contextmanager
+def locked(path: Path) -> Iterator[None]:
+    # Exclusive flock on a sidecar file, held across a read-merge-write of a
+    # state file that several workers update.
+    with path.with_name(f"{path.name}.lock").open("a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
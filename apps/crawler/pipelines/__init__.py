@@ -1,5 +1,21 @@
 # pipelines package
-from .model_pipeline import run_model_pipeline
-from .news_pipeline import run_news_pipeline
+# Pipelines are resolved on first access so that importing one (or the package)
+# does not pull in the other's dependencies.
+from __future__ import annotations
+
+from importlib import import_module
+from typing import Any
+
+_EXPORTS = {
+    "run_model_pipeline": ".model_pipeline",
+    "run_news_pipeline": ".news_pipeline",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(_EXPORTS[name], __name__), name)
+
 
 __all__ = ["run_model_pipeline", "run_news_pipeline"]
@@ -1,31 +1,206 @@
 from __future__ import annotations
 
-from dataclasses import asdict
+import time
+from dataclasses import asdict, replace
 
+import profiling
 from adapters.models import fetch_models_for_source
-from ark_enrich import enrich_models
-from db import upsert_models
+from ark_enrich import ArkCallPolicy, ArkStats, enrich_models, typical_call_seconds
+from budget import RunBudget, enrichment_plan
+from db import mark_models_deprecated, refresh_scenario_stats, upsert_model_aliases, upsert_models
+from deadletter import DeadLetters
+from entities import EntityIndex
 from records import ModelRecord
-from sources import MODEL_DAILY_LIMIT, MODEL_SOURCES
+from scheduler import SourceHistory, plan_sources, unplanned
+from sinks import Sink
+from snapshots import CatalogSnapshot
+from sources import (
+    DLQ_RETRY_BATCH,
+    MODEL_DAILY_LIMIT,
+    MODEL_FETCH_BUDGET_SHARE,
+    MODEL_SOURCES,
+    UPSERT_RESERVE_SECONDS,
+    Source,
+)
 from transform import dedupe_models_by_provider_name
 
 
-def run_model_pipeline(limit_per_source: int = MODEL_DAILY_LIMIT, run_id: str | None = None) -> dict[str, int]:
+def _dead_letter_key(row: ModelRecord) -> str:
+    return f"{row.provider}/{row.name}"
+
+
+def run_model_pipeline(
+    limit_per_source: int = MODEL_DAILY_LIMIT,
+    run_id: str | None = None,
+    mark_removed: bool = False,
+    sink: Sink | None = None,
+    ark_policy: ArkCallPolicy | None = None,
+    budget: RunBudget | None = None,
+    adaptive: bool = True,
+    sources: list[Source] | None = None,
+    incremental: bool = True,
+    errors: list[str] | None = None,
+    intervals: dict[str, float] | None = None,
+) -> dict[str, int]:
+    # `incremental=False` (reparse) re-processes every fetched model: no snapshot
+    # diff and no scheduling history, since nothing new was crawled.
+    sources = MODEL_SOURCES if sources is None else sources
+    budget = budget or RunBudget(None, name="models")
+    fetch_budget = budget.slice("fetch", MODEL_FETCH_BUDGET_SHARE)
+    # With snapshots every fetched model is new or changed, so the fetched count
+    # is the yield; a catalog that stops changing backs off (see scheduler.py).
+    history = SourceHistory("models")
+    if adaptive:
+        plans, backed_off = plan_sources(sources, history, limit_per_source, intervals=intervals)
+    else:
+        plans, backed_off = unplanned(sources, limit_per_source), []
     fetched: list[ModelRecord] = []
-    for source in MODEL_SOURCES:
+    snapshots: list[CatalogSnapshot] = []
+    for index, plan in enumerate(plans):
+        source = plan.source
+        snapshot = CatalogSnapshot(source.key) if incremental else None
+        source_budget = fetch_budget.slice(source.key, 1 / (len(plans) - index))
+        started = time.monotonic()
         try:
-            fetched.extend(fetch_models_for_source(source, limit=limit_per_source))
+            with profiling.stage("fetch"):
+                rows = fetch_models_for_source(
+                    source,
+                    limit=plan.limit,
+                    snapshot=snapshot,
+                    deadline=source_budget.deadline if source_budget.bounded else None,
+                )
         except Exception:  # noqa: BLE001
+            if incremental:
+                history.record(source.key, plan.limit, 0, failed=True, seconds=time.monotonic() - started)
             continue
+        fetched.extend(rows)
+        if incremental:
+            history.record(source.key, plan.limit, len(rows), failed=False, seconds=time.monotonic() - started)
+            snapshots.append(snapshot)
+    if incremental:
+        history.save()
+
+    with profiling.stage("dedupe"):
+        deduped = dedupe_models_by_provider_name([asdict(row) for row in fetched])
+        # Cross-provider aliases (openai/gpt-4o, gpt-4o, HF mirrors) collapse
+        # onto one canonical entity, so each model is enriched and stored once.
+        entities = EntityIndex()
+        model_rows, aliases = entities.resolve([ModelRecord(**row) for row in deduped])
+        entities.save()
+    ark_stats = ArkStats()
+    dead_letters = DeadLetters()
+    with profiling.stage("enrich"):
+        # Catalog order is already popularity/recency order, so it doubles as the
+        # enrichment priority when the budget cannot cover every row. Due
+        # dead-lettered models are retried after this run's rows.
+        fresh_keys = {_dead_letter_key(row) for row in model_rows}
+        partial = set(entities.partial)
+        retries: list[ModelRecord] = []
+        for key, payload in dead_letters.due("model", DLQ_RETRY_BATCH):
+            if key in fresh_keys:
+                continue
+            row = ModelRecord(**{name: value for name, value in payload.items() if name != "partial"})
+            if payload.get("partial"):
+                partial.add((row.provider, row.name))
+            retries.append(row)
+        candidates = model_rows + retries
+        enrich_budget = budget.slice("enrich", 1.0, reserve=UPSERT_RESERVE_SECONDS)
+        enrich_count, step = enrichment_plan(len(candidates), enrich_budget, typical_call_seconds())
+        if step:
+            budget.degrade(step, f"{len(candidates) - enrich_count} of {len(candidates)} models stored without Ark")
+        policy = ark_policy
+        if enrich_budget.bounded:
+            policy = replace(ark_policy or ArkCallPolicy(), budget_seconds=enrich_budget.remaining())
+        failures: list[tuple[ModelRecord, str]] = []
+        enriched = (
+            enrich_models(candidates[:enrich_count], stats=ark_stats, policy=policy, failures=failures)
+            if enrich_count
+            else []
+        )
+        for row, reason in failures:
+            payload = {**asdict(row), "partial": (row.provider, row.name) in partial}
+            dead_letters.add("model", _dead_letter_key(row), payload, reason)
+        raw: list[ModelRecord] = []
+        if budget.bounded:
+            enriched_keys = {(row.provider, row.name) for row in enriched}
+            raw = [row for row in candidates if (row.provider, row.name) not in enriched_keys]
+
+    with profiling.stage("upsert"):
+        persist = sink.upsert_models if sink is not None else upsert_models
+        # Canonical rows built from alias data only are written over the stored
+        # canonical field by field (see EntityIndex.resolve).
+        whole = [row for row in enriched if (row.provider, row.name) not in partial]
+        merged = [row for row in enriched if (row.provider, row.name) in partial]
+        persisted = persist(whole, run_id=run_id)
+        if merged:
+            persisted += persist(merged, run_id=run_id, partial=True)
+        # Rows stored raw leave out description and business scenarios, so a
+        # stored model keeps what Ark wrote for it earlier.
+        raw_whole = [row for row in raw if (row.provider, row.name) not in partial]
+        raw_merged = [row for row in raw if (row.provider, row.name) in partial]
+        if raw_whole:
+            persisted += persist(raw_whole, run_id=run_id, raw=True)
+        if raw_merged:
+            persisted += persist(raw_merged, run_id=run_id, partial=True, raw=True)
+
+        # Every alias's canonical is among this run's rows, so a link is stored
+        # once that row has been.
+        stored = {(row.provider, row.name) for row in enriched + raw}
+        linked = [alias for alias in aliases if (alias.canonical_provider, alias.canonical_name) in stored]
+        link = sink.upsert_model_aliases if sink is not None else upsert_model_aliases
+        link(linked, run_id=run_id)
+
+        removed = [model for snapshot in snapshots for model in snapshot.removed()]
+        deprecate = sink.mark_models_deprecated if sink is not None else mark_models_deprecated
+        deprecated = deprecate(removed, run_id=run_id) if mark_removed else 0
+
+        # Snapshots advance only for models that were enriched and persisted, so
+        # anything skipped or stored raw (e.g. by a time budget) is retried next
+        # run; an alias advances only once its data went out with its enriched
+        # canonical. Dead-lettered models advance too: the dead-letter store owns
+        # their retries.
+        enriched_keys = {(row.provider, row.name) for row in enriched}
+        failed_keys = {(row.provider, row.name) for row, _reason in failures}
+        kept = enriched_keys | failed_keys | {
+            (alias.alias_provider, alias.alias_name)
+            for alias in linked
+            if (alias.canonical_provider, alias.canonical_name) in enriched_keys
+        }
+        for snapshot in snapshots:
+            snapshot.discard_except(kept)
+            snapshot.commit()
+
+    with profiling.stage("aggregate"):
+        # Only the scenarios this run wrote to are recomputed, plus those the
+        # store marked dirty when a model left them (re-tagged or deprecated).
+        scenarios = sorted({tag for row in enriched for tag in row.business_scenarios})
+        refresh = sink.refresh_scenario_stats if sink is not None else refresh_scenario_stats
+        try:
+            refreshed = refresh(scenarios, run_id=run_id) if persisted or deprecated else 0
+        except RuntimeError as error:
+            refreshed = 0
+            if errors is not None:
+                errors.append(f"scenario_stats: {error}")
 
-    deduped = dedupe_models_by_provider_name([asdict(row) for row in fetched])
-    model_rows = [ModelRecord(**row) for row in deduped]
-    enriched = enrich_models(model_rows)
-    persisted = upsert_models(enriched, run_id=run_id)
+    recovered = dead_letters.resolve("model", [_dead_letter_key(row) for row in enriched])
+    dlq_depth = dead_letters.depth("model")
+    dead_letters.close()
 
     return {
-        "sources": len(MODEL_SOURCES),
+        "sources": len(plans),
+        "backed_off": len(backed_off),
         "fetched": len(fetched),
         "deduped": len(model_rows),
+        "aliased": len(aliases),
         "persisted": persisted,
+        **ark_stats.as_dict(),
+        "added": sum(snapshot.added for snapshot in snapshots),
+        "changed": sum(snapshot.changed for snapshot in snapshots),
+        "removed": len(removed),
+        "deprecated": deprecated,
+        "scenarios_refreshed": refreshed,
+        "dead_lettered": len(failures),
+        "dlq_retried": len(retries),
+        "dlq_recovered": recovered,
+        "dlq_depth": dlq_depth,
     }
@@ -1,31 +1,202 @@
 from __future__ import annotations
 
-from dataclasses import asdict
+import time
+from contextlib import nullcontext
+from dataclasses import asdict, replace
+from datetime import datetime
 
+import profiling
 from adapters.news import fetch_news_for_source
-from ark_enrich import enrich_articles
-from db import upsert_articles
+from ark_enrich import ArkCallPolicy, ArkStats, enrich_articles, typical_call_seconds
+from budget import RSS_ONLY, RSS_ONLY_MIN_SOURCE_SECONDS, RunBudget, enrichment_plan
+from db import refresh_scenario_stats, upsert_articles
+from deadletter import DeadLetters
+from parser_pool import ParserPool
 from records import ArticleRecord
-from sources import NEWS_DAILY_LIMIT, NEWS_SOURCES
+from scheduler import SourceHistory, plan_sources, unplanned
+from sitemaps import SitemapState
+from sinks import Sink
+from sources import (
+    DLQ_RETRY_BATCH,
+    NEWS_DAILY_LIMIT,
+    NEWS_FETCH_BUDGET_SHARE,
+    NEWS_SOURCES,
+    UPSERT_RESERVE_SECONDS,
+    Source,
+)
 from transform import dedupe_by_url
 
 
-def run_news_pipeline(limit_per_source: int = NEWS_DAILY_LIMIT, run_id: str | None = None) -> dict[str, int]:
+def _article_priority(row: ArticleRecord) -> tuple[bool, str]:
+    # Newest first, and rows with extracted content ahead of title-only ones.
+    return (bool(row.content), row.published_at or "")
+
+
+def run_news_pipeline(
+    limit_per_source: int = NEWS_DAILY_LIMIT,
+    run_id: str | None = None,
+    parse_workers: int = 0,
+    errors: list[str] | None = None,
+    sink: Sink | None = None,
+    ark_policy: ArkCallPolicy | None = None,
+    budget: RunBudget | None = None,
+    adaptive: bool = True,
+    sources: list[Source] | None = None,
+    parser: ParserPool | None = None,
+    incremental: bool = True,
+    intervals: dict[str, float] | None = None,
+) -> dict[str, int]:
+    # `incremental=False` (reparse) keeps the per-source history untouched and
+    # ignores its publish-date watermark.
+    sources = NEWS_SOURCES if sources is None else sources
+    budget = budget or RunBudget(None, name="news")
+    fetch_budget = budget.slice("fetch", NEWS_FETCH_BUDGET_SHARE)
+    history = SourceHistory("news")
+    if adaptive:
+        plans, backed_off = plan_sources(sources, history, limit_per_source, intervals=intervals)
+    else:
+        plans, backed_off = unplanned(sources, limit_per_source), []
     fetched: list[ArticleRecord] = []
-    for source in NEWS_SOURCES:
-        try:
-            fetched.extend(fetch_news_for_source(source, limit=limit_per_source))
-        except Exception:  # noqa: BLE001
-            continue
+    source_keys: dict[str, str] = {}
+    sitemap_states: list[SitemapState] = []
+    new_urls = 0
+    # A caller-owned pool (the daemon's) stays warm across runs; otherwise one is
+    # created for this run and shut down with it.
+    with nullcontext(parser) if parser is not None else ParserPool(parse_workers) as parser:
+        for index, plan in enumerate(plans):
+            source = plan.source
+            # Each source gets an equal share of whatever fetch time is left, so
+            # a slow source early on squeezes the later ones instead of starving them.
+            source_budget = fetch_budget.slice(source.key, 1 / (len(plans) - index))
+            rss_only = (
+                source_budget.bounded
+                and bool(source.fallback)
+                and source_budget.remaining() < RSS_ONLY_MIN_SOURCE_SECONDS
+            )
+            if rss_only:
+                budget.degrade(RSS_ONLY, source.key)
+            # Single-source refreshes (adaptive off) re-crawl regardless of what
+            # has been stored before.
+            since = history.get(source.key).latest_published if adaptive and incremental else None
+            sitemap_state = SitemapState(source.key) if source.sitemaps and adaptive and incremental else None
+            started = time.monotonic()
+            try:
+                with profiling.stage("fetch"):
+                    rows = fetch_news_for_source(
+                        source,
+                        limit=plan.limit,
+                        parser=parser,
+                        rss_only=rss_only,
+                        deadline=source_budget.deadline if source_budget.bounded else None,
+                        since=datetime.fromisoformat(since) if since else None,
+                        sitemap_state=sitemap_state,
+                    )
+            except Exception:  # noqa: BLE001
+                if incremental:
+                    history.record(source.key, plan.limit, 0, failed=True, seconds=time.monotonic() - started)
+                continue
+            urls = [row.url for row in rows]
+            new = len(history.unseen(source.key, urls))
+            if incremental:
+                history.record(
+                    source.key,
+                    plan.limit,
+                    new,
+                    failed=False,
+                    seconds=time.monotonic() - started,
+                    urls=urls,
+                )
+            new_urls += new
+            fetched.extend(rows)
+            source_keys.update((url, source.key) for url in urls)
+            if sitemap_state is not None:
+                sitemap_states.append(sitemap_state)
 
-    deduped = dedupe_by_url([asdict(row) for row in fetched])
-    article_rows = [ArticleRecord(**row) for row in deduped]
-    enriched = enrich_articles(article_rows)
-    persisted = upsert_articles(enriched, run_id=run_id)
+    with profiling.stage("dedupe"):
+        deduped = dedupe_by_url([asdict(row) for row in fetched])
+        article_rows = [ArticleRecord(**row) for row in deduped]
+    ark_stats = ArkStats()
+    dead_letters = DeadLetters()
+    with profiling.stage("enrich"):
+        enrich_budget = budget.slice("enrich", 1.0, reserve=UPSERT_RESERVE_SECONDS)
+        ordered = sorted(article_rows, key=_article_priority, reverse=True)
+        # Dead-lettered articles that are due again queue up behind this run's
+        # fresh rows, so a retry never takes budget from new content.
+        fresh_urls = {row.url for row in ordered}
+        retries = [
+            ArticleRecord(**payload)
+            for url, payload in dead_letters.due("article", DLQ_RETRY_BATCH)
+            if url not in fresh_urls
+        ]
+        ordered.extend(retries)
+        enrich_count, step = enrichment_plan(len(ordered), enrich_budget, typical_call_seconds())
+        if step:
+            budget.degrade(step, f"{len(ordered) - enrich_count} of {len(ordered)} articles stored without Ark")
+        policy = ark_policy
+        if enrich_budget.bounded:
+            policy = replace(ark_policy or ArkCallPolicy(), budget_seconds=enrich_budget.remaining())
+        failures: list[tuple[ArticleRecord, str]] = []
+        enriched = (
+            enrich_articles(ordered[:enrich_count], stats=ark_stats, policy=policy, failures=failures)
+            if enrich_count
+            else []
+        )
+        for row, reason in failures:
+            dead_letters.add("article", row.url, asdict(row), reason)
+        recovered_urls = [row.url for row in enriched]
+        # Rows the enrichment budget (run budget or ARK_ENRICH_BUDGET) did not
+        # reach are still stored raw: the publish-date watermark moves past them
+        # below, so they would not be discovered again. A later run can fill in
+        # summaries and tags. Dead-lettered rows are retried from that store.
+        handled = {row.url for row in enriched} | {row.url for row, _reason in failures}
+        raw = [row for row in ordered if row.url not in handled]
+    upsert_errors: list[str] = []
+    with profiling.stage("upsert"):
+        persist = sink.upsert_articles if sink is not None else upsert_articles
+        persisted = persist(enriched, run_id=run_id, errors=upsert_errors)
+        if raw:
+            # Without summary and tags, so an article stored earlier keeps its
+            # enrichment.
+            persisted += persist(raw, run_id=run_id, errors=upsert_errors, raw=True)
+    if errors is not None:
+        errors.extend(upsert_errors)
+    # Publish-date and sitemap watermarks move only past articles that were
+    # stored; after a failed chunk the same items are discovered again.
+    if not upsert_errors:
+        for row in enriched + raw:
+            if row.url in source_keys and incremental:
+                history.advance(source_keys[row.url], row.published_at)
+        for sitemap_state in sitemap_states:
+            sitemap_state.commit()
+    if incremental:
+        history.save()
+    with profiling.stage("aggregate"):
+        # Only the scenarios this run wrote to are recomputed, plus those the
+        # store marked dirty when an article was re-tagged.
+        scenarios = sorted({tag for row in enriched for tag in row.tags})
+        refresh = sink.refresh_scenario_stats if sink is not None else refresh_scenario_stats
+        try:
+            refreshed = refresh(scenarios, run_id=run_id) if persisted else 0
+        except RuntimeError as error:
+            refreshed = 0
+            if errors is not None:
+                errors.append(f"scenario_stats: {error}")
+    recovered = dead_letters.resolve("article", recovered_urls)
+    dlq_depth = dead_letters.depth("article")
+    dead_letters.close()
 
     return {
-        "sources": len(NEWS_SOURCES),
+        "sources": len(plans),
+        "backed_off": len(backed_off),
         "fetched": len(fetched),
+        "new": new_urls,
         "deduped": len(article_rows),
         "persisted": persisted,
+        **ark_stats.as_dict(),
+        "failed_chunks": len(upsert_errors),
+        "scenarios_refreshed": refreshed,
+        "dead_lettered": len(failures),
+        "dlq_retried": len(retries),
+        "dlq_recovered": recovered,
+        "dlq_depth": dlq_depth,
     }
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import cProfile
+import json
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from types import FrameType
+
+PROFILE_MODES = ("cpu", "mem")
+SAMPLE_INTERVAL = 0.005
+MEMORY_TOP_LINES = 25
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class StageProfiler:
+    # Stages nest (e.g. news -> fetch -> parse) and are keyed by their dotted
+    # path. Only one stage is measured at a time: entering a child pauses the
+    # parent's cProfile so time is attributed to the innermost stage.
+    def __init__(self, mode: str, out_dir: Path, sample_interval: float = SAMPLE_INTERVAL) -> None:
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.mode = mode
+        self.out_dir = out_dir
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.sample_interval = sample_interval
+        self._stack: list[str] = []
+        self._lock = threading.Lock()
+        self._profiles: dict[str, cProfile.Profile] = {}
+        self._samples: dict[str, Counter[str]] = {}
+        self._peaks: dict[str, int] = {}
+        self._snapshots: dict[str, tracemalloc.Snapshot] = {}
+        self._running_peaks: list[int] = []
+        self._thread_id = threading.get_ident()
+        self._pid = os.getpid()
+        self._stop = threading.Event()
+        self._sampler: threading.Thread | None = None
+        if mode == "cpu":
+            self._sampler = threading.Thread(target=self._sample_loop, name="stage-sampler", daemon=True)
+            self._sampler.start()
+        else:
+            tracemalloc.start(25)
+
+    def _current(self) -> str | None:
+        return ".".join(self._stack) if self._stack else None
+
+    def _sample_loop(self) -> None:
+        while not self._stop.wait(self.sample_interval):
+            with self._lock:
+                stage = self._current()
+            if stage is None:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            labels: list[str] = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            stack = ";".join([*stage.split("."), *reversed(labels)])
+            with self._lock:
+                self._samples.setdefault(stage, Counter())[stack] += 1
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        # Forked parser workers (--parse-workers) inherit the profiler but never
+        # close it, so stages run there are not measured; their parse time shows
+        # up in the parent's enclosing stage as waiting on the pool.
+        if threading.get_ident() != self._thread_id or os.getpid() != self._pid:
+            yield
+            return
+        parent = self._current()
+        with self._lock:
+            self._stack.append(name)
+            key = ".".join(self._stack)
+        if self.mode == "cpu":
+            if parent is not None:
+                self._profiles[parent].disable()
+            profile = self._profiles.setdefault(key, cProfile.Profile())
+            profile.enable()
+        else:
+            if self._running_peaks:
+                self._running_peaks[-1] = max(self._running_peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._running_peaks.append(0)
+        try:
+            yield
+        finally:
+            if self.mode == "cpu":
+                self._profiles[key].disable()
+                if parent is not None:
+                    self._profiles[parent].enable()
+            else:
+                peak = max(self._running_peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if self._running_peaks:
+                    self._running_peaks[-1] = max(self._running_peaks[-1], peak)
+                # A stage entered once per page (parse) would otherwise be
+                # snapshotted on every exit; only a new high is kept, and each
+                # stage's snapshot is written once, at close.
+                if peak > self._peaks.get(key, -1):
+                    self._peaks[key] = peak
+                    self._snapshots[key] = tracemalloc.take_snapshot()
+                tracemalloc.reset_peak()
+            with self._lock:
+                self._stack.pop()
+
+    def _write_snapshot(self, key: str, snapshot: tracemalloc.Snapshot) -> None:
+        snapshot = snapshot.filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen *>"))
+        )
+        snapshot.dump(str(self.out_dir / f"{key}.tracemalloc"))
+        lines = [str(stat) for stat in snapshot.statistics("lineno")[:MEMORY_TOP_LINES]]
+        (self.out_dir / f"{key}.mem.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    def close(self) -> None:
+        if self.mode == "cpu":
+            self._stop.set()
+            if self._sampler is not None:
+                self._sampler.join()
+            for key, profile in self._profiles.items():
+                profile.dump_stats(str(self.out_dir / f"{key}.pstats"))
+            combined: Counter[str] = Counter()
+            for key, samples in self._samples.items():
+                combined.update(samples)
+                self._write_collapsed(self.out_dir / f"{key}.collapsed", samples)
+            self._write_collapsed(self.out_dir / "all.collapsed", combined)
+        else:
+            tracemalloc.stop()
+            for key, snapshot in self._snapshots.items():
+                self._write_snapshot(key, snapshot)
+            summary = {key: {"peak_bytes": peak} for key, peak in sorted(self._peaks.items())}
+            (self.out_dir / "memory.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
+
+    @staticmethod
+    def _write_collapsed(path: Path, samples: Counter[str]) -> None:
+        # Brendan Gregg's folded format: "frame;frame;frame count" per line.
+        path.write_text("".join(f"{stack} {count}\n" for stack, count in samples.most_common()), encoding="utf-8")
+
+
+_ACTIVE: StageProfiler | None = None
+
+
+def activate(profiler: StageProfiler | None) -> None:
+    global _ACTIVE
+    _ACTIVE = profiler
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    if _ACTIVE is None:
+        yield
+        return
+    with _ACTIVE.stage(name):
+        yield
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import math
+import re
+
+# Trailer phrasing only: an article about copyright law, a company's WeChat
+# account or an event's sign-ups keeps its sentences; "版权所有", "欢迎转发"
+# and "扫码报名" do not survive. Sentences are stripped, so ^ is their start.
+BOILERPLATE_PATTERNS = (
+    r"版权(所有|声明|归.{0,20}所有)|著作权归|未经.{0,8}(授权|许可).{0,12}(转载|使用|复制)|禁止转载|"
+    r"转载请(注明|联系)|授权转载|^免责声明",
+    r"^(责任编辑|编辑|作者|来源|原标题|撰文|校对|排版)[:：]|^本文(来自|来源|经授权|转载自|首发于)",
+    r"扫码(关注|添加|加入|报名|下载|阅读|获取|领取)|扫描.{0,4}二维码|关注(我们|本)?的?(微信)?公众号|^(请|欢迎)?关注我们|"
+    r"^(点击|戳)(阅读|下方|上方|关注|这里)|阅读原文|^(加群|微信号)|(加入|添加).{0,4}(读者群|交流群|社群|小助手)",
+    r"^(分享到|推荐阅读|相关阅读|延伸阅读|往期回顾)|(欢迎|求|记得)(点赞|在看|转发|分享|投稿)|"
+    r"(点赞|在看|转发)(、|和|或)(点赞|在看|转发|分享)|^(投稿|商务合作|联系我们)[:：]|"
+    r"(点击|立即|扫码).{0,4}报名|报名(链接|通道|入口|方式)[:：]?",
+    r"copyright ©|©\s*\d{4}|all rights reserved|(subscribe|sign up) (to|for) (our|the|this)|"
+    r"^(subscribe|follow us|share (this|on))\b",
+)
+
+_BOILERPLATE = re.compile("|".join(f"(?:{pattern})" for pattern in BOILERPLATE_PATTERNS), re.IGNORECASE)
+# A sentence and the whitespace after it, which is put back between the kept
+# sentences: CJK sentences run together, latin ones and lines must not.
+_SENTENCE = re.compile(r"([^。！？!?；;\n]+[。！？!?；;]?)(\s*)")
+_CJK = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]")
+_WORD = re.compile(r"[A-Za-z0-9]+(?:[.'-][A-Za-z0-9]+)*|[^\sA-Za-z0-9\u3400-\u9fff\uf900-\ufaff]")
+_NUMBER = re.compile(r"\d")
+
+LEAD_SENTENCES = 2
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough upper bound for BPE tokenisers: one token per CJK character and
+    # ~1.3 per latin word or symbol. Used only when the API omits usage.
+    cjk = len(_CJK.findall(text))
+    other = len(_WORD.findall(_CJK.sub(" ", text)))
+    return cjk + math.ceil(other * 1.3)
+
+
+def _split(text: str) -> list[tuple[str, str]]:
+    pairs = []
+    for match in _SENTENCE.finditer(text):
+        sentence, space = match.group(1).strip(), match.group(2)
+        if sentence:
+            pairs.append((sentence, "\n" if "\n" in space else " " if space else ""))
+    return pairs
+
+
+def split_sentences(text: str) -> list[str]:
+    return [sentence for sentence, _separator in _split(text)]
+
+
+def _is_boilerplate(sentence: str) -> bool:
+    return len(sentence) < 6 or bool(_BOILERPLATE.search(sentence))
+
+
+def _sentence_key(sentence: str) -> str:
+    return re.sub(r"\W+", "", sentence.lower())
+
+
+def _clean(text: str) -> list[tuple[str, str]]:
+    seen: set[str] = set()
+    result: list[tuple[str, str]] = []
+    for sentence, separator in _split(text):
+        if _is_boilerplate(sentence):
+            continue
+        key = _sentence_key(sentence)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        result.append((sentence, separator))
+    return result
+
+
+def clean_sentences(text: str) -> list[str]:
+    return [sentence for sentence, _separator in _clean(text)]
+
+
+def _score(sentence: str, keywords: tuple[str, ...], title_terms: set[str]) -> float:
+    lowered = sentence.lower()
+    score = sum(2.0 for word in keywords if word in lowered)
+    score += sum(1.0 for term in title_terms if term in lowered)
+    if _NUMBER.search(sentence):
+        score += 0.5
+    return score + min(len(sentence), 80) / 80
+
+
+def compact_text(
+    text: str,
+    token_budget: int,
+    title: str = "",
+    keywords: tuple[str, ...] = (),
+) -> str:
+    pairs = _clean(text)
+    if not pairs:
+        return ""
+    sentences = [sentence for sentence, _separator in pairs]
+
+    # Lead sentences always go first; the rest are ranked by keyword and title
+    # overlap and re-emitted in document order once the budget is filled.
+    title_terms = {title[i : i + 2].lower() for i in range(max(0, len(title) - 1)) if title[i : i + 2].strip()}
+    chosen: set[int] = set()
+    used = 0
+    ranked = list(range(min(LEAD_SENTENCES, len(sentences))))
+    ranked += sorted(
+        range(len(ranked), len(sentences)),
+        key=lambda index: _score(sentences[index], keywords, title_terms),
+        reverse=True,
+    )
+    for index in ranked:
+        cost = estimate_tokens(sentences[index])
+        if used + cost > token_budget:
+            continue
+        chosen.add(index)
+        used += cost
+    return "".join(sentences[index] + pairs[index][1] for index in sorted(chosen)).strip()
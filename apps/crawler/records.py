@@ -24,3 +24,11 @@ class ArticleRecord:
     content: str = ""
     tags: list[str] = field(default_factory=list)
     published_at: str | None = None
+
+
+@dataclass
+class ModelAlias:
+    alias_provider: str
+    alias_name: str
+    canonical_provider: str
+    canonical_name: str
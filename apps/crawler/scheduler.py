@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from paths import locked, state_path, write_atomic
+from sources import (
+    SCHEDULE_BACKOFF_INTERVAL,
+    SCHEDULE_BACKOFF_SHARE,
+    SCHEDULE_MAX_BACKOFF,
+    SCHEDULE_MAX_LIMIT_FACTOR,
+    SCHEDULE_MIN_LIMIT,
+    SCHEDULE_SEEN_URLS,
+    SCHEDULE_SMOOTHING,
+    Source,
+)
+
+
+def url_digest(url: str) -> str:
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class SourceStats:
+    # Rates are exponentially smoothed over runs. A source with no history
+    # starts optimistic (full yield) so it is crawled at the base limit.
+    runs: int = 0
+    yield_rate: float = 1.0
+    failure_rate: float = 0.0
+    latency: float = 0.0
+    idle_streak: int = 0
+    last_run_at: float = 0.0
+    # Smoothed seconds between runs that were not held back by backoff: the
+    # cadence the source is crawled at (cron schedule, daemon interval).
+    cadence: float = 0.0
+    latest_published: str | None = None
+    seen: list[str] = field(default_factory=list)
+
+    def next_due_at(self, unit: float = SCHEDULE_BACKOFF_INTERVAL) -> float:
+        # Each consecutive run without new items doubles the wait: one unit,
+        # then three, seven... capped at SCHEDULE_MAX_BACKOFF.
+        if self.idle_streak == 0:
+            return 0.0
+        wait = min(unit * (2**self.idle_streak - 1), SCHEDULE_MAX_BACKOFF)
+        return self.last_run_at + wait
+
+    def weight(self) -> float:
+        return max(0.05, self.yield_rate * (1.0 - self.failure_rate))
+
+
+class SourceHistory:
+    def __init__(self, pipeline: str, path: Path | None = None) -> None:
+        self.path = path or state_path("schedule", f"{pipeline}.json")
+        self.sources = self._load()
+        # Sources updated since loading; save writes only these.
+        self._dirty: set[str] = set()
+
+    def _load(self) -> dict[str, SourceStats]:
+        if not self.path.exists():
+            return {}
+        raw = json.loads(self.path.read_text(encoding="utf-8"))
+        return {key: SourceStats(**entry) for key, entry in raw.items()}
+
+    def get(self, key: str) -> SourceStats:
+        return self.sources.setdefault(key, SourceStats())
+
+    def unseen(self, key: str, urls: list[str]) -> list[str]:
+        seen = set(self.get(key).seen)
+        return [url for url in urls if url_digest(url) not in seen]
+
+    def record(
+        self,
+        key: str,
+        requested: int,
+        new: int,
+        failed: bool,
+        seconds: float,
+        urls: list[str] | None = None,
+        now: float | None = None,
+        latest_published: str | None = None,
+    ) -> None:
+        stats = self.get(key)
+        self._dirty.add(key)
+        alpha = SCHEDULE_SMOOTHING if stats.runs else 1.0
+        observed_yield = min(1.0, new / requested) if requested and not failed else 0.0
+        stats.yield_rate += alpha * (observed_yield - stats.yield_rate)
+        stats.failure_rate += alpha * ((1.0 if failed else 0.0) - stats.failure_rate)
+        stats.latency += alpha * (seconds - stats.latency)
+        now = time.time() if now is None else now
+        if stats.last_run_at and not stats.idle_streak:
+            gap = now - stats.last_run_at
+            stats.cadence += (SCHEDULE_SMOOTHING if stats.cadence else 1.0) * (gap - stats.cadence)
+        # A failed fetch says nothing about whether the source has new items, so
+        # it neither starts nor resets a backoff.
+        if not failed:
+            stats.idle_streak = 0 if new else stats.idle_streak + 1
+        stats.last_run_at = now
+        stats.runs += 1
+        self.advance(key, latest_published)
+        if urls:
+            known = set(stats.seen)
+            fresh = [digest for digest in map(url_digest, urls) if digest not in known]
+            stats.seen = (stats.seen + fresh)[-SCHEDULE_SEEN_URLS:]
+
+    def advance(self, key: str, latest_published: str | None) -> None:
+        # Moves the publish-date watermark forward only. Normalized UTC ISO
+        # strings, so string order is time order.
+        stats = self.get(key)
+        if latest_published and (stats.latest_published or "") < latest_published:
+            stats.latest_published = latest_published
+            self._dirty.add(key)
+
+    def save(self) -> None:
+        # Workers crawling other sources save the same file; their entries are
+        # re-read under the lock and only this history's updates replace them.
+        with locked(self.path):
+            current = self._load()
+            current.update((key, self.sources[key]) for key in self._dirty)
+            payload = {key: asdict(stats) for key, stats in current.items()}
+            write_atomic(self.path, json.dumps(payload, ensure_ascii=False, indent=2))
+        self.sources = current
+        self._dirty.clear()
+
+
+@dataclass(frozen=True)
+class SourcePlan:
+    source: Source
+    limit: int
+
+
+def plan_sources(
+    sources: list[Source],
+    history: SourceHistory,
+    base_limit: int,
+    now: float | None = None,
+    intervals: dict[str, float] | None = None,
+) -> tuple[list[SourcePlan], list[str]]:
+    # Returns the sources to crawl this run, most productive first, and the keys
+    # of sources still backing off. The total limit across due sources stays at
+    # base_limit per source; it is redistributed in proportion to each source's
+    # smoothed yield, so hot sources get more and quiet ones fewer. Backoff is
+    # counted in units of the cadence a source is run at: `intervals` (source
+    # key -> seconds, the daemon's) when given, else the cadence observed in its
+    # history; SCHEDULE_BACKOFF_INTERVAL until there is one.
+    now = time.time() if now is None else now
+    intervals = intervals or {}
+    due: list[tuple[Source, SourceStats]] = []
+    backed_off: list[str] = []
+    for source in sources:
+        stats = history.get(source.key)
+        cadence = intervals.get(source.key) or stats.cadence
+        unit = SCHEDULE_BACKOFF_SHARE * cadence if cadence else SCHEDULE_BACKOFF_INTERVAL
+        if stats.next_due_at(unit) > now:
+            backed_off.append(source.key)
+        else:
+            due.append((source, stats))
+    if not due:
+        return [], backed_off
+
+    # A source's own `limit` (sources.toml) replaces base_limit as its share.
+    bases = {source.key: source.limit or base_limit for source, _ in due}
+    total_weight = sum(stats.weight() * bases[source.key] for source, stats in due)
+    total_limit = sum(bases.values())
+    plans = [
+        SourcePlan(
+            source=source,
+            limit=max(
+                min(SCHEDULE_MIN_LIMIT, bases[source.key]),
+                min(
+                    round(total_limit * stats.weight() * bases[source.key] / total_weight),
+                    bases[source.key] * SCHEDULE_MAX_LIMIT_FACTOR,
+                ),
+            ),
+        )
+        for source, stats in due
+    ]
+    # Expected new items per second of crawl time; unknown latency sorts first.
+    order = {source.key: stats.weight() / max(stats.latency, 1.0) for source, stats in due}
+    plans.sort(key=lambda plan: order[plan.source.key], reverse=True)
+    return plans, backed_off
+
+
+def unplanned(sources: list[Source], base_limit: int) -> list[SourcePlan]:
+    return [SourcePlan(source=source, limit=source.limit or base_limit) for source in sources]
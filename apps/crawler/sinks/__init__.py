@@ -0,0 +1,42 @@
+# persistence sinks
+from __future__ import annotations
+
+from importlib import import_module
+from pathlib import Path
+from typing import Any
+
+from .base import Sink
+
+SINK_NAMES = ("supabase", "sqlite", "jsonl")
+
+# Backends are imported on demand; a SQLite run never loads the Supabase client.
+_EXPORTS = {
+    "JsonlSink": ".jsonl",
+    "SQLiteSink": ".sqlite",
+    "SupabaseSink": ".supabase",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(_EXPORTS[name], __name__), name)
+
+
+def get_sink(name: str, path: str | Path | None = None) -> Sink:
+    if name == "supabase":
+        from .supabase import SupabaseSink
+
+        return SupabaseSink()
+    if name == "sqlite":
+        from .sqlite import SQLiteSink
+
+        return SQLiteSink(path)
+    if name == "jsonl":
+        from .jsonl import JsonlSink
+
+        return JsonlSink(path)
+    raise ValueError(f"Unknown sink: {name} (expected one of {', '.join(SINK_NAMES)})")
+
+
+__all__ = ["JsonlSink", "SINK_NAMES", "SQLiteSink", "Sink", "SupabaseSink", "get_sink"]
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from typing import Protocol
+
+from records import ArticleRecord, ModelAlias, ModelRecord
+
+
+class Sink(Protocol):
+    def upsert_models(
+        self, rows: list[ModelRecord], run_id: str | None = None, partial: bool = False, raw: bool = False
+    ) -> int: ...
+
+    def upsert_articles(
+        self,
+        rows: list[ArticleRecord],
+        run_id: str | None = None,
+        errors: list[str] | None = None,
+        raw: bool = False,
+    ) -> int: ...
+
+    def mark_models_deprecated(self, models: list[tuple[str, str]], run_id: str | None = None) -> int: ...
+
+    def upsert_model_aliases(self, rows: list[ModelAlias], run_id: str | None = None) -> int: ...
+
+    def refresh_scenario_stats(self, scenarios: list[str], run_id: str | None = None) -> int: ...
+
+    def insert_crawler_run(
+        self,
+        *,
+        run_id: str,
+        started_at: str,
+        finished_at: str,
+        status: str,
+        model_persisted: int,
+        article_persisted: int,
+        error_message: str | None = None,
+    ) -> None: ...
+
+    def close(self) -> None: ...
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import gzip
+import json
+from dataclasses import asdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, TextIO
+
+from db import article_payload, model_payload
+from paths import state_path
+from records import ArticleRecord, ModelAlias, ModelRecord
+
+
+class JsonlSink:
+    # Append-only files, one per table. With compress=True each file is a
+    # multi-member gzip stream, so appends from separate runs stay readable.
+    def __init__(self, path: str | Path | None = None, compress: bool = True) -> None:
+        self.directory = Path(path) if path else state_path("sink", "jsonl")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.compress = compress
+        self._handles: dict[str, TextIO] = {}
+
+    def _handle(self, table: str) -> TextIO:
+        if table not in self._handles:
+            if self.compress:
+                self._handles[table] = gzip.open(self.directory / f"{table}.jsonl.gz", "at", encoding="utf-8")
+            else:
+                self._handles[table] = open(self.directory / f"{table}.jsonl", "a", encoding="utf-8")
+        return self._handles[table]
+
+    def _append(self, table: str, payloads: list[dict[str, Any]]) -> int:
+        if not payloads:
+            return 0
+        handle = self._handle(table)
+        handle.write("".join(json.dumps(payload, ensure_ascii=False) + "\n" for payload in payloads))
+        handle.flush()
+        return len(payloads)
+
+    def upsert_models(
+        self, rows: list[ModelRecord], run_id: str | None = None, partial: bool = False, raw: bool = False
+    ) -> int:
+        crawled_at = datetime.now(timezone.utc).isoformat()
+        payloads = [
+            {**model_payload(row, partial=partial, raw=raw), "crawl_run_id": run_id, "last_crawled_at": crawled_at}
+            for row in rows
+            if row.name.strip() and row.provider.strip()
+        ]
+        return self._append("models", payloads)
+
+    def upsert_articles(
+        self,
+        rows: list[ArticleRecord],
+        run_id: str | None = None,
+        errors: list[str] | None = None,
+        raw: bool = False,
+    ) -> int:
+        crawled_at = datetime.now(timezone.utc).isoformat()
+        payloads = [
+            {**article_payload(row, raw=raw), "crawl_run_id": run_id, "last_crawled_at": crawled_at}
+            for row in rows
+            if row.url.strip() and row.title.strip()
+        ]
+        return self._append("articles", payloads)
+
+    def mark_models_deprecated(self, models: list[tuple[str, str]], run_id: str | None = None) -> int:
+        deprecated_at = datetime.now(timezone.utc).isoformat()
+        payloads = [
+            {"provider": provider, "name": name, "deprecated_at": deprecated_at, "crawl_run_id": run_id}
+            for provider, name in models
+        ]
+        return self._append("model_deprecations", payloads)
+
+    def upsert_model_aliases(self, rows: list[ModelAlias], run_id: str | None = None) -> int:
+        return self._append("model_aliases", [{**asdict(row), "crawl_run_id": run_id} for row in rows])
+
+    def refresh_scenario_stats(self, scenarios: list[str], run_id: str | None = None) -> int:
+        # Nothing to aggregate in an append-only log: the touched scenarios are
+        # recorded so whatever loads the files knows which stats to recompute.
+        refreshed_at = datetime.now(timezone.utc).isoformat()
+        payloads = [
+            {"scenario": scenario, "crawl_run_id": run_id, "refreshed_at": refreshed_at} for scenario in scenarios
+        ]
+        return self._append("scenario_refreshes", payloads)
+
+    def insert_crawler_run(self, **kwargs: Any) -> None:
+        self._append("crawler_runs", [{"id": kwargs.pop("run_id"), **kwargs}])
+
+    def close(self) -> None:
+        for handle in self._handles.values():
+            handle.close()
+        self._handles.clear()
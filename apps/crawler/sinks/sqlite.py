@@ -0,0 +1,325 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+
+from db import alias_payload, article_payload, model_payload
+from paths import state_path
+from records import ArticleRecord, ModelAlias, ModelRecord
+from sources import SCENARIO_TOP_N, SINK_BATCH_SIZE
+
+SCHEMA = """
+create table if not exists models (
+  id text primary key default (lower(hex(randomblob(16)))),
+  name text not null,
+  provider text not null,
+  description text,
+  cost_input real,
+  cost_output real,
+  api_url text,
+  docs_url text,
+  business_scenarios text not null default '[]',
+  release_date text,
+  source_url text,
+  created_at text not null default (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+  updated_at text not null,
+  deprecated_at text,
+  crawl_run_id text,
+  last_crawled_at text,
+  unique (name, provider)
+);
+
+create table if not exists articles (
+  id text primary key default (lower(hex(randomblob(16)))),
+  title text not null,
+  summary text,
+  content text,
+  source text,
+  url text not null unique,
+  tags text not null default '[]',
+  published_at text,
+  created_at text not null default (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+  crawl_run_id text,
+  last_crawled_at text
+);
+
+create table if not exists model_aliases (
+  alias_provider text not null,
+  alias_name text not null,
+  canonical_provider text not null,
+  canonical_name text not null,
+  crawl_run_id text,
+  updated_at text not null,
+  primary key (alias_provider, alias_name)
+);
+
+create table if not exists scenario_stats (
+  scenario text primary key,
+  model_count integer not null default 0,
+  article_count integer not null default 0,
+  top_model_ids text not null default '[]',
+  top_article_ids text not null default '[]',
+  latest_model_at text,
+  latest_article_at text,
+  crawl_run_id text,
+  updated_at text not null
+);
+
+-- Scenarios a row left (re-tagged, deprecated, deleted), folded into the next
+-- refresh; see the scenario_stats_dirty migration.
+create table if not exists scenario_stats_dirty (
+  scenario text primary key
+);
+
+create trigger if not exists models_scenarios_changed
+after update of business_scenarios, deprecated_at on models
+when old.business_scenarios is not new.business_scenarios or old.deprecated_at is not new.deprecated_at
+begin
+  insert or ignore into scenario_stats_dirty (scenario) select value from json_each(old.business_scenarios);
+end;
+
+create trigger if not exists models_scenarios_deleted after delete on models
+begin
+  insert or ignore into scenario_stats_dirty (scenario) select value from json_each(old.business_scenarios);
+end;
+
+create trigger if not exists articles_scenarios_changed
+after update of tags on articles
+when old.tags is not new.tags
+begin
+  insert or ignore into scenario_stats_dirty (scenario) select value from json_each(old.tags);
+end;
+
+create trigger if not exists articles_scenarios_deleted after delete on articles
+begin
+  insert or ignore into scenario_stats_dirty (scenario) select value from json_each(old.tags);
+end;
+
+create table if not exists crawler_runs (
+  id text primary key,
+  started_at text not null,
+  finished_at text,
+  status text not null,
+  model_persisted integer not null default 0,
+  article_persisted integer not null default 0,
+  error_message text
+);
+"""
+
+MODEL_COLUMNS = (
+    "name",
+    "provider",
+    "description",
+    "cost_input",
+    "cost_output",
+    "api_url",
+    "docs_url",
+    "business_scenarios",
+    "release_date",
+    "source_url",
+    "updated_at",
+    "deprecated_at",
+    "crawl_run_id",
+    "last_crawled_at",
+)
+
+ALIAS_COLUMNS = (
+    "alias_provider",
+    "alias_name",
+    "canonical_provider",
+    "canonical_name",
+    "crawl_run_id",
+    "updated_at",
+)
+
+ARTICLE_COLUMNS = (
+    "title",
+    "summary",
+    "content",
+    "source",
+    "url",
+    "tags",
+    "published_at",
+    "crawl_run_id",
+    "last_crawled_at",
+)
+
+# Same recompute as the Supabase refresh_scenario_stats function, over the JSON
+# array columns.
+SCENARIO_STATS_SQL = """
+with tagged_models as (
+  select id, updated_at from models
+  where deprecated_at is null
+    and exists (select 1 from json_each(models.business_scenarios) where value = :scenario)
+),
+tagged_articles as (
+  select id, published_at, created_at from articles
+  where exists (select 1 from json_each(articles.tags) where value = :scenario)
+)
+insert into scenario_stats (
+  scenario, model_count, article_count, top_model_ids, top_article_ids,
+  latest_model_at, latest_article_at, crawl_run_id, updated_at
+)
+select
+  :scenario,
+  (select count(*) from tagged_models),
+  (select count(*) from tagged_articles),
+  (select json_group_array(id) from (select id from tagged_models order by updated_at desc limit :top_n)),
+  (select json_group_array(id) from (
+    select id from tagged_articles order by published_at desc, created_at desc limit :top_n
+  )),
+  (select max(updated_at) from tagged_models),
+  (select max(published_at) from tagged_articles),
+  :run_id,
+  :updated_at
+where true
+on conflict (scenario) do update set
+  model_count = excluded.model_count,
+  article_count = excluded.article_count,
+  top_model_ids = excluded.top_model_ids,
+  top_article_ids = excluded.top_article_ids,
+  latest_model_at = excluded.latest_model_at,
+  latest_article_at = excluded.latest_article_at,
+  crawl_run_id = excluded.crawl_run_id,
+  updated_at = excluded.updated_at
+"""
+
+
+def _upsert_sql(table: str, columns: tuple[str, ...], conflict: tuple[str, ...]) -> str:
+    updates = ", ".join(f"{column} = excluded.{column}" for column in columns if column not in conflict)
+    return (
+        f"insert into {table} ({', '.join(columns)}) values ({', '.join('?' for _ in columns)}) "
+        f"on conflict ({', '.join(conflict)}) do update set {updates}"
+    )
+
+
+def _row(payload: dict[str, object], columns: tuple[str, ...]) -> tuple[object, ...]:
+    return tuple(
+        json.dumps(payload.get(column), ensure_ascii=False)
+        if isinstance(payload.get(column), list)
+        else payload.get(column)
+        for column in columns
+    )
+
+
+class SQLiteSink:
+    # Same conflict keys as the Supabase writer: (name, provider) for models and
+    # url for articles, written with executemany in WAL mode.
+    def __init__(self, path: str | Path | None = None, batch_size: int = SINK_BATCH_SIZE) -> None:
+        self.path = Path(path) if path else state_path("sink", "crawler.sqlite3")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("pragma journal_mode=wal")
+        self.connection.execute("pragma synchronous=normal")
+        self.connection.executescript(SCHEMA)
+
+    def _write(self, sql: str, rows: list[tuple[object, ...]]) -> int:
+        for start in range(0, len(rows), self.batch_size):
+            with self.connection:
+                self.connection.executemany(sql, rows[start : start + self.batch_size])
+        return len(rows)
+
+    def _upsert(
+        self, table: str, columns: tuple[str, ...], conflict: tuple[str, ...], payloads: list[dict[str, object]]
+    ) -> int:
+        # Partial payloads carry different column sets; each set gets its own
+        # statement so absent columns keep their stored values.
+        groups: dict[tuple[str, ...], list[tuple[object, ...]]] = {}
+        for payload in payloads:
+            present = tuple(column for column in columns if column in payload)
+            groups.setdefault(present, []).append(_row(payload, present))
+        return sum(self._write(_upsert_sql(table, present, conflict), values) for present, values in groups.items())
+
+    def upsert_models(
+        self, rows: list[ModelRecord], run_id: str | None = None, partial: bool = False, raw: bool = False
+    ) -> int:
+        crawled_at = datetime.now(timezone.utc).isoformat()
+        payloads = []
+        for row in rows:
+            if not row.name.strip() or not row.provider.strip():
+                continue
+            payload = model_payload(row, partial=partial, raw=raw)
+            payload["crawl_run_id"] = run_id
+            payload["last_crawled_at"] = crawled_at
+            payloads.append(payload)
+        return self._upsert("models", MODEL_COLUMNS, ("name", "provider"), payloads)
+
+    def upsert_articles(
+        self,
+        rows: list[ArticleRecord],
+        run_id: str | None = None,
+        errors: list[str] | None = None,
+        raw: bool = False,
+    ) -> int:
+        crawled_at = datetime.now(timezone.utc).isoformat()
+        payloads = []
+        for row in rows:
+            if not row.url.strip() or not row.title.strip():
+                continue
+            payload = article_payload(row, raw=raw)
+            payload["crawl_run_id"] = run_id
+            payload["last_crawled_at"] = crawled_at
+            payloads.append(payload)
+        return self._upsert("articles", ARTICLE_COLUMNS, ("url",), payloads)
+
+    def mark_models_deprecated(self, models: list[tuple[str, str]], run_id: str | None = None) -> int:
+        deprecated_at = datetime.now(timezone.utc).isoformat()
+        values = [(deprecated_at, run_id, name.strip(), provider.strip()) for provider, name in models]
+        with self.connection:
+            cursor = self.connection.executemany(
+                "update models set deprecated_at = ?, crawl_run_id = coalesce(?, crawl_run_id) "
+                "where name = ? and provider = ? and deprecated_at is null",
+                values,
+            )
+        return cursor.rowcount
+
+    def upsert_model_aliases(self, rows: list[ModelAlias], run_id: str | None = None) -> int:
+        updated_at = datetime.now(timezone.utc).isoformat()
+        values = [
+            _row({**alias_payload(row), "crawl_run_id": run_id, "updated_at": updated_at}, ALIAS_COLUMNS)
+            for row in rows
+        ]
+        return self._write(_upsert_sql("model_aliases", ALIAS_COLUMNS, ("alias_provider", "alias_name")), values)
+
+    def refresh_scenario_stats(self, scenarios: list[str], run_id: str | None = None) -> int:
+        updated_at = datetime.now(timezone.utc).isoformat()
+        with self.connection:
+            dirty = [row[0] for row in self.connection.execute("select scenario from scenario_stats_dirty")]
+            params = [
+                {"scenario": scenario, "top_n": SCENARIO_TOP_N, "run_id": run_id, "updated_at": updated_at}
+                for scenario in dict.fromkeys(scenarios + dirty)
+            ]
+            self.connection.executemany(
+                "delete from scenario_stats_dirty where scenario = ?", [(item["scenario"],) for item in params]
+            )
+            self.connection.executemany(SCENARIO_STATS_SQL, params)
+            self.connection.executemany(
+                "delete from scenario_stats where scenario = ? and model_count = 0 and article_count = 0",
+                [(item["scenario"],) for item in params],
+            )
+        return len(params)
+
+    def insert_crawler_run(
+        self,
+        *,
+        run_id: str,
+        started_at: str,
+        finished_at: str,
+        status: str,
+        model_persisted: int,
+        article_persisted: int,
+        error_message: str | None = None,
+    ) -> None:
+        with self.connection:
+            self.connection.execute(
+                "insert or replace into crawler_runs "
+                "(id, started_at, finished_at, status, model_persisted, article_persisted, error_message) "
+                "values (?, ?, ?, ?, ?, ?, ?)",
+                (run_id, started_at, finished_at, status, model_persisted, article_persisted, error_message),
+            )
+
+    def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import db
+from records import ArticleRecord, ModelAlias, ModelRecord
+
+
+class SupabaseSink:
+    def upsert_models(
+        self, rows: list[ModelRecord], run_id: str | None = None, partial: bool = False, raw: bool = False
+    ) -> int:
+        return db.upsert_models(rows, run_id=run_id, partial=partial, raw=raw)
+
+    def upsert_articles(
+        self,
+        rows: list[ArticleRecord],
+        run_id: str | None = None,
+        errors: list[str] | None = None,
+        raw: bool = False,
+    ) -> int:
+        return db.upsert_articles(rows, run_id=run_id, errors=errors, raw=raw)
+
+    def mark_models_deprecated(self, models: list[tuple[str, str]], run_id: str | None = None) -> int:
+        return db.mark_models_deprecated(models, run_id=run_id)
+
+    def upsert_model_aliases(self, rows: list[ModelAlias], run_id: str | None = None) -> int:
+        return db.upsert_model_aliases(rows, run_id=run_id)
+
+    def refresh_scenario_stats(self, scenarios: list[str], run_id: str | None = None) -> int:
+        return db.refresh_scenario_stats(scenarios, run_id=run_id)
+
+    def insert_crawler_run(self, **kwargs: object) -> None:
+        db.insert_crawler_run(**kwargs)  # type: ignore[arg-type]
+
+    def close(self) -> None:
+        return None
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import heapq
+import json
+import xml.etree.ElementTree as ET
+import zlib
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+from http_client import iter_bytes
+from paths import state_path, write_atomic
+from scheduler import url_digest
+from sources import SITEMAP_MAX_FILES, SITEMAP_SEEN_URLS
+from timeparse import TimestampParser
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_UNDATED = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+@dataclass(frozen=True)
+class SitemapEntry:
+    url: str
+    lastmod: datetime | None = None
+    # From the Google News extension (<news:title>, <news:publication_date>).
+    title: str = ""
+    published_at: str = ""
+
+
+def _local(tag: str) -> str:
+    return tag.rpartition("}")[2]
+
+
+def _parse_entry(element: ET.Element) -> tuple[str, str, str, str]:
+    loc = lastmod = title = published_at = ""
+    for child in element:
+        name = _local(child.tag)
+        if name == "loc":
+            loc = (child.text or "").strip()
+        elif name == "lastmod":
+            lastmod = (child.text or "").strip()
+        elif name == "news":
+            for field in child:
+                if _local(field.tag) == "title":
+                    title = " ".join((field.text or "").split())
+                elif _local(field.tag) == "publication_date":
+                    published_at = (field.text or "").strip()
+    return loc, lastmod, title, published_at
+
+
+def iter_sitemap(chunks: Iterable[bytes]) -> Iterator[tuple[str, str, str, str, str]]:
+    # Incremental parse: each <url>/<sitemap> element is yielded as
+    # (kind, loc, lastmod, title, published_at) as soon as it closes and is then
+    # dropped from the tree, so memory stays flat on 50k-entry sitemaps.
+    # Gzipped files (sitemap.xml.gz) are inflated on the fly.
+    parser = ET.XMLPullParser(events=("start", "end"))
+    inflate: zlib._Decompress | None = None
+    root: ET.Element | None = None
+    for index, chunk in enumerate(chunks):
+        if index == 0 and chunk[:2] == _GZIP_MAGIC:
+            inflate = zlib.decompressobj(wbits=31)
+        parser.feed(inflate.decompress(chunk) if inflate is not None else chunk)
+        for event, element in parser.read_events():
+            if event == "start":
+                root = element if root is None else root
+                continue
+            kind = _local(element.tag)
+            if kind not in ("url", "sitemap"):
+                continue
+            loc, lastmod, title, published_at = _parse_entry(element)
+            if loc:
+                yield kind, loc, lastmod, title, published_at
+            if root is not None:
+                root.clear()
+    parser.close()
+
+
+class SitemapState:
+    # Per-source discovery watermark: everything modified after `crawled_at`
+    # counts as changed, plus digests of the URLs handed out, which is how new
+    # entries are told apart in sitemaps that carry no <lastmod>. A discovery
+    # cut at its limit hands out the newest changes and leaves the watermark
+    # where it was, so the older remainder comes on later runs; `handed` keeps
+    # the entries already handed out since the watermark (with their <lastmod>
+    # then) from being served twice. Only a first discovery skips the backlog
+    # and starts from the oldest entry it took. discover() stages the update;
+    # commit() writes it once the records are stored.
+    def __init__(self, source_key: str, path: Path | None = None) -> None:
+        self.path = path or state_path("sitemaps", f"{source_key}.json")
+        payload = json.loads(self.path.read_text(encoding="utf-8")) if self.path.exists() else {}
+        crawled_at = payload.get("crawled_at")
+        self.crawled_at = datetime.fromisoformat(crawled_at) if crawled_at else None
+        self.seen: list[str] = list(payload.get("seen", []))
+        self.handed = {digest: datetime.fromisoformat(lastmod) for digest, lastmod in payload.get("handed", {}).items()}
+        self._known = set(self.seen)
+        self._staged: tuple[datetime, list[SitemapEntry], bool] | None = None
+
+    def changed(self, url: str, lastmod: datetime | None) -> bool:
+        if self.crawled_at is None:
+            return True
+        if lastmod is not None:
+            return lastmod >= self.crawled_at and self.handed.get(url_digest(url)) != lastmod
+        return url_digest(url) not in self._known
+
+    def stage(self, started_at: datetime, entries: list[SitemapEntry], truncated: bool) -> None:
+        self._staged = (started_at, entries, truncated)
+
+    def commit(self) -> None:
+        if self._staged is None:
+            return
+        started_at, entries, truncated = self._staged
+        self._staged = None
+        fresh = [digest for digest in (url_digest(entry.url) for entry in entries) if digest not in self._known]
+        self.seen = (self.seen + fresh)[-SITEMAP_SEEN_URLS:]
+        self._known = set(self.seen)
+        dated = [entry.lastmod for entry in entries if entry.lastmod is not None]
+        handed = {**self.handed, **{url_digest(entry.url): entry.lastmod for entry in entries if entry.lastmod}}
+        # Undated entries rank last, so a cut that reached them handed out every
+        # dated change and the watermark can move all the way.
+        if not truncated or len(dated) < len(entries):
+            self.crawled_at = started_at
+        elif self.crawled_at is None:
+            self.crawled_at = min(dated) if dated else started_at
+        newest = sorted(handed.items(), key=lambda item: item[1], reverse=True)[:SITEMAP_SEEN_URLS]
+        self.handed = {digest: lastmod for digest, lastmod in newest if lastmod >= self.crawled_at}
+        payload = {
+            "crawled_at": self.crawled_at.isoformat(),
+            "seen": self.seen,
+            "handed": {digest: lastmod.isoformat() for digest, lastmod in self.handed.items()},
+        }
+        write_atomic(self.path, json.dumps(payload))
+
+
+def _changed_entries(
+    sitemaps: Iterable[str],
+    state: SitemapState | None,
+    timestamps: TimestampParser,
+    accept: Callable[[str], bool],
+    max_files: int,
+    cut: list[str],
+) -> Iterator[SitemapEntry]:
+    # Depth-first over sitemap indexes. A nested sitemap is fetched only when
+    # its index entry is reached and only if it may hold changes: an index
+    # <lastmod> at or before the last discovery skips the whole file.
+    pending = list(reversed(list(sitemaps)))
+    fetched = 0
+    while pending and fetched < max_files:
+        url = pending.pop()
+        fetched += 1
+        nested: list[str] = []
+        for kind, loc, raw_lastmod, title, published_at in iter_sitemap(iter_bytes(url)):
+            lastmod = timestamps.parse(raw_lastmod) if raw_lastmod else None
+            if state is not None and not state.changed(loc, lastmod) and (kind == "url" or lastmod is not None):
+                continue
+            if kind == "sitemap":
+                nested.append(loc)
+            elif accept(loc):
+                yield SitemapEntry(url=loc, lastmod=lastmod, title=title, published_at=published_at)
+        pending.extend(reversed(nested))
+    # Files left unread at max_files; their changes have not been seen.
+    cut.extend(pending)
+
+
+def discover(
+    sitemaps: Iterable[str],
+    limit: int,
+    state: SitemapState | None = None,
+    timestamps: TimestampParser | None = None,
+    accept: Callable[[str], bool] = lambda _url: True,
+    max_files: int = SITEMAP_MAX_FILES,
+) -> list[SitemapEntry]:
+    # The `limit` most recently modified accepted entries that are new or
+    # changed since `state` was last committed (every entry without a state),
+    # newest first; undated entries rank last. Only `limit` entries are held
+    # at a time. The matching watermark update is staged on `state`.
+    started_at = datetime.now(timezone.utc)
+    timestamps = timestamps or TimestampParser()
+    changed = 0
+    cut: list[str] = []
+
+    def counted() -> Iterator[SitemapEntry]:
+        nonlocal changed
+        for entry in _changed_entries(sitemaps, state, timestamps, accept, max_files, cut):
+            changed += 1
+            yield entry
+
+    entries = heapq.nlargest(limit, counted(), key=lambda entry: entry.lastmod or _UNDATED)
+    if state is not None:
+        state.stage(started_at, entries, truncated=changed > len(entries) or bool(cut))
+    return entries
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+from collections.abc import Iterator
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any
+
+from paths import state_path
+from records import ModelRecord
+
+
+def record_digest(record: ModelRecord) -> str:
+    encoded = json.dumps(asdict(record), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+def _iter_lines(path: Path) -> Iterator[dict[str, Any]]:
+    if not path.exists():
+        return
+    with gzip.open(path, "rt", encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+class CatalogSnapshot:
+    def __init__(self, source_key: str, path: Path | None = None) -> None:
+        self.source_key = source_key
+        self.path = path or state_path("snapshots", f"{source_key}.jsonl.gz")
+        # Only key -> digest/identity is kept in memory; raw items stay on disk.
+        self.previous: dict[str, tuple[str, str, str]] = {
+            str(entry["key"]): (str(entry["digest"]), str(entry["provider"]), str(entry["name"]))
+            for entry in _iter_lines(self.path)
+        }
+        self.seen: set[str] = set()
+        self.pending: dict[str, dict[str, Any]] = {}
+        self.complete = False
+        self.added = 0
+        self.changed = 0
+
+    def observe(self, key: str, item: Any, record: ModelRecord) -> bool:
+        self.seen.add(key)
+        digest = record_digest(record)
+        previous = self.previous.get(key)
+        if previous is not None and previous[0] == digest:
+            return False
+        if previous is None:
+            self.added += 1
+        else:
+            self.changed += 1
+        self.pending[key] = {
+            "key": key,
+            "digest": digest,
+            "provider": record.provider,
+            "name": record.name,
+            "item": item,
+        }
+        return True
+
+    def discard_except(self, kept: set[tuple[str, str]]) -> None:
+        for key in [key for key, entry in self.pending.items() if (entry["provider"], entry["name"]) not in kept]:
+            del self.pending[key]
+
+    def mark_complete(self) -> None:
+        self.complete = True
+
+    def removed(self) -> list[tuple[str, str]]:
+        # Removal is only knowable after the whole catalog has been walked.
+        if not self.complete:
+            return []
+        return [
+            (provider, name)
+            for key, (_digest, provider, name) in self.previous.items()
+            if key not in self.seen
+        ]
+
+    def commit(self) -> None:
+        if not self.pending and not self.removed():
+            return
+        removed_keys = {key for key in self.previous if key not in self.seen} if self.complete else set()
+        tmp_path = self.path.with_suffix(".tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as handle:
+            for entry in _iter_lines(self.path):
+                key = str(entry["key"])
+                if key in removed_keys or key in self.pending:
+                    continue
+                handle.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            for entry in self.pending.values():
+                handle.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+
+        for key in removed_keys:
+            self.previous.pop(key, None)
+        for key, entry in self.pending.items():
+            self.previous[key] = (entry["digest"], entry["provider"], entry["name"])
+        self.pending.clear()
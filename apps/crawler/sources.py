@@ -1,4 +1,12 @@
+from __future__ import annotations
+
+import os
+import re
+import tomllib
 from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit
 
 
 @dataclass(frozen=True)
@@ -7,69 +15,219 @@ class Source:
     name: str
     url: str
     fallback: str | None = None
+    # Regexes matched against the URL path; when empty, patterns learned from
+    # past extractions (url_patterns.UrlPatternStats) or link scoring are used.
+    article_patterns: tuple[str, ...] = ()
+    exclude_patterns: tuple[str, ...] = ()
+    # Link score a listing link needs without article_patterns; 0 uses
+    # url_patterns.MIN_LINK_SCORE.
+    min_link_score: float = 0.0
+    # Seconds between crawls in --daemon mode; 0 uses the pipeline default.
+    interval: int = 0
+    # Per-source tuning from sources.toml; 0/empty falls back to the global default.
+    limit: int = 0
+    concurrency: int = 1
+    rate_limit: float = 0.0
+    max_bytes: int = 0
+    parser: str = "html.parser"
+    retries: int = 0
+    max_pages: int = 0
+    adapter: str = ""
+    # Sitemaps or sitemap indexes; when set, news discovery takes new/changed
+    # entries from them instead of parsing the listing page.
+    sitemaps: tuple[str, ...] = ()
+    # Read the feed (`fallback`) before the listing page; items whose feed entry
+    # carries the full body skip their detail fetch.
+    rss_first: bool = False
+
+
+PARSER_BACKENDS = ("html.parser", "lxml", "html5lib")
+SOURCES_PATH = Path(os.environ.get("CRAWLER_SOURCES") or Path(__file__).with_name("sources.toml"))
+
+_FIELD_TYPES = {
+    "key": str,
+    "name": str,
+    "url": str,
+    "fallback": str,
+    "article_patterns": list,
+    "exclude_patterns": list,
+    "min_link_score": (int, float),
+    "interval": int,
+    "limit": int,
+    "concurrency": int,
+    "rate_limit": (int, float),
+    "max_bytes": int,
+    "parser": str,
+    "retries": int,
+    "max_pages": int,
+    "adapter": str,
+    "sitemaps": list,
+    "rss_first": bool,
+}
+_NEWS_ONLY = {"concurrency", "min_link_score", "parser", "retries", "sitemaps", "rss_first"}
+_MODELS_ONLY = {"adapter", "max_pages"}
+
 
+def _source_from_table(pipeline: str, index: int, table: dict[str, Any], adapters: dict[str, str]) -> Source:
+    where = f"{pipeline}[{index}]"
+    missing = [name for name in ("key", "name", "url") if name not in table]
+    if missing:
+        raise ValueError(f"{where}: missing {', '.join(missing)}")
+    for name, value in table.items():
+        expected = _FIELD_TYPES.get(name)
+        if expected is None or name in (_MODELS_ONLY if pipeline == "news" else _NEWS_ONLY):
+            raise ValueError(f"{where}: unknown setting {name!r} for {pipeline} sources")
+        # bool is an int subclass, but `limit = true` is a typo rather than 1.
+        if not isinstance(value, expected) or (isinstance(value, bool) and expected is not bool):
+            raise ValueError(f"{where}: {name} must be {getattr(expected, '__name__', 'a number')}")
+        if isinstance(value, (int, float)) and value < 0:
+            raise ValueError(f"{where}: {name} must not be negative")
+    for name in ("article_patterns", "exclude_patterns"):
+        for pattern in table.get(name, []):
+            try:
+                re.compile(pattern)
+            except (re.error, TypeError) as error:
+                raise ValueError(f"{where}: invalid {name} entry {pattern!r}: {error}") from None
+    for name in ("url", "fallback"):
+        if name in table and urlsplit(table[name]).scheme not in ("http", "https"):
+            raise ValueError(f"{where}: {name} must be an http(s) URL")
+    for url in table.get("sitemaps", []):
+        if not isinstance(url, str) or urlsplit(url).scheme not in ("http", "https"):
+            raise ValueError(f"{where}: sitemaps entries must be http(s) URLs")
+    if table.get("concurrency") == 0:
+        raise ValueError(f"{where}: concurrency must be at least 1")
+    if table.get("parser", "html.parser") not in PARSER_BACKENDS:
+        raise ValueError(f"{where}: parser must be one of {', '.join(PARSER_BACKENDS)}")
+    if pipeline == "models" and table.get("adapter", table["key"]) not in adapters:
+        raise ValueError(f"{where}: no catalog adapter {table.get('adapter', table['key'])!r} in [adapters]")
+    return Source(
+        **{
+            **table,
+            "article_patterns": tuple(table.get("article_patterns", ())),
+            "exclude_patterns": tuple(table.get("exclude_patterns", ())),
+            "sitemaps": tuple(table.get("sitemaps", ())),
+            "rate_limit": float(table.get("rate_limit", 0.0)),
+            "min_link_score": float(table.get("min_link_score", 0.0)),
+        }
+    )
 
-MODEL_SOURCES = [
-    Source(
-        key="openrouter",
-        name="OpenRouter",
-        url="https://openrouter.ai/models",
-        fallback="https://openrouter.ai/api/v1/models",
-    ),
-    Source(
-        key="huggingface",
-        name="HuggingFace Models",
-        url="https://huggingface.co/models",
-        fallback="https://huggingface.co/api/models?limit=50&sort=downloads",
-    ),
-    Source(
-        key="litellm",
-        name="LiteLLM",
-        url="https://litellm.ai",
-        fallback="https://docs.litellm.ai/docs/providers",
-    ),
-]
-
-NEWS_SOURCES = [
-    Source(
-        key="jiqizhixin",
-        name="机器之心",
-        url="https://www.jiqizhixin.com",
-        fallback="https://www.jiqizhixin.com/rss",
-    ),
-    Source(
-        key="qbitai",
-        name="量子位",
-        url="https://www.qbitai.com",
-        fallback="https://www.qbitai.com/feed",
-    ),
-    Source(
-        key="36kr-ai",
-        name="36氪AI",
-        url="https://36kr.com/column/104812",
-        fallback="https://36kr.com/feed",
-    ),
-    Source(
-        key="tmtpost-ai",
-        name="钛媒体AI",
-        url="https://www.tmtpost.com/column/ai",
-        fallback="https://www.tmtpost.com/rss",
-    ),
-    Source(
-        key="ai-xinzhiyuan",
-        name="新智元",
-        url="https://www.ai-xinzhiyuan.com",
-        fallback="https://www.ai-xinzhiyuan.com/feed",
-    ),
-    Source(
-        key="infoq-ai",
-        name="InfoQ中国",
-        url="https://www.infoq.cn/topic/artificial-intelligence",
-        fallback="https://www.infoq.cn/feed",
-    ),
-]
+
+def load_sources(path: Path = SOURCES_PATH) -> tuple[list[Source], list[Source], dict[str, str]]:
+    # Parses and validates the whole registry up front, so a bad entry stops the
+    # process at startup instead of failing one source in the middle of a run.
+    with path.open("rb") as handle:
+        document = tomllib.load(handle)
+    try:
+        unknown = set(document) - {"adapters", "models", "news"}
+        if unknown:
+            raise ValueError(f"unknown section(s) {', '.join(sorted(unknown))}")
+        adapters = document.get("adapters", {})
+        for name, target in adapters.items():
+            module, _, attribute = target.partition(":") if isinstance(target, str) else ("", "", "")
+            if not module or not attribute:
+                raise ValueError(f"adapters.{name} must be a 'module:attribute' reference")
+        pipelines = {
+            pipeline: [
+                _source_from_table(pipeline, index, table, adapters)
+                for index, table in enumerate(document.get(pipeline, []))
+            ]
+            for pipeline in ("models", "news")
+        }
+        keys = [source.key for sources in pipelines.values() for source in sources]
+        duplicates = sorted({key for key in keys if keys.count(key) > 1})
+        if duplicates:
+            raise ValueError(f"duplicate source key(s) {', '.join(duplicates)}")
+    except ValueError as error:
+        raise ValueError(f"{path}: {error}") from None
+    return pipelines["models"], pipelines["news"], dict(adapters)
+
+
+MODEL_SOURCES, NEWS_SOURCES, CATALOG_ADAPTERS = load_sources()
 
 MODEL_DAILY_LIMIT = 50
+MODEL_CATALOG_MAX_PAGES = 100
 NEWS_DAILY_LIMIT = 20
 NEWS_DETAIL_RETRY = 3
 ARK_RETRY = 2
+ARK_ARTICLE_PROMPT_TOKENS = 600
+ARK_CALL_TIMEOUT = 30.0
+ARK_ENRICH_BUDGET = 1200.0
+ARK_MAX_BACKOFF = 8.0
+ARK_LATENCY_WINDOW = 200
+ARK_HEDGE_MIN_SAMPLES = 20
+ARK_HEDGE_WORKERS = 8
+SUPABASE_RETRY = 2
+SUPABASE_TIMEOUT = 30
+ARTICLE_UPSERT_MAX_ROWS = 100
+ARTICLE_UPSERT_MAX_BYTES = 512 * 1024
+ARTICLE_UPSERT_CONCURRENCY = 4
+SINK_BATCH_SIZE = 500
+
+# Time-budgeted runs (--time-budget): share of the run given to models, share
+# of each pipeline spent fetching, and seconds held back for persistence.
+MODEL_RUN_BUDGET_SHARE = 0.35
+MODEL_FETCH_BUDGET_SHARE = 0.5
+NEWS_FETCH_BUDGET_SHARE = 0.55
+UPSERT_RESERVE_SECONDS = 15.0
+RUN_FINALIZE_RESERVE_SECONDS = 5.0
+
+# Adaptive source scheduling: smoothing factor for per-run rates, backoff for
+# sources that keep returning nothing new, and bounds on redistributed limits.
+# A source with a known run cadence (the daemon's interval, or the gap between
+# its past runs) backs off in units of that share of it, so a due source is not
+# missed by a few seconds of jitter; SCHEDULE_BACKOFF_INTERVAL until one is known.
+SCHEDULE_SMOOTHING = 0.3
+SCHEDULE_BACKOFF_INTERVAL = 20 * 3600
+SCHEDULE_BACKOFF_SHARE = 0.8
+SCHEDULE_MAX_BACKOFF = 7 * 24 * 3600
+SCHEDULE_MIN_LIMIT = 3
+SCHEDULE_MAX_LIMIT_FACTOR = 2
+SCHEDULE_SEEN_URLS = 2000
+
+# --daemon: default per-source intervals, loop granularity and health endpoint.
+DAEMON_MODEL_INTERVAL = 6 * 3600
+DAEMON_NEWS_INTERVAL = 3600
+DAEMON_TICK_SECONDS = 30.0
+DAEMON_HEALTH_PORT = 9108
+
+# Work queue (--enqueue / --worker): lease length, how often a running task
+# renews it, retry policy and how long an idle worker waits for new tasks
+# before exiting.
+QUEUE_VISIBILITY_TIMEOUT = 300.0
+QUEUE_HEARTBEAT_INTERVAL = 60.0
+QUEUE_MAX_ATTEMPTS = 5
+QUEUE_RETRY_BASE = 30.0
+QUEUE_IDLE_EXIT = 30.0
+QUEUE_MODEL_BATCH = 10
+
+# Raw page archive (--reparse): zstd level for stored bodies and how long
+# archived fetches are kept before pruning.
+ARCHIVE_ZSTD_LEVEL = 10
+ARCHIVE_RETENTION = 14 * 24 * 3600
+
+# Local scenario tagger (main.py --train-tagger): size of the hashed char
+# n-gram space, the precision a label must reach on held-out rows before it is
+# assigned without Ark, and how many LLM-labeled rows training needs.
+TAGGER_FEATURES = 2**14
+TAGGER_NGRAMS = (1, 2, 3)
+TAGGER_MAX_CHARS = 1500
+TAGGER_MIN_PRECISION = 0.9
+TAGGER_MIN_EXAMPLES = 200
+TAGGER_BATCH = 1024
+
+# Sitemap discovery: most sitemap files fetched per source and run (indexes
+# included) and how many discovered URLs are remembered to spot new entries
+# in sitemaps without <lastmod>.
+SITEMAP_MAX_FILES = 20
+SITEMAP_SEEN_URLS = 5000
+
+# Dead-letter store for records whose enrichment failed: delay before the first
+# retry (doubling per failure), failures before a record is parked, and how
+# many due records a run retries.
+DLQ_RETRY_BASE = 3600.0
+DLQ_MAX_ATTEMPTS = 6
+DLQ_RETRY_BATCH = 50
+
+# Scenario aggregates (scenario_stats): model and article ids kept per scenario
+# for the explore page.
+SCENARIO_TOP_N = 10
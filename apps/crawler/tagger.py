@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+import zlib
+from collections.abc import Sequence
+from pathlib import Path
+
+import numpy as np
+
+from ark_enrich import CANONICAL_SCENARIOS
+from paths import state_path
+from sources import (
+    TAGGER_BATCH,
+    TAGGER_FEATURES,
+    TAGGER_MAX_CHARS,
+    TAGGER_MIN_EXAMPLES,
+    TAGGER_MIN_PRECISION,
+    TAGGER_NGRAMS,
+)
+
+# Tagger kind -> (Supabase table, label column, text columns).
+KINDS = {
+    "article": ("articles", "tags", ("title", "content")),
+    "model": ("models", "business_scenarios", ("name", "provider", "description")),
+}
+EXAMPLE_SOURCES = ("local", "supabase")
+
+_PRIME = np.uint64(1_000_003)
+_MIN_SUPPORT = 3
+_LOADED: dict[Path, tuple[float, ScenarioTagger]] = {}
+
+
+def article_text(title: str, content: str | None) -> str:
+    return f"{title}\n{content or ''}"
+
+
+def model_text(name: str, provider: str, description: str | None) -> str:
+    return f"{name} {provider}\n{description or ''}"
+
+
+def _buckets(text: str) -> np.ndarray:
+    # Char 1-3 grams hashed with a polynomial over code points, computed for
+    # every position at once instead of one Python call per n-gram.
+    clean = " ".join(text.lower().split())[:TAGGER_MAX_CHARS]
+    codes = np.frombuffer(clean.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    parts: list[np.ndarray] = []
+    for size in TAGGER_NGRAMS:
+        count = len(codes) - size + 1
+        if count <= 0:
+            continue
+        hashed = np.full(count, size, dtype=np.uint64)
+        for offset in range(size):
+            hashed = hashed * _PRIME + codes[offset : offset + count]
+        parts.append(hashed ^ (hashed >> np.uint64(29)))
+    if not parts:
+        return np.zeros(0, dtype=np.int64)
+    return (np.concatenate(parts) % np.uint64(TAGGER_FEATURES)).astype(np.int64)
+
+
+def term_counts(texts: Sequence[str]) -> np.ndarray:
+    # One bincount over (row, bucket) pairs builds the whole batch matrix.
+    buckets = [_buckets(text) for text in texts]
+    rows = np.repeat(np.arange(len(texts)), [len(item) for item in buckets])
+    flat = np.concatenate(buckets) if buckets else np.zeros(0, dtype=np.int64)
+    counts = np.bincount(rows * TAGGER_FEATURES + flat, minlength=len(texts) * TAGGER_FEATURES)
+    return counts.reshape(len(texts), TAGGER_FEATURES).astype(np.float32)
+
+
+def _sparse_tfidf(texts: Sequence[str], idf: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # (row, bucket, weight) triples of the L2-normalized TF-IDF matrix; scoring
+    # from these never materializes the dense batch x TAGGER_FEATURES matrix.
+    buckets = [_buckets(text) for text in texts]
+    rows = np.repeat(np.arange(len(texts)), [len(item) for item in buckets])
+    flat = np.concatenate(buckets) if buckets else np.zeros(0, dtype=np.int64)
+    keys, counts = np.unique(rows * TAGGER_FEATURES + flat, return_counts=True)
+    rows, cols = np.divmod(keys, TAGGER_FEATURES)
+    weights = np.log1p(counts) * idf[cols]
+    norms = np.sqrt(np.bincount(rows, weights=weights**2, minlength=len(texts)))
+    return rows, cols, weights / np.maximum(norms[rows], 1e-12)
+
+
+def _tfidf(counts: np.ndarray, idf: np.ndarray) -> np.ndarray:
+    weights = np.log1p(counts) * idf
+    norms = np.linalg.norm(weights, axis=1, keepdims=True)
+    return weights / np.maximum(norms, 1e-12)
+
+
+def _chunks(count: int) -> list[slice]:
+    return [slice(start, start + TAGGER_BATCH) for start in range(0, count, TAGGER_BATCH)]
+
+
+def _targets(labels: Sequence[Sequence[str]]) -> np.ndarray:
+    index = {label: position for position, label in enumerate(CANONICAL_SCENARIOS)}
+    targets = np.zeros((len(labels), len(CANONICAL_SCENARIOS)), dtype=bool)
+    for row, row_labels in enumerate(labels):
+        for label in row_labels:
+            if label in index:
+                targets[row, index[label]] = True
+    return targets
+
+
+def _idf(texts: Sequence[str]) -> np.ndarray:
+    df = np.zeros(TAGGER_FEATURES, dtype=np.float64)
+    for chunk in _chunks(len(texts)):
+        df += (term_counts(texts[chunk]) > 0).sum(axis=0)
+    return (np.log((1 + len(texts)) / (1 + df)) + 1).astype(np.float32)
+
+
+def _centroids(texts: Sequence[str], targets: np.ndarray, idf: np.ndarray) -> np.ndarray:
+    sums = np.zeros((targets.shape[1], TAGGER_FEATURES), dtype=np.float32)
+    for chunk in _chunks(len(texts)):
+        sums += targets[chunk].T.astype(np.float32) @ _tfidf(term_counts(texts[chunk]), idf)
+    norms = np.linalg.norm(sums, axis=1, keepdims=True)
+    return sums / np.maximum(norms, 1e-12)
+
+
+def _thresholds(scores: np.ndarray, targets: np.ndarray, min_precision: float) -> np.ndarray:
+    # Per label, the lowest score at which the rows scoring above it still
+    # agree with the LLM at `min_precision`; labels that never get there are
+    # never assigned locally (threshold +inf).
+    thresholds = np.full(scores.shape[1], np.inf, dtype=np.float32)
+    for label in range(scores.shape[1]):
+        order = np.argsort(-scores[:, label], kind="stable")
+        hits = np.cumsum(targets[order, label])
+        precision = hits / np.arange(1, len(order) + 1)
+        passing = np.flatnonzero((precision >= min_precision) & (hits >= _MIN_SUPPORT))
+        if len(passing):
+            thresholds[label] = scores[order[passing[-1]], label]
+    return thresholds
+
+
+class ScenarioTagger:
+    # Nearest-centroid classifier over TF-IDF weighted char n-grams, trained on
+    # rows Ark has already labeled. A row gets every label whose cosine score
+    # clears that label's calibrated threshold; a row clearing none is not
+    # confident and is left to Ark.
+    def __init__(
+        self, labels: Sequence[str], idf: np.ndarray, centroids: np.ndarray, thresholds: np.ndarray
+    ) -> None:
+        self.labels = list(labels)
+        self.idf = idf
+        self.centroids = centroids
+        self.thresholds = thresholds
+
+    @classmethod
+    def fit(
+        cls, texts: Sequence[str], labels: Sequence[Sequence[str]], min_precision: float = TAGGER_MIN_PRECISION
+    ) -> ScenarioTagger:
+        if len(texts) < TAGGER_MIN_EXAMPLES:
+            raise ValueError(f"Need at least {TAGGER_MIN_EXAMPLES} labeled rows to train, got {len(texts)}")
+        texts = list(texts)
+        targets = _targets(labels)
+        idf = _idf(texts)
+        # Thresholds are calibrated on rows the calibration centroids never saw;
+        # the shipped centroids then use every row.
+        calibrate = np.array([zlib.crc32(text.encode("utf-8")) % 5 == 0 for text in texts])
+        train = [text for text, held in zip(texts, calibrate) if not held]
+        held_out = [text for text, held in zip(texts, calibrate) if held]
+        probe = cls(CANONICAL_SCENARIOS, idf, _centroids(train, targets[~calibrate], idf), np.zeros(0))
+        thresholds = _thresholds(probe.scores(held_out), targets[calibrate], min_precision)
+        return cls(CANONICAL_SCENARIOS, idf, _centroids(texts, targets, idf), thresholds)
+
+    def scores(self, texts: Sequence[str]) -> np.ndarray:
+        # Cosine similarity of every row with every label centroid, for the
+        # whole batch in a handful of array operations.
+        rows, cols, weights = _sparse_tfidf(texts, self.idf)
+        contributions = self.centroids[:, cols] * weights
+        return np.stack(
+            [np.bincount(rows, weights=label, minlength=len(texts)) for label in contributions], axis=1
+        ).astype(np.float32)
+
+    def predict(self, texts: Sequence[str]) -> list[list[str] | None]:
+        scores = self.scores(texts)
+        confident = np.where(scores >= self.thresholds, scores, -np.inf)
+        ranked = np.argsort(-confident, axis=1, kind="stable")[:, :3]
+        predictions: list[list[str] | None] = []
+        for row, order in enumerate(ranked):
+            labels = [self.labels[label] for label in order if np.isfinite(confident[row, label])]
+            predictions.append(labels or None)
+        return predictions
+
+    def save(self, path: Path) -> None:
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with tmp.open("wb") as handle:
+            np.savez(
+                handle,
+                labels=np.array(self.labels),
+                idf=self.idf,
+                centroids=self.centroids,
+                thresholds=self.thresholds,
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> ScenarioTagger:
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                [str(label) for label in data["labels"]], data["idf"], data["centroids"], data["thresholds"]
+            )
+
+
+def model_path(kind: str) -> Path:
+    return state_path("tagger", f"{kind}.npz")
+
+
+def examples_path(kind: str) -> Path:
+    return state_path("tagger", f"{kind}.jsonl")
+
+
+def load_tagger(kind: str) -> ScenarioTagger | None:
+    # Reloaded only when a newer model has been trained (e.g. under the daemon).
+    path = model_path(kind)
+    if not path.exists():
+        return None
+    mtime = path.stat().st_mtime
+    cached = _LOADED.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, ScenarioTagger.load(path))
+        _LOADED[path] = cached
+    return cached[1]
+
+
+def record_example(kind: str, text: str, labels: Sequence[str]) -> None:
+    # Every Ark-labeled row becomes training data for the next --train-tagger.
+    canonical = [label for label in labels if label in CANONICAL_SCENARIOS]
+    if not canonical or not text.strip():
+        return
+    line = json.dumps({"text": text[:TAGGER_MAX_CHARS], "labels": canonical}, ensure_ascii=False)
+    with examples_path(kind).open("a", encoding="utf-8") as handle:
+        handle.write(line + "\n")
+
+
+def load_examples(kind: str, source: str = "local", limit: int = 20000) -> tuple[list[str], list[list[str]]]:
+    if source not in EXAMPLE_SOURCES:
+        raise ValueError(f"Unknown example source: {source}")
+    # Later labels for the same text replace earlier ones.
+    latest: dict[str, list[str]] = {}
+    if source == "local":
+        path = examples_path(kind)
+        if path.exists():
+            with path.open(encoding="utf-8") as handle:
+                for line in handle:
+                    if line.strip():
+                        entry = json.loads(line)
+                        latest[entry["text"]] = list(entry["labels"])
+    else:
+        from db import fetch_rows
+
+        table, label_column, text_columns = KINDS[kind]
+        build = article_text if kind == "article" else model_text
+        for row in fetch_rows(table, ",".join((*text_columns, label_column)), f"{label_column}=not.is.null", limit):
+            labels = row.get(label_column)
+            if isinstance(labels, list):
+                text = build(*(str(row.get(column) or "") for column in text_columns))[:TAGGER_MAX_CHARS]
+                latest[text] = [str(label) for label in labels]
+    pairs = [(text, labels) for text, labels in latest.items() if set(labels) & set(CANONICAL_SCENARIOS)]
+    return [text for text, _labels in pairs][-limit:], [labels for _text, labels in pairs][-limit:]
+
+
+def train(kind: str, source: str = "local") -> dict[str, object]:
+    texts, labels = load_examples(kind, source)
+    tagger = ScenarioTagger.fit(texts, labels)
+    tagger.save(model_path(kind))
+    return {
+        "kind": kind,
+        "examples": len(texts),
+        "labels_enabled": [label for label, cut in zip(tagger.labels, tagger.thresholds) if np.isfinite(cut)],
+        "path": str(model_path(kind)),
+    }
+
+
+def evaluate(texts: Sequence[str], labels: Sequence[Sequence[str]]) -> dict[str, object]:
+    # Trains on ~80% of the rows and compares predictions on the rest with the
+    # LLM's labels. Agreement is measured on the rows the tagger would have
+    # handled alone (coverage); everything else would still go to Ark.
+    held = [zlib.crc32(f"eval:{text}".encode("utf-8")) % 5 == 0 for text in texts]
+    tagger = ScenarioTagger.fit(
+        [text for text, flag in zip(texts, held) if not flag],
+        [row for row, flag in zip(labels, held) if not flag],
+    )
+    test_texts = [text for text, flag in zip(texts, held) if flag]
+    test_labels = [set(row) for row, flag in zip(labels, held) if flag]
+    started = time.perf_counter()
+    predictions = tagger.predict(test_texts)
+    elapsed = time.perf_counter() - started
+    handled = [(set(predicted), expected) for predicted, expected in zip(predictions, test_labels) if predicted]
+    predicted_labels = sum(len(predicted) for predicted, _expected in handled)
+    per_label: dict[str, dict[str, object]] = {}
+    for position, label in enumerate(tagger.labels):
+        assigned = [label in expected for predicted, expected in handled if label in predicted]
+        per_label[label] = {
+            "threshold": round(float(tagger.thresholds[position]), 4),
+            "predicted": len(assigned),
+            "precision": round(sum(assigned) / len(assigned), 3) if assigned else None,
+        }
+    return {
+        "train": len(texts) - len(test_texts),
+        "holdout": len(test_texts),
+        "coverage": round(len(handled) / len(test_texts), 3) if test_texts else 0.0,
+        "exact_agreement": round(sum(p == e for p, e in handled) / len(handled), 3) if handled else None,
+        "label_precision": (
+            round(sum(len(p & e) for p, e in handled) / predicted_labels, 3) if predicted_labels else None
+        ),
+        "per_label": per_label,
+        "ms_per_1k_rows": round(elapsed * 1000 * 1000 / max(1, len(test_texts)), 2),
+    }
+
+
+def evaluate_kind(kind: str, source: str = "local") -> dict[str, object]:
+    texts, labels = load_examples(kind, source)
+    return {"kind": kind, "examples": len(texts), **evaluate(texts, labels)}
@@ -0,0 +1,6 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_state_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv("CRAWLER_STATE_DIR", str(tmp_path / "state"))
@@ -0,0 +1,158 @@
+import pytest
+
+import archive
+import http_client
+from archive import ArchiveSession, RawArchive
+from parser_pool import ParserPool
+from sources import Source
+
+LISTING = '<html><body><a href="/articles/1">企业知识库落地的十个关键步骤</a></body></html>'
+ARTICLE = """
+<html><body><h1>{title}</h1><time datetime="2026-10-17T08:30:00+08:00">10月17日</time>
+<article><p>这是一段足够长的正文内容，用于验证解析流程是否正常工作。</p></article></body></html>
+"""
+
+
+class FakeResponse:
+    def __init__(self, body, links=None):
+        self.content = body
+        self.encoding = "utf-8"
+        self.links = links or {}
+
+    def raise_for_status(self):
+        return None
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), 8):
+            yield self.content[start : start + 8]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        return False
+
+
+def _serve(monkeypatch, pages):
+    calls = []
+
+    class FakeSession:
+        def get(self, url, **_kwargs):
+            calls.append(url)
+            return FakeResponse(pages[url])
+
+    monkeypatch.setattr(http_client, "session", FakeSession)
+    return calls
+
+
+@pytest.fixture(autouse=True)
+def no_active_session():
+    yield
+    archive.activate(None)
+
+
+def test_put_dedupes_identical_bodies_and_indexes_by_url_and_run():
+    clock = iter([100.0, 200.0, 300.0])
+    store = RawArchive(clock=lambda: next(clock))
+
+    first = store.put("https://a.example/x", b"<html>same</html>", "run_1")
+    store.put("https://a.example/x", b"<html>same</html>", "run_2")
+    store.put("https://a.example/y", b"<html>other</html>", "run_2")
+
+    assert len(list(store.blobs.glob("*/*.zst"))) == 2
+    assert [entry.url for entry in store.entries(run_id="run_2")] == ["https://a.example/x", "https://a.example/y"]
+    assert store.latest("https://a.example/x").run_id == "run_2"
+    assert store.latest("https://a.example/x", at=150.0) == first
+    assert store.read(first) == b"<html>same</html>"
+
+
+def test_reparse_replays_archived_pages_without_network(monkeypatch):
+    from adapters import news
+
+    pages = {
+        "https://news.example": LISTING.encode("utf-8"),
+        "https://news.example/articles/1": ARTICLE.format(title="原始标题").encode("utf-8"),
+    }
+    calls = _serve(monkeypatch, pages)
+    source = Source(key="n", name="News", url="https://news.example")
+    store = RawArchive()
+
+    archive.activate(ArchiveSession(store, "run_1"))
+    crawled = news.fetch_news_for_source(source, limit=5, parser=ParserPool())
+    archive.activate(ArchiveSession(store, "run_1", replay=True))
+    calls.clear()
+    replayed = news.fetch_news_for_source(source, limit=5, parser=ParserPool())
+
+    assert calls == []
+    assert replayed == crawled
+    assert replayed[0].title == "原始标题"
+
+
+def test_replay_of_unknown_run_or_url_fails():
+    store = RawArchive()
+    with pytest.raises(ValueError):
+        ArchiveSession(store, "run_missing", replay=True)
+
+    store.put("https://a.example/x", b"{}", "run_1")
+    session = ArchiveSession(store, "run_1", replay=True)
+    with pytest.raises(RuntimeError):
+        session.replay("https://a.example/other")
+
+
+def test_streamed_catalog_stopped_early_replays_the_same_prefix(monkeypatch):
+    body = ("[" + ", ".join(f'{{"id": "m{i}"}}' for i in range(50)) + "]").encode("utf-8")
+    _serve(monkeypatch, {"https://hf.example/api/models": body})
+    store = RawArchive()
+
+    archive.activate(ArchiveSession(store, "run_1"))
+    items = http_client.iter_json_items("https://hf.example/api/models")
+    crawled = [next(items)["id"] for _ in range(3)]
+    items.close()
+    (entry,) = store.entries(run_id="run_1")
+    assert not entry.complete
+
+    archive.activate(ArchiveSession(store, "run_1", replay=True))
+    replayed = [item["id"] for item in http_client.iter_json_items("https://hf.example/api/models")]
+
+    assert crawled == ["m0", "m1", "m2"]
+    assert replayed[:3] == crawled
+    assert len(replayed) < 50
+
+
+def test_prune_drops_old_entries_and_unreferenced_blobs():
+    now = [1000.0]
+    store = RawArchive(clock=lambda: now[0])
+    store.put("https://a.example/old", b"old body", "run_1")
+    now[0] = 5000.0
+    kept = store.put("https://a.example/new", b"new body", "run_2")
+
+    assert store.prune(older_than=2000.0) == 1
+
+    assert store.entries() == [kept]
+    assert [path.stem for path in store.blobs.glob("*/*.zst")] == [kept.digest]
+    assert store.read(kept) == b"new body"
+
+
+def test_prune_waits_for_a_blob_being_committed(monkeypatch):
+    import threading
+
+    now = [1000.0]
+    store = RawArchive(clock=lambda: now[0])
+    store.put("https://a.example/old", b"same body", "run_1")
+    now[0] = 5000.0
+    pruner = threading.Thread(target=RawArchive(store.root, clock=lambda: now[0]).prune, args=(2000.0,))
+    finish = archive.BlobWriter.finish
+
+    def racing_finish(writer):
+        # Another process prunes the old entry, whose blob this body dedupes onto.
+        digest = finish(writer)
+        pruner.start()
+        pruner.join(timeout=0.2)
+        return digest
+
+    monkeypatch.setattr(archive.BlobWriter, "finish", racing_finish)
+    entry = store.put("https://a.example/new", b"same body", "run_2")
+    pruner.join()
+
+    assert store.entries() == [entry]
+    assert store.read(entry) == b"same body"
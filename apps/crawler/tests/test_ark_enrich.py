@@ -87,3 +87,171 @@ def test_enrich_articles_uses_ark_payload(monkeypatch):
     enriched = enrich_articles(rows)
     assert enriched[0].summary.startswith("这是一个企业知识库")
     assert enriched[0].tags == ["知识问答", "自动化工作流"]
+
+
+def test_call_ark_json_records_token_usage():
+    from types import SimpleNamespace
+
+    from ark_enrich import ArkStats, _call_ark_json
+
+    def create(**_kwargs):
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content='{"summary": "ok"}'))],
+            usage=SimpleNamespace(prompt_tokens=120, completion_tokens=15),
+        )
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    stats = ArkStats()
+
+    assert _call_ark_json(client, "prompt", stats=stats) == {"summary": "ok"}
+    assert _call_ark_json(client, "prompt", stats=stats) == {"summary": "ok"}
+    summary = stats.as_dict()
+    assert (summary["ark_calls"], summary["prompt_tokens"], summary["completion_tokens"]) == (2, 240, 30)
+    assert summary["estimated_calls"] == 0
+
+
+def test_enrich_articles_sends_compacted_content(monkeypatch):
+    from ark_enrich import enrich_articles
+
+    prompts = []
+
+    def fake_call(_client, prompt, **_kwargs):
+        prompts.append(prompt)
+        return {"summary": "摘要", "tags": ["知识问答"]}
+
+    monkeypatch.setattr("ark_enrich._build_client", lambda: object())
+    monkeypatch.setattr("ark_enrich._call_ark_json", fake_call)
+
+    rows = [
+        ArticleRecord(
+            title="知识库",
+            source="S",
+            url="https://example.com/a",
+            content="知识库落地需要三步。\n点击关注我们的公众号。\n知识库落地需要三步。",
+        )
+    ]
+    enrich_articles(rows)
+
+    assert prompts[0].endswith("content=知识库落地需要三步。")
+
+
+def _fake_client(create):
+    from types import SimpleNamespace
+
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def _completion(content):
+    from types import SimpleNamespace
+
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+def test_call_ark_json_hedges_slow_primary(monkeypatch):
+    import threading
+
+    import ark_enrich
+
+    tracker = ark_enrich.LatencyTracker()
+    for _ in range(ark_enrich.ARK_HEDGE_MIN_SAMPLES):
+        tracker.add(0.01)
+    monkeypatch.setattr(ark_enrich, "_LATENCY", tracker)
+    # A private hedge pool, drained below, so the released primary cannot finish
+    # inside a later test that patches time.monotonic.
+    monkeypatch.setattr(ark_enrich, "_HEDGE_EXECUTOR", None)
+    release = threading.Event()
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs["timeout"])
+        if len(calls) == 1:
+            release.wait(2)
+            return _completion('{"slow": true}')
+        return _completion('{"fast": true}')
+
+    stats = ark_enrich.ArkStats()
+    policy = ark_enrich.ArkCallPolicy(call_timeout=5, hedge=True)
+    payload = ark_enrich._call_ark_json(_fake_client(create), "p", stats=stats, policy=policy)
+    release.set()
+    ark_enrich._hedge_executor().shutdown(wait=True)
+
+    assert payload == {"fast": True}
+    assert (stats.hedged, stats.hedge_wins) == (1, 1)
+
+
+def test_enrich_models_stops_at_time_budget(monkeypatch):
+    import ark_enrich
+
+    clock = iter([0.0, 0.0, 0.5, 2.0, 2.0])
+    monkeypatch.setattr(ark_enrich.time, "monotonic", lambda: next(clock))
+    monkeypatch.setattr(ark_enrich, "_build_client", lambda: object())
+    monkeypatch.setattr(
+        ark_enrich,
+        "_call_ark_json",
+        lambda *_args, **_kwargs: {"description": "描述", "business_scenarios": ["知识问答"]},
+    )
+    rows = [ModelRecord(name=f"m{i}", provider="P") for i in range(3)]
+    stats = ark_enrich.ArkStats()
+
+    enriched = ark_enrich.enrich_models(rows, stats=stats, policy=ark_enrich.ArkCallPolicy(budget_seconds=1.0))
+
+    assert [row.name for row in enriched] == ["m0", "m1"]
+    assert stats.budget_skipped == 1
+
+
+def test_enrich_articles_collects_failures_instead_of_raising(monkeypatch):
+    from ark_enrich import enrich_articles
+
+    payloads = iter([{}, {"summary": "摘要", "tags": ["知识问答"]}])
+    monkeypatch.setattr("ark_enrich._build_client", lambda: object())
+    monkeypatch.setattr("ark_enrich._call_ark_json", lambda *_args, **_kwargs: next(payloads))
+    rows = [ArticleRecord(title=f"t{i}", source="S", url=f"https://example.com/{i}", content="c") for i in range(2)]
+
+    with pytest.raises(RuntimeError, match="https://example.com/0"):
+        enrich_articles(rows)
+
+    payloads = iter([{}, {"summary": "摘要", "tags": ["知识问答"]}])
+    failures = []
+    enriched = enrich_articles(rows, failures=failures)
+
+    assert [row.url for row in enriched] == ["https://example.com/1"]
+    assert [(row.url, reason) for row, reason in failures] == [
+        ("https://example.com/0", "Ark enrich failed for article: https://example.com/0")
+    ]
+
+
+def test_budget_running_out_mid_call_skips_rows_instead_of_failing_them(monkeypatch):
+    import ark_enrich
+
+    now = [0.0]
+
+    def create(**kwargs):
+        # The call outlives the budget.
+        now[0] = 2.0
+        raise TimeoutError("Request timed out")
+
+    monkeypatch.setattr(ark_enrich.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(ark_enrich, "_build_client", lambda: _fake_client(create))
+    rows = [ArticleRecord(title=f"t{i}", source="S", url=f"https://example.com/{i}", content="c") for i in range(3)]
+    stats, failures = ark_enrich.ArkStats(), []
+
+    policy = ark_enrich.ArkCallPolicy(budget_seconds=1.0, local_tagger=False)
+    enriched = ark_enrich.enrich_articles(rows, stats=stats, policy=policy, failures=failures)
+
+    assert enriched == [] and failures == []
+    assert stats.budget_skipped == 3
+
+
+def test_ark_client_leaves_retries_to_the_call_loop(monkeypatch):
+    import openai
+
+    import ark_enrich
+
+    created = []
+    monkeypatch.setattr(openai, "OpenAI", lambda **kwargs: created.append(kwargs) or object())
+    monkeypatch.setattr(ark_enrich, "_CLIENT", None)
+    monkeypatch.setenv("ARK_API_KEY", "test-key")
+
+    ark_enrich._build_client()
+
+    assert created[0]["max_retries"] == 0
@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+from loadtest.ark_mock import LatencySpec, MockArkServer, MockConfig, canned_payload
+from records import ArticleRecord
+
+
+def test_latency_spec_parses_distributions():
+    rng = random.Random(1)
+
+    assert LatencySpec.parse("fixed:0.25").sample(rng) == 0.25
+    assert 0.1 <= LatencySpec.parse("uniform:0.1,0.2").sample(rng) <= 0.2
+    assert LatencySpec.parse("lognormal:0.3,0.5").sample(rng) > 0
+    with pytest.raises(ValueError):
+        LatencySpec.parse("pareto:1")
+
+
+def test_enrich_articles_against_mock_server(monkeypatch):
+    import ark_enrich
+
+    with MockArkServer(MockConfig(seed=3)) as mock:
+        monkeypatch.setattr(ark_enrich, "ARK_BASE_URL", mock.base_url)
+        monkeypatch.setenv("ARK_API_KEY", "mock")
+        rows = [
+            ArticleRecord(title=f"t{i}", source="S", url=f"https://a/{i}", content="知识库落地需要三步。")
+            for i in range(3)
+        ]
+        stats = ark_enrich.ArkStats()
+
+        enriched = ark_enrich.enrich_articles(rows, stats=stats)
+
+    assert [row.summary for row in enriched] == [
+        canned_payload(ark_prompt, seed=3)["summary"] for ark_prompt in mock.prompts
+    ]
+    assert stats.calls == 3 and stats.estimated_calls == 0
+    assert mock.counts["ok"] == 3
+
+
+def test_mock_server_injects_rate_limits():
+    import requests
+
+    with MockArkServer(MockConfig(rate_limit_rate=1.0)) as mock:
+        response = requests.post(f"{mock.base_url}/chat/completions", json={"messages": []}, timeout=5)
+
+    assert response.status_code == 429
+    assert mock.counts["rate_limited"] == 1
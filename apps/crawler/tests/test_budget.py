@@ -0,0 +1,77 @@
+from budget import PERSIST_ONLY, SKIP_LOW_PRIORITY_ENRICH, RunBudget, enrichment_plan
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_unbounded_budget_never_expires_or_degrades():
+    budget = RunBudget(None)
+
+    assert not budget.bounded
+    assert not budget.slice("fetch", 0.1).bounded
+    assert enrichment_plan(50, budget, seconds_per_call=10) == (50, None)
+
+
+def test_slices_split_remaining_time_and_share_degradations():
+    clock = FakeClock()
+    budget = RunBudget(100, clock=clock)
+    models = budget.slice("models", 0.4, reserve=10)
+
+    assert models.remaining() == 36
+    clock.now = 50
+    assert models.expired()
+    assert budget.slice("news", 1.0, reserve=10).remaining() == 40
+
+    models.degrade("rss_only", "qbitai")
+    models.degrade("rss_only", "qbitai")
+    assert budget.degradations == ["run.models:rss_only (qbitai)"]
+
+
+def test_enrichment_plan_walks_the_degradation_ladder():
+    clock = FakeClock()
+
+    assert enrichment_plan(10, RunBudget(100, clock=clock), seconds_per_call=2) == (10, None)
+    assert enrichment_plan(10, RunBudget(12, clock=clock), seconds_per_call=2) == (6, SKIP_LOW_PRIORITY_ENRICH)
+    assert enrichment_plan(10, RunBudget(3, clock=clock), seconds_per_call=2) == (0, PERSIST_ONLY)
+
+
+def test_news_pipeline_persists_raw_rows_when_budget_is_exhausted(monkeypatch):
+    from pipelines import news_pipeline
+    from records import ArticleRecord
+    from sources import Source
+
+    calls = {}
+
+    def fake_fetch(source, limit, parser=None, rss_only=False, deadline=None, since=None, sitemap_state=None):
+        calls["rss_only"] = rss_only
+        return [ArticleRecord(title="t", source="A", url="https://a.example/1", content="body")]
+
+    def fail_enrich(rows, **_kwargs):
+        raise AssertionError("enrichment should be skipped")
+
+    persisted = {}
+
+    def fake_upsert(rows, run_id=None, errors=None, raw=False):
+        if rows:
+            persisted["rows"], persisted["raw"] = rows, raw
+        return len(rows)
+
+    monkeypatch.setattr(news_pipeline, "NEWS_SOURCES", [Source(key="a", name="A", url="u", fallback="f")])
+    monkeypatch.setattr(news_pipeline, "fetch_news_for_source", fake_fetch)
+    monkeypatch.setattr(news_pipeline, "enrich_articles", fail_enrich)
+    monkeypatch.setattr(news_pipeline, "upsert_articles", fake_upsert)
+
+    budget = RunBudget(4, name="news")
+    stats = news_pipeline.run_news_pipeline(limit_per_source=5, budget=budget)
+
+    assert calls["rss_only"] is True
+    assert stats["persisted"] == 1
+    assert [row.url for row in persisted["rows"]] == ["https://a.example/1"]
+    assert persisted["raw"] is True
+    assert budget.degradations[0] == "news:rss_only (a)"
+    assert budget.degradations[1].startswith("news:persist_only")
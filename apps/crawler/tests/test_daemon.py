@@ -0,0 +1,75 @@
+import json
+import urllib.request
+
+from daemon import CrawlDaemon, start_health_server
+from sources import Source
+
+HOT = Source(key="hot", name="Hot", url="https://hot.example", interval=900)
+SLOW = Source(key="slow", name="Slow", url="https://slow.example")
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _daemon(calls, clock, cadences=None):
+    def run_cycle(selection, sink, parser, intervals):
+        calls.append({pipeline: [source.key for source in sources] for pipeline, sources in selection.items()})
+        if cadences is not None:
+            cadences.append(intervals)
+        return {"run_id": "r", "status": "success", "articles": {"persisted": 2}}
+
+    return CrawlDaemon(run_cycle, sink=object(), parser=object(), selection={"news": [HOT, SLOW]}, clock=clock)
+
+
+def test_sources_run_on_their_own_interval():
+    calls, clock = [], FakeClock()
+    daemon = _daemon(calls, clock)
+
+    daemon.run_once()
+    clock.now += 900
+    daemon.run_once()
+    clock.now += 100
+    assert daemon.run_once() is None
+    clock.now += 2600
+    daemon.run_once()
+
+    assert calls == [{"news": ["hot", "slow"]}, {"news": ["hot"]}, {"news": ["hot", "slow"]}]
+    assert daemon.persisted["news"] == 6
+
+
+def test_cycles_pass_each_sources_interval_for_backoff():
+    from scheduler import SourceHistory, plan_sources
+
+    cadences, clock = [], FakeClock()
+    _daemon([], clock, cadences).run_once()
+
+    assert cadences == [{"hot": 900.0, "slow": 3600.0}]
+    # An idle source the daemon runs every 15 minutes backs off by minutes,
+    # not by the daily-cron unit.
+    history = SourceHistory("news")
+    history.record("hot", requested=5, new=0, failed=False, seconds=1, now=clock.now)
+    plans, backed_off = plan_sources([HOT], history, base_limit=5, now=clock.now + 900, intervals=cadences[0])
+    assert [plan.source.key for plan in plans] == ["hot"] and backed_off == []
+
+
+def test_health_and_metrics_endpoints():
+    daemon = _daemon([], FakeClock())
+    daemon.run_once()
+    server = start_health_server(daemon, "127.0.0.1", 0)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        health = json.loads(urllib.request.urlopen(f"{base}/healthz", timeout=5).read())
+        metrics = urllib.request.urlopen(f"{base}/metrics", timeout=5).read().decode("utf-8")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert health["status"] == "ok"
+    assert health["last_cycle"]["sources"] == ["hot", "slow"]
+    assert "crawler_cycles_total 1" in metrics
+    assert 'crawler_persisted_total{pipeline="news"} 2' in metrics
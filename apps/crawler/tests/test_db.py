@@ -0,0 +1,149 @@
+import pytest
+
+from records import ArticleRecord
+
+
+def _articles(count, content="正文" * 50):
+    return [
+        ArticleRecord(title=f"t{i}", source="S", url=f"https://a.example/{i}", content=content)
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def supabase_env(monkeypatch):
+    monkeypatch.setenv("SUPABASE_URL", "https://db.example")
+    monkeypatch.setenv("SUPABASE_SERVICE_ROLE_KEY", "key")
+    monkeypatch.setattr("db.time.sleep", lambda _seconds: None)
+
+
+def test_chunk_payloads_respects_row_and_byte_limits():
+    from db import _chunk_payloads
+
+    payloads = [{"url": f"u{i}", "content": "x" * 100} for i in range(10)]
+
+    by_rows = _chunk_payloads(payloads, max_rows=4, max_bytes=10_000)
+    by_bytes = _chunk_payloads(payloads, max_rows=100, max_bytes=300)
+
+    assert [len(chunk) for chunk in by_rows] == [4, 4, 2]
+    assert all(len(chunk) <= 2 for chunk in by_bytes)
+    assert sum(len(chunk) for chunk in by_bytes) == 10
+
+
+def test_upsert_articles_reports_partial_chunk_failures(monkeypatch, supabase_env):
+    import db
+
+    monkeypatch.setattr(db, "ARTICLE_UPSERT_MAX_ROWS", 2)
+    attempts = {}
+
+    def fake_request(method, url, key, payload=None, prefer=None, timeout=30):
+        first_url = payload[0]["url"]
+        attempts[first_url] = attempts.get(first_url, 0) + 1
+        if first_url.endswith("/2"):
+            raise db.SupabaseError(500, "boom")
+        return []
+
+    monkeypatch.setattr(db, "_request", fake_request)
+    errors = []
+
+    persisted = db.upsert_articles(_articles(5), run_id="run_x", errors=errors)
+
+    assert persisted == 3
+    assert len(errors) == 1 and "chunk 2/3" in errors[0]
+    assert attempts["https://a.example/2"] == db.SUPABASE_RETRY + 1
+    assert attempts["https://a.example/0"] == 1
+
+
+def test_upsert_articles_strips_missing_columns_once(monkeypatch, supabase_env):
+    import db
+
+    monkeypatch.setattr(db, "ARTICLE_UPSERT_MAX_ROWS", 1)
+    monkeypatch.setattr(db, "ARTICLE_UPSERT_CONCURRENCY", 1)
+    sent = []
+
+    def fake_request(method, url, key, payload=None, prefer=None, timeout=30):
+        if "crawl_run_id" in payload[0]:
+            raise db.SupabaseError(400, "column articles.crawl_run_id does not exist")
+        sent.append(payload[0]["url"])
+        return []
+
+    monkeypatch.setattr(db, "_request", fake_request)
+
+    assert db.upsert_articles(_articles(3), run_id="run_x") == 3
+    assert len(sent) == 3
+
+
+def test_upsert_articles_strips_missing_columns_in_concurrent_chunks(monkeypatch, supabase_env):
+    import threading
+
+    import db
+
+    monkeypatch.setattr(db, "ARTICLE_UPSERT_MAX_ROWS", 1)
+    monkeypatch.setattr(db, "ARTICLE_UPSERT_CONCURRENCY", 4)
+    # Every first request is held until four are in flight, so all of them go
+    # out with the optional columns before any has seen the 400.
+    barrier = threading.Barrier(4, timeout=5)
+    sent = []
+
+    def fake_request(method, url, key, payload=None, prefer=None, timeout=30):
+        if "crawl_run_id" in payload[0]:
+            try:
+                barrier.wait()
+            except threading.BrokenBarrierError:
+                pass
+            raise db.SupabaseError(400, "column articles.crawl_run_id does not exist")
+        sent.append(payload[0]["url"])
+        return []
+
+    monkeypatch.setattr(db, "_request", fake_request)
+    errors = []
+
+    assert db.upsert_articles(_articles(8), run_id="run_x", errors=errors) == 8
+    assert errors == []
+    assert len(sent) == 8
+
+
+def test_upsert_articles_raises_when_every_chunk_fails(monkeypatch, supabase_env):
+    import db
+
+    def fake_request(*_args, **_kwargs):
+        raise db.SupabaseError(413, "payload too large")
+
+    monkeypatch.setattr(db, "_request", fake_request)
+
+    with pytest.raises(RuntimeError, match="413"):
+        db.upsert_articles(_articles(2))
+
+
+def test_refresh_scenario_stats_calls_rpc_and_tolerates_missing_function(monkeypatch, supabase_env):
+    import db
+
+    calls = []
+
+    def fake_request(method, url, key, payload=None, prefer=None, timeout=30):
+        calls.append((method, url, payload))
+        return []
+
+    monkeypatch.setattr(db, "_request", fake_request)
+
+    assert db.refresh_scenario_stats(["知识问答", "客服对话"], run_id="run_x") == 2
+    # With nothing written the call still folds in the scenarios marked dirty.
+    assert db.refresh_scenario_stats([]) == 0
+    assert calls == [
+        (
+            "POST",
+            "https://db.example/rest/v1/rpc/refresh_scenario_stats",
+            {"scenarios": ["知识问答", "客服对话"], "top_n": db.SCENARIO_TOP_N, "run_id": "run_x"},
+        ),
+        (
+            "POST",
+            "https://db.example/rest/v1/rpc/refresh_scenario_stats",
+            {"scenarios": [], "top_n": db.SCENARIO_TOP_N, "run_id": None},
+        ),
+    ]
+
+    def missing(*_args, **_kwargs):
+        raise db.SupabaseError(404, "Could not find the function public.refresh_scenario_stats")
+
+    monkeypatch.setattr(db, "_request", missing)
+    assert db.refresh_scenario_stats(["知识问答"]) == 0
@@ -0,0 +1,99 @@
+from records import ArticleRecord, ModelRecord
+from sources import DLQ_RETRY_BASE, Source
+
+
+def test_dead_letters_back_off_and_park_after_max_attempts():
+    from deadletter import DeadLetters
+
+    now = [1000.0]
+    store = DeadLetters(clock=lambda: now[0], max_attempts=3)
+
+    assert store.add("article", "https://a/1", {"url": "https://a/1"}, "empty payload") == 1
+    assert store.due("article", 10) == []
+    now[0] += DLQ_RETRY_BASE
+    assert store.due("article", 10) == [("https://a/1", {"url": "https://a/1"})]
+
+    assert store.add("article", "https://a/1", {"url": "https://a/1"}, "invalid payload") == 2
+    now[0] += DLQ_RETRY_BASE
+    assert store.due("article", 10) == []
+    now[0] += DLQ_RETRY_BASE
+    assert len(store.due("article", 10)) == 1
+
+    assert store.add("article", "https://a/1", {"url": "https://a/1"}, "invalid payload") == 3
+    now[0] += 1e9
+    assert store.due("article", 10) == []
+    assert store.counts() == {"article": {"parked": 1}}
+
+    assert store.resolve("article", ["https://a/1", "https://a/missing"]) == 1
+    assert store.depth() == 0
+    store.close()
+
+
+def test_news_pipeline_dead_letters_bad_records_and_retries_them(monkeypatch):
+    from deadletter import DeadLetters
+    from pipelines import news_pipeline
+
+    rows = [
+        ArticleRecord(title="good", source="A", url="https://a.example/1", content="body"),
+        ArticleRecord(title="bad", source="A", url="https://a.example/2", content="body"),
+    ]
+    broken = {"https://a.example/2"}
+
+    def fake_enrich(records, failures=None, **_kwargs):
+        enriched = []
+        for row in records:
+            if row.url in broken:
+                failures.append((row, f"Ark returned invalid article payload: {row.url}"))
+            else:
+                enriched.append(row)
+        return enriched
+
+    persisted = []
+    monkeypatch.setattr(news_pipeline, "NEWS_SOURCES", [Source(key="a", name="A", url="https://a.example")])
+    monkeypatch.setattr(news_pipeline, "fetch_news_for_source", lambda *_args, **_kwargs: list(rows))
+    monkeypatch.setattr(news_pipeline, "enrich_articles", fake_enrich)
+    monkeypatch.setattr(
+        news_pipeline, "upsert_articles", lambda records, **_kwargs: persisted.extend(records) or len(records)
+    )
+
+    stats = news_pipeline.run_news_pipeline(limit_per_source=5, adaptive=False)
+
+    assert [row.url for row in persisted] == ["https://a.example/1"]
+    assert (stats["persisted"], stats["dead_lettered"], stats["dlq_depth"]) == (1, 1, 1)
+
+    # Once due, the record is retried without being crawled again and leaves
+    # the store when it enriches.
+    store = DeadLetters()
+    store.connection.execute("update dead_letters set retry_at = 0")
+    store.close()
+    rows.clear()
+    broken.clear()
+    persisted.clear()
+
+    stats = news_pipeline.run_news_pipeline(limit_per_source=5, adaptive=False)
+
+    assert [row.title for row in persisted] == ["bad"]
+    assert (stats["dlq_retried"], stats["dlq_recovered"], stats["dlq_depth"]) == (1, 1, 0)
+
+
+def test_model_pipeline_keeps_going_past_a_failed_model(monkeypatch):
+    from pipelines import model_pipeline
+
+    def fake_enrich(records, failures=None, **_kwargs):
+        failures.append((records[0], "Ark enrich failed for model: P/m0"))
+        return records[1:]
+
+    persisted = []
+    monkeypatch.setattr(model_pipeline, "MODEL_SOURCES", [Source(key="a", name="A", url="https://a.example")])
+    monkeypatch.setattr(
+        model_pipeline,
+        "fetch_models_for_source",
+        lambda *_args, **_kwargs: [ModelRecord(name=f"m{index}", provider="P") for index in range(3)],
+    )
+    monkeypatch.setattr(model_pipeline, "enrich_models", fake_enrich)
+    monkeypatch.setattr(model_pipeline, "upsert_models", lambda records, **_kwargs: persisted.extend(records) or 2)
+
+    stats = model_pipeline.run_model_pipeline(limit_per_source=5, adaptive=False)
+
+    assert [row.name for row in persisted] == ["m1", "m2"]
+    assert (stats["dead_lettered"], stats["dlq_depth"]) == (1, 1)
@@ -0,0 +1,138 @@
+import sqlite3
+
+from entities import EntityIndex, entity_key
+from records import ModelAlias, ModelRecord
+from sinks import SQLiteSink
+from sources import Source
+
+
+def test_entity_key_normalizes_provider_prefixes_and_spelling():
+    assert entity_key("OpenAI: GPT-4o") == entity_key("openai/gpt-4o") == entity_key("gpt-4o")
+    assert entity_key("claude-3-5-sonnet") == entity_key("Claude 3.5 Sonnet")
+    assert entity_key("meta-llama/Llama-3.1-8B-Instruct").matches(entity_key("bartowski/llama-3.1-8b-instruct-GGUF"))
+    assert entity_key("qwen2.5-72b-instruct") == entity_key("Qwen/Qwen2.5-72B-Instruct")
+    assert entity_key("gpt-4o") != entity_key("gpt-4o-mini")
+    assert entity_key("llama-3.1-8b") != entity_key("llama-3.1-70b")
+    assert entity_key("2024-preview") is None
+
+
+def test_resolve_collapses_mirrors_onto_one_canonical_row():
+    rows = [
+        ModelRecord(name="openai/gpt-4o", provider="HuggingFace", description="mirror card"),
+        ModelRecord(name="OpenAI: GPT-4o", provider="OpenRouter", cost_input=2.5, cost_output=10.0),
+        ModelRecord(name="gpt-4o", provider="LiteLLM", docs_url="https://docs.example/gpt-4o"),
+        ModelRecord(name="gpt-4o-mini", provider="LiteLLM"),
+    ]
+    index = EntityIndex()
+
+    kept, aliases = index.resolve(rows)
+
+    assert [(row.provider, row.name) for row in kept] == [("OpenRouter", "OpenAI: GPT-4o"), ("LiteLLM", "gpt-4o-mini")]
+    assert kept[0].description == "mirror card"
+    assert kept[0].docs_url == "https://docs.example/gpt-4o"
+    assert {(alias.alias_provider, alias.alias_name) for alias in aliases} == {
+        ("HuggingFace", "openai/gpt-4o"),
+        ("LiteLLM", "gpt-4o"),
+    }
+    assert {(alias.canonical_provider, alias.canonical_name) for alias in aliases} == {("OpenRouter", "OpenAI: GPT-4o")}
+
+
+def test_saved_index_links_later_rows_to_the_existing_canonical():
+    first = EntityIndex()
+    first.resolve([ModelRecord(name="Claude 3.5 Sonnet", provider="OpenRouter", cost_input=3.0)])
+    first.save()
+
+    second = EntityIndex()
+    kept, aliases = second.resolve(
+        [ModelRecord(name="claude-3-5-sonnet", provider="LiteLLM", cost_input=3.0, source_url="https://l/claude")]
+    )
+
+    # The alias's data comes back under the canonical identity, flagged for a
+    # field-by-field write, and without the alias's catalog link.
+    assert kept == [ModelRecord(name="Claude 3.5 Sonnet", provider="OpenRouter", cost_input=3.0)]
+    assert second.partial == {("OpenRouter", "Claude 3.5 Sonnet")}
+    assert aliases == [ModelAlias("LiteLLM", "claude-3-5-sonnet", "OpenRouter", "Claude 3.5 Sonnet")]
+
+
+def test_concurrent_indexes_merge_their_entities_on_save():
+    first, second = EntityIndex(), EntityIndex()
+    first.resolve([ModelRecord(name="gpt-4o", provider="OpenRouter")])
+    second.resolve([ModelRecord(name="qwen2.5-72b-instruct", provider="LiteLLM")])
+    # Found by both workers; the one saved first stays canonical.
+    second.resolve([ModelRecord(name="openai/gpt-4o", provider="HuggingFace")])
+    first.save()
+    second.save()
+
+    saved = EntityIndex()
+    assert [(entity.provider, entity.name) for entity in saved.entities] == [
+        ("OpenRouter", "gpt-4o"),
+        ("LiteLLM", "qwen2.5-72b-instruct"),
+    ]
+
+
+def test_model_pipeline_merges_changed_alias_onto_stored_canonical(monkeypatch, tmp_path):
+    from pipelines import model_pipeline
+
+    catalogs = {
+        "openrouter": [ModelRecord(name="OpenAI: GPT-4o", provider="OpenRouter", cost_input=2.5, cost_output=10.0)],
+        "huggingface": [ModelRecord(name="openai/gpt-4o", provider="HuggingFace", docs_url="https://hf/v1")],
+    }
+    monkeypatch.setattr(
+        model_pipeline,
+        "MODEL_SOURCES",
+        [Source(key=key, name=key, url=f"https://{key}.example") for key in catalogs],
+    )
+    monkeypatch.setattr(
+        model_pipeline, "fetch_models_for_source", lambda source, limit, snapshot=None, **_kwargs: catalogs[source.key]
+    )
+    monkeypatch.setattr(model_pipeline, "enrich_models", lambda rows, **_kwargs: rows)
+    sink = SQLiteSink(tmp_path / "crawler.sqlite3")
+
+    model_pipeline.run_model_pipeline(limit_per_source=10, sink=sink, adaptive=False)
+    # Run 2: the canonical's catalog entry is unchanged (diffed away), only the
+    # mirror's changed.
+    catalogs["openrouter"] = []
+    catalogs["huggingface"] = [ModelRecord(name="openai/gpt-4o", provider="HuggingFace", docs_url="https://hf/v2")]
+    stats = model_pipeline.run_model_pipeline(limit_per_source=10, sink=sink, adaptive=False)
+
+    rows = sink.connection.execute("select provider, name, cost_input, docs_url from models").fetchall()
+    assert rows == [("OpenRouter", "OpenAI: GPT-4o", 2.5, "https://hf/v2")]
+    assert stats["persisted"] == 1
+    sink.close()
+
+
+def test_model_pipeline_enriches_canonical_rows_and_persists_aliases(monkeypatch):
+    from pipelines import model_pipeline
+
+    def fake_fetch(source, limit, snapshot=None, **_kwargs):
+        if source.key == "openrouter":
+            return [ModelRecord(name="OpenAI: GPT-4o", provider="OpenRouter", cost_input=2.5)]
+        return [ModelRecord(name="gpt-4o", provider="LiteLLM"), ModelRecord(name="o3-mini", provider="LiteLLM")]
+
+    enriched, linked = [], []
+    fake_sources = [
+        Source(key="openrouter", name="OpenRouter", url="https://o.example"),
+        Source(key="litellm", name="LiteLLM", url="https://l.example"),
+    ]
+    monkeypatch.setattr(model_pipeline, "MODEL_SOURCES", fake_sources)
+    monkeypatch.setattr(model_pipeline, "fetch_models_for_source", fake_fetch)
+    monkeypatch.setattr(model_pipeline, "enrich_models", lambda rows, **_kwargs: enriched.extend(rows) or rows)
+    monkeypatch.setattr(model_pipeline, "upsert_models", lambda rows, run_id=None: len(rows))
+    monkeypatch.setattr(model_pipeline, "upsert_model_aliases", lambda rows, run_id=None: linked.extend(rows))
+
+    stats = model_pipeline.run_model_pipeline(limit_per_source=10, run_id="run_1")
+
+    assert [row.name for row in enriched] == ["OpenAI: GPT-4o", "o3-mini"]
+    assert linked == [ModelAlias("LiteLLM", "gpt-4o", "OpenRouter", "OpenAI: GPT-4o")]
+    assert stats["aliased"] == 1 and stats["persisted"] == 2
+
+
+def test_sqlite_sink_upserts_aliases_on_alias_key(tmp_path):
+    sink = SQLiteSink(tmp_path / "crawler.sqlite3")
+    sink.upsert_model_aliases([ModelAlias("LiteLLM", "gpt-4o", "HuggingFace", "openai/gpt-4o")], run_id="run_1")
+    sink.upsert_model_aliases([ModelAlias("LiteLLM", "gpt-4o", "OpenRouter", "OpenAI: GPT-4o")], run_id="run_2")
+    sink.close()
+
+    connection = sqlite3.connect(tmp_path / "crawler.sqlite3")
+    rows = connection.execute("select alias_name, canonical_provider, crawl_run_id from model_aliases").fetchall()
+    assert rows == [("gpt-4o", "OpenRouter", "run_2")]
@@ -0,0 +1,119 @@
+import pytest
+
+from http_client import iter_json_array
+
+
+def test_iter_json_array_decodes_elements_split_across_chunks():
+    document = '[{"id": "a/1", "tags": ["x"]}, {"id": "b/2"}, 12345]'
+    chunks = [document[i : i + 5] for i in range(0, len(document), 5)]
+
+    items = list(iter_json_array(chunks))
+
+    assert items == [{"id": "a/1", "tags": ["x"]}, {"id": "b/2"}, 12345]
+
+
+def test_iter_json_array_reads_array_under_key():
+    chunks = ['{"data"', ': [{"id": "m1"},', ' {"id": "m2"}', "]}"]
+
+    assert [item["id"] for item in iter_json_array(chunks, key="data")] == ["m1", "m2"]
+
+
+def test_iter_json_array_stops_when_consumer_stops():
+    pulled = []
+
+    def chunks():
+        for part in ["[", '{"id": 1},', '{"id": 2},', '{"id": 3}]']:
+            pulled.append(part)
+            yield part
+
+    iterator = iter_json_array(chunks())
+    assert next(iterator) == {"id": 1}
+    assert len(pulled) < 4
+
+
+def test_iter_json_array_raises_on_truncated_document():
+    with pytest.raises(ValueError):
+        list(iter_json_array(['[{"id": 1}, {"id"']))
+
+
+def test_iter_json_items_follows_link_header(monkeypatch):
+    import http_client
+
+    pages = {
+        "https://hf.example/api/models?limit=2": ('[{"id": "a"}, {"id": "b"}]', "https://hf.example/api/models?cursor=x"),
+        "https://hf.example/api/models?cursor=x": ('[{"id": "c"}]', None),
+    }
+
+    class FakeResponse:
+        def __init__(self, url):
+            self.body, next_url = pages[url]
+            self.links = {"next": {"url": next_url}} if next_url else {}
+            self.encoding = "utf-8"
+
+        def raise_for_status(self):
+            return None
+
+        def iter_content(self, chunk_size):
+            yield self.body.encode("utf-8")
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *_exc):
+            return False
+
+    class FakeSession:
+        def get(self, url, **_kwargs):
+            return FakeResponse(url)
+
+    monkeypatch.setattr(http_client, "session", FakeSession)
+
+    items = list(http_client.iter_json_items("https://hf.example/api/models?limit=2"))
+
+    assert [item["id"] for item in items] == ["a", "b", "c"]
+
+
+def test_host_policy_caps_bodies_and_paces_requests(monkeypatch):
+    import http_client
+    from sources import Source
+
+    served = {"https://capped.example/big": b"x" * 100, "https://capped.example/small": b"ok"}
+    sleeps = []
+
+    class FakeResponse:
+        def __init__(self, url):
+            self.body = served[url]
+            self.headers = {}
+            self.encoding = "utf-8"
+            self.closed = False
+
+        def raise_for_status(self):
+            return None
+
+        def iter_content(self, chunk_size):
+            for start in range(0, len(self.body), 16):
+                yield self.body[start : start + 16]
+
+        def close(self):
+            self.closed = True
+
+        @property
+        def content(self):
+            return self._content
+
+    class FakeSession:
+        def get(self, url, **_kwargs):
+            return FakeResponse(url)
+
+    monkeypatch.setattr(http_client, "session", FakeSession)
+    monkeypatch.setattr(http_client.time, "sleep", sleeps.append)
+    capped = Source(key="c", name="C", url="https://capped.example", rate_limit=1000, max_bytes=50)
+    http_client.configure_hosts([capped])
+    try:
+        assert http_client.fetch_bytes("https://capped.example/small") == (b"ok", "utf-8")
+        with pytest.raises(http_client.ResponseTooLarge):
+            http_client.fetch_bytes("https://capped.example/big")
+    finally:
+        http_client.configure_hosts([*http_client.MODEL_SOURCES, *http_client.NEWS_SOURCES])
+
+    assert len(sleeps) == 1 and 0 < sleeps[0] <= 0.001
@@ -0,0 +1,63 @@
+from sources import Source
+
+
+def test_fetch_models_for_source_stops_paging_at_limit(monkeypatch):
+    from adapters import models
+
+    consumed = []
+
+    def fake_items(url, key=None, max_pages=None):
+        for index in range(10_000):
+            consumed.append(index)
+            yield {"id": f"org/model-{index % 3000}", "pipeline_tag": "text-generation"}
+
+    monkeypatch.setattr(models, "iter_json_items", fake_items)
+    source = Source(key="huggingface", name="HF", url="https://huggingface.co/models")
+
+    records = models.fetch_models_for_source(source, limit=5)
+
+    assert [row.name for row in records] == [f"org/model-{i}" for i in range(5)]
+    assert len(consumed) == 5
+
+
+def test_fetch_models_for_source_skips_duplicate_names(monkeypatch):
+    from adapters import models
+
+    rows = [
+        {"id": "openai/gpt-4o", "name": "GPT-4o"},
+        {"id": "openai/gpt-4o:extended", "name": "gpt 4o"},
+        {"id": "openai/gpt-4o-mini", "name": "GPT-4o mini"},
+    ]
+    monkeypatch.setattr(models, "iter_json_items", lambda *_args, **_kwargs: iter(rows))
+    source = Source(key="openrouter", name="OpenRouter", url="https://openrouter.ai/models")
+
+    records = models.fetch_models_for_source(source, limit=10)
+
+    assert [row.name for row in records] == ["GPT-4o", "GPT-4o mini"]
+
+
+def test_fetch_models_for_source_stops_an_unchanged_catalog_at_the_deadline(monkeypatch, tmp_path):
+    import time
+
+    from adapters import models
+    from snapshots import CatalogSnapshot
+
+    consumed = []
+
+    def fake_items(url, key=None, max_pages=None):
+        for index in range(100):
+            consumed.append(index)
+            yield {"id": f"org/model-{index}", "pipeline_tag": "text-generation"}
+
+    monkeypatch.setattr(models, "iter_json_items", fake_items)
+    source = Source(key="huggingface", name="HF", url="https://huggingface.co/models")
+    first = CatalogSnapshot("huggingface", path=tmp_path / "hf.jsonl.gz")
+    models.fetch_models_for_source(source, limit=1000, snapshot=first)
+    first.commit()
+    consumed.clear()
+
+    second = CatalogSnapshot("huggingface", path=tmp_path / "hf.jsonl.gz")
+    records = models.fetch_models_for_source(source, limit=1000, snapshot=second, deadline=time.monotonic() - 1)
+
+    assert records == [] and len(consumed) == 1
+    assert not second.complete
@@ -0,0 +1,207 @@
+from parser_pool import ParserPool
+from sources import Source
+
+LISTING = """
+<html><body>
+  <a href="/articles/1">企业知识库落地的十个关键步骤</a>
+  <a href="/articles/2">大模型推理成本下降的技术路径</a>
+  <a href="https://other.example/x">站外链接也有足够长的标题</a>
+</body></html>
+"""
+
+ARTICLE = """
+<html><head><title>站点标题</title></head><body>
+  <h1>{title}</h1><time datetime="2026-10-17T08:30:00+08:00">10月17日</time>
+  <article><p>这是一段足够长的正文内容，用于验证解析流程是否正常工作。</p></article>
+</body></html>
+"""
+
+
+def _fake_fetch_bytes(url, retries=1):
+    if url == "https://news.example":
+        return LISTING.encode("utf-8"), "utf-8"
+    return ARTICLE.format(title=f"标题 {url[-1]}").encode("utf-8"), "utf-8"
+
+
+def test_fetch_news_for_source_parses_in_worker_processes(monkeypatch):
+    from adapters import news
+
+    monkeypatch.setattr(news, "fetch_bytes", _fake_fetch_bytes)
+    source = Source(key="n", name="News", url="https://news.example")
+
+    with ParserPool(workers=2) as parser:
+        records = news.fetch_news_for_source(source, limit=5, parser=parser)
+
+    assert [row.title for row in records] == ["标题 1", "标题 2"]
+    assert records[0].published_at == "2026-10-17T00:30:00+00:00"
+    assert "正文内容" in records[0].content
+
+
+def test_fetch_details_retries_pages_without_title(monkeypatch):
+    from adapters import news
+
+    calls = []
+
+    def flaky_fetch(url, retries=1):
+        calls.append(url)
+        if len(calls) == 1:
+            return b"<html><body><p>loading</p></body></html>", "utf-8"
+        return ARTICLE.format(title="第二次成功").encode("utf-8"), "utf-8"
+
+    monkeypatch.setattr(news, "fetch_bytes", flaky_fetch)
+
+    details = news.fetch_details(["https://news.example/a"], retries=3, parser=ParserPool())
+
+    assert details["https://news.example/a"][0] == "第二次成功"
+    assert len(calls) == 2
+
+
+def test_extract_article_content_prefers_dense_block_over_navigation():
+    from adapters.news import _extract_article_content
+
+    html = """
+    <html><head><title>页面标题</title></head><body>
+      <div class="nav"><p><a href="/a">相关阅读：一篇很长很长的推荐文章标题链接</a></p></div>
+      <div class="sidebar"><p>订阅我们的newsletter获取每日人工智能资讯推送</p></div>
+      <div class="main">
+        <p>第一段正文讲述了大模型在企业知识库场景中的落地路径与关键挑战。</p>
+        <p>第二段正文继续分析检索增强生成的成本结构以及推理延迟的优化手段。</p>
+      </div>
+      <time>2026-10-17 08:30</time>
+    </body></html>
+    """
+
+    title, content, published_at = _extract_article_content(html)
+
+    assert title == "页面标题"
+    assert content.splitlines() == [
+        "第一段正文讲述了大模型在企业知识库场景中的落地路径与关键挑战。",
+        "第二段正文继续分析检索增强生成的成本结构以及推理延迟的优化手段。",
+    ]
+    assert published_at == "2026-10-17 08:30"
+
+
+def test_extract_article_content_stops_after_max_blocks():
+    from adapters.news import MAX_CONTENT_BLOCKS, _extract_article_content
+
+    paragraphs = "".join(f"<p>第{i}段内容，足够长的正文文本用于测试截断逻辑。</p>" for i in range(200))
+    html = f"<html><body><h1>长文</h1><article>{paragraphs}</article></body></html>"
+
+    title, content, _published_at = _extract_article_content(html)
+
+    assert title == "长文"
+    assert len(content.splitlines()) == MAX_CONTENT_BLOCKS
+    assert content.splitlines()[-1].startswith(f"第{MAX_CONTENT_BLOCKS - 1}段")
+
+
+def test_rss_records_skip_items_at_or_before_since(monkeypatch):
+    from datetime import datetime, timezone
+
+    from adapters import news
+
+    feed = """<rss><channel>
+      <item><title>新文章</title><link>https://news.example/a/2</link><pubDate>2026年10月18日 09:00</pubDate></item>
+      <item><title>旧文章</title><link>https://news.example/a/1</link><pubDate>2026年10月16日 09:00</pubDate></item>
+    </channel></rss>"""
+    monkeypatch.setattr(news, "fetch_text", lambda url, retries=1: feed)
+    source = Source(key="n", name="News", url="https://news.example", fallback="https://news.example/rss")
+
+    since = datetime(2026, 10, 17, tzinfo=timezone.utc)
+    records = news.fetch_news_for_source(source, limit=5, rss_only=True, since=since)
+
+    assert [(row.title, row.published_at) for row in records] == [("新文章", "2026-10-18T01:00:00+00:00")]
+
+
+def test_fetch_details_downloads_pages_concurrently(monkeypatch):
+    import threading
+
+    from adapters import news
+
+    barrier = threading.Barrier(3, timeout=5)
+
+    def fetch(url, retries=1):
+        barrier.wait()
+        return ARTICLE.format(title=url[-1]).encode("utf-8"), "utf-8"
+
+    monkeypatch.setattr(news, "fetch_bytes", fetch)
+    urls = [f"https://news.example/{index}" for index in range(3)]
+
+    details = news.fetch_details(urls, retries=1, parser=ParserPool(), concurrency=3)
+
+    assert [details[url][0] for url in urls] == ["0", "1", "2"]
+
+
+def test_fetch_details_reuses_fetch_threads_and_their_sessions_across_calls(monkeypatch):
+    import http_client
+    from adapters import news
+
+    sessions = set()
+
+    def fetch(url, retries=1):
+        sessions.add(id(http_client.session()))
+        return ARTICLE.format(title=url[-1]).encode("utf-8"), "utf-8"
+
+    monkeypatch.setattr(news, "fetch_bytes", fetch)
+    for cycle in range(3):
+        urls = [f"https://news.example/{cycle}{index}" for index in range(4)]
+        news.fetch_details(urls, retries=1, parser=ParserPool(), concurrency=2)
+
+    assert len(sessions) <= 2
+
+
+def test_rss_first_source_uses_full_feed_bodies_and_fetches_only_teasers(monkeypatch):
+    from adapters import news
+
+    body = "".join(f"<p>第{index}段：模型推理服务的成本在过去一年里持续下降，企业落地门槛随之降低。</p>" for index in range(6))
+    feed = f"""<rss xmlns:content="http://purl.org/rss/1.0/modules/content/"><channel>
+      <item><title>全文文章</title><link>https://news.example/articles/1</link>
+        <pubDate>Sat, 18 Oct 2026 09:00:00 +0800</pubDate>
+        <description>摘要</description><content:encoded><![CDATA[{body}]]></content:encoded></item>
+      <item><title>摘要文章</title><link>https://news.example/articles/2</link>
+        <description><![CDATA[<p>只有一句很短的摘要，需要打开原文才能看到全部内容。</p>]]></description></item>
+    </channel></rss>"""
+    fetched = []
+
+    def fetch_bytes(url, retries=1):
+        fetched.append(url)
+        return _fake_fetch_bytes(url)
+
+    monkeypatch.setattr(news, "fetch_text", lambda url, retries=1: feed)
+    monkeypatch.setattr(news, "fetch_bytes", fetch_bytes)
+    source = Source(
+        key="n", name="News", url="https://news.example", fallback="https://news.example/feed", rss_first=True
+    )
+
+    records = news.fetch_news_for_source(source, limit=2, parser=ParserPool())
+
+    assert fetched == ["https://news.example/articles/2"]
+    assert [row.title for row in records] == ["全文文章", "标题 2"]
+    assert records[0].content.count("\n") == 5 and records[0].content.startswith("第0段")
+    assert records[0].published_at == "2026-10-18T01:00:00+00:00"
+
+
+def test_extract_article_content_groups_wrapped_paragraphs_by_block_container():
+    from adapters.news import _extract_article_content
+
+    body = "".join(f"<font><p>第{i}段正文，介绍企业知识库的建设步骤与常见误区。</p></font>" for i in range(3))
+    html = f"""<html><body>
+      <div class="sidebar"><p>订阅我们的newsletter获取每日人工智能资讯推送以及更多内容</p></div>
+      <div class="main">{body}</div>
+    </body></html>"""
+
+    _title, content, _published_at = _extract_article_content(html)
+
+    assert len(content.splitlines()) == 3 and content.startswith("第0段")
+
+
+def test_extract_article_content_keeps_scoring_past_a_full_non_article_container():
+    from adapters.news import MAX_CONTENT_BLOCKS, _extract_article_content
+
+    related = "".join(f"<p>相关推荐第{i}条，很短的推荐语句。</p>" for i in range(MAX_CONTENT_BLOCKS))
+    body = "".join(f"<p>正文第{i}段，详细分析了推理成本、延迟优化与检索增强生成的工程实践。</p>" for i in range(80))
+    html = f'<html><body><div class="related">{related}</div><div class="main">{body}</div></body></html>'
+
+    _title, content, _published_at = _extract_article_content(html)
+
+    assert content.splitlines()[0].startswith("正文第0段")
+    assert len(content.splitlines()) == MAX_CONTENT_BLOCKS
@@ -11,7 +11,7 @@ def test_run_model_pipeline_dedupes_by_provider_name(monkeypatch):
         Source(key="b", name="B", url="https://b.example"),
     ]
 
-    def fake_fetch(source, limit):
+    def fake_fetch(source, limit, snapshot=None, **_kwargs):
         if source.key == "a":
             return [
                 ModelRecord(name="Code Copilot", provider="LiteLLM", source_url="https://x/1"),
@@ -25,7 +25,7 @@ def test_run_model_pipeline_dedupes_by_provider_name(monkeypatch):
 
     monkeypatch.setattr(model_pipeline, "MODEL_SOURCES", fake_sources)
     monkeypatch.setattr(model_pipeline, "fetch_models_for_source", fake_fetch)
-    monkeypatch.setattr(model_pipeline, "enrich_models", lambda rows: rows)
+    monkeypatch.setattr(model_pipeline, "enrich_models", lambda rows, **_kwargs: rows)
 
     def fake_upsert(rows, run_id=None):
         persisted["rows"] = rows
@@ -53,7 +53,7 @@ def test_run_news_pipeline_dedupes_by_normalized_url(monkeypatch):
         Source(key="b", name="B", url="https://b.example"),
     ]
 
-    def fake_fetch(source, limit):
+    def fake_fetch(source, limit, parser=None, **_kwargs):
         if source.key == "a":
             return [
                 ArticleRecord(
@@ -82,9 +82,9 @@ def test_run_news_pipeline_dedupes_by_normalized_url(monkeypatch):
 
     monkeypatch.setattr(news_pipeline, "NEWS_SOURCES", fake_sources)
     monkeypatch.setattr(news_pipeline, "fetch_news_for_source", fake_fetch)
-    monkeypatch.setattr(news_pipeline, "enrich_articles", lambda rows: rows)
+    monkeypatch.setattr(news_pipeline, "enrich_articles", lambda rows, **_kwargs: rows)
 
-    def fake_upsert(rows, run_id=None):
+    def fake_upsert(rows, run_id=None, errors=None):
         persisted["rows"] = rows
         persisted["run_id"] = run_id
         return len(rows)
@@ -99,3 +99,116 @@ def test_run_news_pipeline_dedupes_by_normalized_url(monkeypatch):
     assert stats["persisted"] == 2
     assert len(persisted["rows"]) == 2
     assert persisted["run_id"] == "run_test"
+
+
+def test_news_pipeline_refreshes_scenarios_touched_by_the_run(monkeypatch, tmp_path):
+    from pipelines import news_pipeline
+    from sinks import SQLiteSink
+
+    def fake_fetch(source, limit, parser=None, **_kwargs):
+        return [
+            ArticleRecord(title="t1", source="A", url="https://a.example/1", content="c", tags=["知识问答"]),
+            ArticleRecord(title="t2", source="A", url="https://a.example/2", content="c", tags=["知识问答", "多模态"]),
+        ]
+
+    monkeypatch.setattr(news_pipeline, "NEWS_SOURCES", [Source(key="a", name="A", url="https://a.example")])
+    monkeypatch.setattr(news_pipeline, "fetch_news_for_source", fake_fetch)
+    monkeypatch.setattr(news_pipeline, "enrich_articles", lambda rows, **_kwargs: rows)
+    sink = SQLiteSink(tmp_path / "crawler.sqlite3")
+    refreshed = []
+    refresh = sink.refresh_scenario_stats
+
+    def recording_refresh(scenarios, run_id=None):
+        refreshed.append(scenarios)
+        return refresh(scenarios, run_id=run_id)
+
+    monkeypatch.setattr(sink, "refresh_scenario_stats", recording_refresh)
+
+    stats = news_pipeline.run_news_pipeline(limit_per_source=5, sink=sink, adaptive=False)
+
+    assert refreshed == [["多模态", "知识问答"]]
+    assert stats["scenarios_refreshed"] == 2
+    counts = dict(sink.connection.execute("select scenario, article_count from scenario_stats").fetchall())
+    assert counts == {"多模态": 1, "知识问答": 2}
+    sink.close()
+
+
+def test_news_watermark_only_passes_stored_articles(monkeypatch):
+    from adapters import news
+    from pipelines import news_pipeline
+    from scheduler import SourceHistory
+
+    days = [18, 17, 16, 15, 14]
+
+    def feed(url, retries=1):
+        items = "".join(
+            f"<item><title>文章{day}</title><link>https://a.example/{day}</link>"
+            f"<pubDate>2026-10-{day}T08:00:00+00:00</pubDate></item>"
+            for day in days
+        )
+        return f"<rss><channel>{items}</channel></rss>"
+
+    monkeypatch.setattr(news, "fetch_text", feed)
+    source = Source(key="a", name="A", url="https://a.example", fallback="https://a.example/rss")
+    monkeypatch.setattr(news_pipeline, "NEWS_SOURCES", [source])
+    monkeypatch.setattr(
+        news_pipeline,
+        "fetch_news_for_source",
+        lambda source, limit, since=None, **_kwargs: news.fetch_news_for_source(
+            source, limit, rss_only=True, since=since
+        ),
+    )
+    monkeypatch.setattr(news_pipeline, "enrich_articles", lambda rows, **_kwargs: rows)
+    history = SourceHistory("news")
+    history.advance("a", "2026-10-10T00:00:00+00:00")
+    history.save()
+    stored, failing = [], [False]
+
+    def fake_upsert(rows, run_id=None, errors=None):
+        if failing[0]:
+            errors.append("articles chunk 1/1 (1 rows): boom")
+            return 0
+        stored.append(sorted(row.url.rsplit("/", 1)[1] for row in rows))
+        return len(rows)
+
+    monkeypatch.setattr(news_pipeline, "upsert_articles", fake_upsert)
+
+    # With a limit below the backlog, each run takes the oldest unstored items.
+    for _ in range(3):
+        news_pipeline.run_news_pipeline(limit_per_source=2)
+
+    assert stored == [["14", "15"], ["16", "17"], ["18"]]
+    assert SourceHistory("news").get("a").latest_published == "2026-10-18T08:00:00+00:00"
+
+    # A failed chunk leaves the watermark where it was.
+    days.insert(0, 19)
+    failing[0] = True
+    news_pipeline.run_news_pipeline(limit_per_source=2)
+
+    assert SourceHistory("news").get("a").latest_published == "2026-10-18T08:00:00+00:00"
+
+
+def test_news_rows_enrichment_did_not_reach_are_stored_raw_without_a_run_budget(monkeypatch):
+    from pipelines import news_pipeline
+
+    rows = [
+        ArticleRecord(title="new", source="A", url="https://a.example/2", content="body"),
+        ArticleRecord(title="old", source="A", url="https://a.example/1", content="body"),
+    ]
+    stored = []
+    monkeypatch.setattr(news_pipeline, "NEWS_SOURCES", [Source(key="a", name="A", url="https://a.example")])
+    monkeypatch.setattr(news_pipeline, "fetch_news_for_source", lambda *_args, **_kwargs: list(rows))
+    # ARK_ENRICH_BUDGET ran out before the older article.
+    monkeypatch.setattr(
+        news_pipeline, "enrich_articles", lambda records, **_kwargs: [row for row in records if row.title == "new"]
+    )
+    monkeypatch.setattr(
+        news_pipeline,
+        "upsert_articles",
+        lambda records, raw=False, **_kwargs: stored.extend((row.title, raw) for row in records) or len(records),
+    )
+
+    stats = news_pipeline.run_news_pipeline(limit_per_source=5, adaptive=False)
+
+    assert sorted(stored) == [("new", False), ("old", True)]
+    assert stats["persisted"] == 2
@@ -0,0 +1,77 @@
+import json
+import pstats
+import time
+
+import profiling
+from profiling import StageProfiler
+
+
+def _busy(seconds):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(200))
+    return total
+
+
+def test_cpu_profiler_writes_pstats_and_collapsed_stacks_per_stage(tmp_path):
+    profiler = StageProfiler("cpu", tmp_path, sample_interval=0.001)
+    profiling.activate(profiler)
+    try:
+        with profiling.stage("news"):
+            with profiling.stage("fetch"):
+                _busy(0.05)
+            with profiling.stage("parse"):
+                _busy(0.05)
+    finally:
+        profiling.activate(None)
+        profiler.close()
+
+    assert (tmp_path / "news.fetch.pstats").exists()
+    assert pstats.Stats(str(tmp_path / "news.parse.pstats")).total_calls > 0
+    collapsed = (tmp_path / "news.fetch.collapsed").read_text(encoding="utf-8").splitlines()
+    assert collapsed and collapsed[0].startswith("news;fetch;")
+    assert any("_busy" in line for line in collapsed)
+    assert (tmp_path / "all.collapsed").exists()
+
+
+def test_memory_profiler_reports_peak_per_stage(tmp_path):
+    profiler = StageProfiler("mem", tmp_path)
+    profiling.activate(profiler)
+    try:
+        with profiling.stage("models"):
+            with profiling.stage("enrich"):
+                payload = [bytearray(1024) for _ in range(2000)]
+                del payload
+    finally:
+        profiling.activate(None)
+        profiler.close()
+
+    summary = json.loads((tmp_path / "memory.json").read_text(encoding="utf-8"))
+    assert summary["models.enrich"]["peak_bytes"] >= 2000 * 1024
+    assert summary["models"]["peak_bytes"] >= summary["models.enrich"]["peak_bytes"]
+    assert (tmp_path / "models.enrich.mem.txt").exists()
+    assert (tmp_path / "models.enrich.tracemalloc").exists()
+
+
+def test_stage_is_noop_without_active_profiler():
+    with profiling.stage("anything"):
+        assert profiling._ACTIVE is None
+
+
+def test_memory_profiler_writes_one_snapshot_per_stage_at_close(tmp_path, monkeypatch):
+    profiler = StageProfiler("mem", tmp_path)
+    dumped = []
+    monkeypatch.setattr(profiler, "_write_snapshot", lambda key, snapshot: dumped.append(key))
+    profiling.activate(profiler)
+    try:
+        with profiling.stage("news"):
+            for _ in range(50):
+                with profiling.stage("parse"):
+                    pass
+        assert dumped == []
+    finally:
+        profiling.activate(None)
+        profiler.close()
+
+    assert sorted(dumped) == ["news", "news.parse"]
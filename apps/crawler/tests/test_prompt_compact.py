@@ -0,0 +1,62 @@
+from prompt_compact import clean_sentences, compact_text, estimate_tokens
+
+
+def test_clean_sentences_drops_boilerplate_and_duplicates():
+    text = (
+        "企业知识库正在成为大模型落地的第一站。\n"
+        "扫码关注公众号获取更多资讯。\n"
+        "企业知识库正在成为大模型落地的第一站！\n"
+        "本文来自微信公众号：某某科技。\n"
+        "检索增强生成能显著降低幻觉率。"
+    )
+
+    assert clean_sentences(text) == [
+        "企业知识库正在成为大模型落地的第一站。",
+        "检索增强生成能显著降低幻觉率。",
+    ]
+
+
+def test_compact_text_keeps_lead_and_key_sentences_within_budget():
+    filler = "".join(f"这是第{i}句普通的描述性文字内容。" for i in range(40))
+    text = "大模型推理成本在过去一年下降了九成。" + filler + "采用RAG检索方案后知识问答准确率提升到95%。"
+
+    compacted = compact_text(text, token_budget=80, title="推理成本", keywords=("rag", "检索"))
+
+    assert compacted.startswith("大模型推理成本在过去一年下降了九成。")
+    assert "采用RAG检索方案" in compacted
+    assert estimate_tokens(compacted) <= 80
+
+
+def test_estimate_tokens_counts_cjk_and_latin():
+    assert estimate_tokens("知识库") == 3
+    assert estimate_tokens("hello world") == 3
+
+
+def test_clean_sentences_keeps_article_sentences_that_mention_trailer_words():
+    text = (
+        "新版著作权法对训练数据的版权归属作出了规定。"
+        "该模型在公众号文章摘要任务上表现最好。"
+        "用户转发量和点赞数被用作排序信号。"
+        "大会报名人数突破一万。"
+        "The report tracks newsletter subscriptions across 40 publishers.\n"
+        "版权所有，未经授权禁止转载。"
+        "欢迎点赞、转发。"
+        "扫码报名。"
+        "Subscribe to our newsletter for weekly updates."
+    )
+
+    assert clean_sentences(text) == [
+        "新版著作权法对训练数据的版权归属作出了规定。",
+        "该模型在公众号文章摘要任务上表现最好。",
+        "用户转发量和点赞数被用作排序信号。",
+        "大会报名人数突破一万。",
+        "The report tracks newsletter subscriptions across 40 publishers.",
+    ]
+
+
+def test_compact_text_keeps_separators_between_latin_sentences_and_lines():
+    text = "Inference costs fell sharply this year!  Most teams now use RAG.\nLatency matters too.\n中文第一句。中文第二句。"
+
+    assert compact_text(text, token_budget=200) == (
+        "Inference costs fell sharply this year! Most teams now use RAG.\nLatency matters too.\n中文第一句。中文第二句。"
+    )
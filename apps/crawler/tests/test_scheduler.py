@@ -0,0 +1,89 @@
+from scheduler import SourceHistory, plan_sources
+from sources import SCHEDULE_BACKOFF_INTERVAL, Source
+
+SOURCES = [
+    Source(key="hot", name="Hot", url="https://hot.example"),
+    Source(key="cold", name="Cold", url="https://cold.example"),
+]
+
+
+def test_fresh_history_crawls_every_source_at_base_limit():
+    plans, backed_off = plan_sources(SOURCES, SourceHistory("news"), base_limit=20)
+
+    assert [(plan.source.key, plan.limit) for plan in plans] == [("hot", 20), ("cold", 20)]
+    assert backed_off == []
+
+
+def test_hot_sources_get_more_of_the_limit_and_go_first():
+    history = SourceHistory("news")
+    history.record("hot", requested=20, new=20, failed=False, seconds=10, now=0)
+    history.record("cold", requested=20, new=2, failed=False, seconds=10, now=0)
+
+    plans, _ = plan_sources(SOURCES, history, base_limit=20, now=1)
+
+    limits = {plan.source.key: plan.limit for plan in plans}
+    assert plans[0].source.key == "hot"
+    assert limits["hot"] > 20 > limits["cold"]
+
+
+def test_idle_sources_back_off_exponentially_and_history_persists():
+    history = SourceHistory("models")
+    history.record("cold", requested=20, new=0, failed=False, seconds=1, now=0)
+    history.record("cold", requested=20, new=0, failed=False, seconds=1, now=0)
+    history.save()
+
+    reloaded = SourceHistory("models")
+    plans, backed_off = plan_sources(SOURCES, reloaded, base_limit=20, now=2 * SCHEDULE_BACKOFF_INTERVAL)
+    assert [plan.source.key for plan in plans] == ["hot"]
+    assert backed_off == ["cold"]
+
+    plans, backed_off = plan_sources(SOURCES, reloaded, base_limit=20, now=3 * SCHEDULE_BACKOFF_INTERVAL)
+    assert backed_off == []
+
+
+def test_unseen_filters_urls_already_recorded():
+    history = SourceHistory("news")
+    history.record("hot", requested=5, new=1, failed=False, seconds=1, urls=["https://hot.example/1"])
+
+    assert history.unseen("hot", ["https://hot.example/1", "https://hot.example/2"]) == ["https://hot.example/2"]
+
+
+def test_per_source_limit_replaces_the_base_limit():
+    sources = [Source(key="big", name="Big", url="https://big.example", limit=60), SOURCES[1]]
+
+    plans, _ = plan_sources(sources, SourceHistory("news"), base_limit=20)
+
+    assert {plan.source.key: plan.limit for plan in plans} == {"big": 60, "cold": 20}
+
+
+def test_concurrent_histories_keep_each_others_sources():
+    first, second = SourceHistory("news"), SourceHistory("news")
+    first.record("a", requested=10, new=4, failed=False, seconds=1.0, now=1000.0)
+    second.record("b", requested=10, new=0, failed=False, seconds=1.0, now=1000.0)
+    first.save()
+    second.save()
+
+    saved = SourceHistory("news")
+    assert (saved.get("a").runs, saved.get("b").runs) == (1, 1)
+    assert saved.get("b").idle_streak == 1
+
+
+def test_failures_leave_the_idle_streak_alone():
+    history = SourceHistory("news")
+    history.record("cold", requested=20, new=0, failed=False, seconds=1, now=0)
+    history.record("cold", requested=20, new=0, failed=True, seconds=1, now=1)
+
+    assert history.get("cold").idle_streak == 1
+
+
+def test_backoff_follows_the_observed_run_cadence():
+    history = SourceHistory("news")
+    for run in range(3):
+        history.record("cold", requested=20, new=5, failed=False, seconds=1, now=run * 6 * 3600)
+    history.record("cold", requested=20, new=0, failed=False, seconds=1, now=3 * 6 * 3600)
+
+    # Crawled every 6 hours: one idle run skips nothing, where the fixed unit
+    # would have benched the source for the next three runs.
+    plans, backed_off = plan_sources(SOURCES[1:], history, base_limit=20, now=4 * 6 * 3600)
+    assert history.get("cold").cadence == 6 * 3600
+    assert [plan.source.key for plan in plans] == ["cold"] and backed_off == []
@@ -0,0 +1,128 @@
+import gzip
+import json
+import sqlite3
+
+from records import ArticleRecord, ModelRecord
+from sinks import JsonlSink, SQLiteSink, get_sink
+
+
+def test_sqlite_sink_upserts_on_conflict_keys(tmp_path):
+    sink = SQLiteSink(tmp_path / "crawler.sqlite3", batch_size=1)
+    models = [
+        ModelRecord(name="gpt-4o", provider="OpenRouter", business_scenarios=["内容生成"]),
+        ModelRecord(name="qwen", provider="HuggingFace"),
+    ]
+    assert sink.upsert_models(models, run_id="run_1") == 2
+    assert sink.upsert_models([ModelRecord(name="gpt-4o", provider="OpenRouter", description="v2")]) == 1
+    assert sink.upsert_articles([ArticleRecord(title="a", source="S", url="https://a/1", tags=["多模态"])]) == 1
+    assert sink.upsert_articles([ArticleRecord(title="a2", source="S", url="https://a/1")]) == 1
+    assert sink.mark_models_deprecated([("HuggingFace", "qwen")], run_id="run_2") == 1
+    sink.close()
+
+    connection = sqlite3.connect(tmp_path / "crawler.sqlite3")
+    assert connection.execute("pragma journal_mode").fetchone()[0] == "wal"
+    rows = dict(connection.execute("select name, description from models").fetchall())
+    assert rows == {"gpt-4o": "v2", "qwen": None}
+    assert connection.execute("select title from articles").fetchall() == [("a2",)]
+    deprecated = connection.execute("select deprecated_at from models where name = 'qwen'").fetchone()[0]
+    assert deprecated is not None
+
+
+def test_raw_rows_keep_stored_enrichment(tmp_path):
+    sink = SQLiteSink(tmp_path / "crawler.sqlite3")
+    sink.upsert_articles([ArticleRecord(title="a", source="S", url="https://a/1", summary="摘要", tags=["多模态"])])
+    sink.upsert_models([ModelRecord(name="m", provider="P", description="描述", business_scenarios=["内容生成"])])
+
+    sink.upsert_articles(
+        [
+            ArticleRecord(title="a2", source="S", url="https://a/1"),
+            ArticleRecord(title="b", source="S", url="https://a/2"),
+        ],
+        raw=True,
+    )
+    sink.upsert_models([ModelRecord(name="m", provider="P", cost_input=1.0)], raw=True)
+    sink.close()
+
+    connection = sqlite3.connect(tmp_path / "crawler.sqlite3")
+    assert connection.execute("select url, title, summary, tags from articles order by url").fetchall() == [
+        ("https://a/1", "a2", "摘要", '["多模态"]'),
+        ("https://a/2", "b", None, "[]"),
+    ]
+    assert connection.execute("select description, business_scenarios, cost_input from models").fetchone() == (
+        "描述",
+        '["内容生成"]',
+        1.0,
+    )
+
+
+def test_sqlite_sink_refreshes_only_touched_scenarios(tmp_path):
+    sink = SQLiteSink(tmp_path / "crawler.sqlite3")
+    sink.upsert_models(
+        [
+            ModelRecord(name="a", provider="P", business_scenarios=["知识问答", "客服对话"]),
+            ModelRecord(name="b", provider="P", business_scenarios=["知识问答"]),
+        ]
+    )
+    sink.upsert_articles(
+        [
+            ArticleRecord(title=title, source="S", url=f"https://a/{title}", tags=["知识问答"], published_at=published)
+            for title, published in (("old", "2026-10-01T00:00:00+00:00"), ("new", "2026-10-18T00:00:00+00:00"))
+        ]
+    )
+
+    assert sink.refresh_scenario_stats(["知识问答", "知识问答"], run_id="run_1") == 1
+
+    columns = "scenario, model_count, article_count, top_article_ids, latest_article_at, crawl_run_id"
+    rows = sink.connection.execute(f"select {columns} from scenario_stats").fetchall()
+    ids = dict(sink.connection.execute("select title, id from articles").fetchall())
+    assert len(rows) == 1
+    scenario, models, articles, top_articles, latest, run_id = rows[0]
+    assert (scenario, models, articles, run_id) == ("知识问答", 2, 2, "run_1")
+    assert json.loads(top_articles) == [ids["new"], ids["old"]]
+    assert latest == "2026-10-18T00:00:00+00:00"
+
+    sink.mark_models_deprecated([("P", "a")])
+    sink.refresh_scenario_stats(["客服对话", "知识问答"])
+    counts = dict(sink.connection.execute("select scenario, model_count from scenario_stats").fetchall())
+    assert counts == {"知识问答": 1}
+    sink.close()
+
+
+def test_sqlite_sink_refreshes_scenarios_rows_have_left(tmp_path):
+    sink = SQLiteSink(tmp_path / "crawler.sqlite3")
+    sink.upsert_models([ModelRecord(name=name, provider="P", business_scenarios=["知识问答"]) for name in "ab"])
+    sink.upsert_articles([ArticleRecord(title="a", source="S", url="https://a/1", tags=["客服对话"])])
+    sink.refresh_scenario_stats(["知识问答", "客服对话"])
+
+    # Neither write names the scenario it leaves; both are still refreshed.
+    sink.upsert_articles([ArticleRecord(title="a", source="S", url="https://a/1", tags=["代码生成"])])
+    sink.mark_models_deprecated([("P", "a")])
+    assert sink.refresh_scenario_stats(["代码生成"]) == 3
+
+    counts = sink.connection.execute("select scenario, model_count, article_count from scenario_stats").fetchall()
+    assert sorted(counts) == [("代码生成", 0, 1), ("知识问答", 1, 0)]
+    assert sink.connection.execute("select count(*) from scenario_stats_dirty").fetchone() == (0,)
+    sink.close()
+
+
+def test_jsonl_sink_appends_compressed_lines(tmp_path):
+    sink = get_sink("jsonl", tmp_path)
+    assert isinstance(sink, JsonlSink)
+    sink.upsert_articles([ArticleRecord(title="标题", source="S", url="https://a/1")], run_id="run_1")
+    sink.insert_crawler_run(
+        run_id="run_1",
+        started_at="2026-10-19T00:00:00+00:00",
+        finished_at="2026-10-19T00:01:00+00:00",
+        status="partial",
+        model_persisted=0,
+        article_persisted=1,
+    )
+    sink.close()
+
+    with gzip.open(tmp_path / "articles.jsonl.gz", "rt", encoding="utf-8") as handle:
+        articles = [json.loads(line) for line in handle]
+    with gzip.open(tmp_path / "crawler_runs.jsonl.gz", "rt", encoding="utf-8") as handle:
+        runs = [json.loads(line) for line in handle]
+
+    assert articles[0]["title"] == "标题" and articles[0]["crawl_run_id"] == "run_1"
+    assert runs[0]["id"] == "run_1" and runs[0]["status"] == "partial"
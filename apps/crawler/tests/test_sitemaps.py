@@ -0,0 +1,154 @@
+import gzip
+from datetime import datetime, timezone
+
+import sitemaps
+from sitemaps import SitemapEntry, SitemapState, discover, iter_sitemap
+from sources import Source
+
+INDEX = """<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>https://news.example/sitemap-2026-10.xml</loc><lastmod>2026-10-18T08:00:00+08:00</lastmod></sitemap>
+  <sitemap><loc>https://news.example/sitemap-2026-09.xml.gz</loc><lastmod>2026-09-30T08:00:00+08:00</lastmod></sitemap>
+</sitemapindex>
+"""
+OCTOBER = """<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"
+        xmlns:news="http://www.google.com/schemas/sitemap-news/0.9">
+  <url><loc>https://news.example/articles/1</loc><lastmod>2026-10-01T09:00:00+08:00</lastmod></url>
+  <url><loc>https://news.example/articles/2</loc><lastmod>2026-10-18T07:30:00+08:00</lastmod>
+    <news:news><news:title>大模型推理成本下降</news:title>
+    <news:publication_date>2026-10-18T07:00:00+08:00</news:publication_date></news:news></url>
+  <url><loc>https://news.example/tag/ai</loc><lastmod>2026-10-18T07:45:00+08:00</lastmod></url>
+  <url><loc>https://news.example/articles/3</loc></url>
+</urlset>
+"""
+SEPTEMBER = """<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>https://news.example/articles/0</loc><lastmod>2026-09-20T09:00:00+08:00</lastmod></url>
+</urlset>
+"""
+
+
+def _serve(monkeypatch, files):
+    fetched = []
+
+    def fake_iter_bytes(url):
+        fetched.append(url)
+        body = files[url]
+        for start in range(0, len(body), 7):
+            yield body[start : start + 7]
+
+    monkeypatch.setattr(sitemaps, "iter_bytes", fake_iter_bytes)
+    return fetched
+
+
+def _files():
+    return {
+        "https://news.example/sitemap.xml": INDEX.encode("utf-8"),
+        "https://news.example/sitemap-2026-10.xml": OCTOBER.encode("utf-8"),
+        "https://news.example/sitemap-2026-09.xml.gz": gzip.compress(SEPTEMBER.encode("utf-8")),
+    }
+
+
+def test_iter_sitemap_streams_entries_from_small_and_gzipped_chunks():
+    body = gzip.compress(OCTOBER.encode("utf-8"))
+    chunks = [body[start : start + 5] for start in range(0, len(body), 5)]
+
+    entries = list(iter_sitemap(chunks))
+
+    assert [loc for _kind, loc, *_rest in entries][:2] == [
+        "https://news.example/articles/1",
+        "https://news.example/articles/2",
+    ]
+    assert entries[1] == (
+        "url",
+        "https://news.example/articles/2",
+        "2026-10-18T07:30:00+08:00",
+        "大模型推理成本下降",
+        "2026-10-18T07:00:00+08:00",
+    )
+    assert entries[3][2] == ""
+
+
+def test_discover_follows_index_and_returns_newest_first(monkeypatch):
+    fetched = _serve(monkeypatch, _files())
+
+    entries = discover(["https://news.example/sitemap.xml"], limit=3, accept=lambda url: "/articles/" in url)
+
+    assert [entry.url.rsplit("/", 1)[1] for entry in entries] == ["2", "1", "0"]
+    assert entries[0].title == "大模型推理成本下降"
+    assert len(fetched) == 3
+
+
+def test_state_limits_later_discoveries_to_changed_entries(monkeypatch):
+    files = _files()
+    fetched = _serve(monkeypatch, files)
+    state = SitemapState("news")
+    state.stage(datetime(2026, 10, 10, tzinfo=timezone.utc), [SitemapEntry("https://news.example/articles/3")], False)
+    state.commit()
+
+    entries = discover(["https://news.example/sitemap.xml"], limit=10, state=state)
+
+    # September's sitemap is older than the watermark and is never downloaded.
+    assert fetched == ["https://news.example/sitemap.xml", "https://news.example/sitemap-2026-10.xml"]
+    assert [entry.url for entry in entries] == ["https://news.example/tag/ai", "https://news.example/articles/2"]
+
+    files["https://news.example/sitemap-2026-10.xml"] = OCTOBER.replace(
+        "</urlset>", "<url><loc>https://news.example/articles/4</loc></url></urlset>"
+    ).encode("utf-8")
+    reloaded = SitemapState("news")
+    assert reloaded.crawled_at == datetime(2026, 10, 10, tzinfo=timezone.utc)
+    assert [entry.url for entry in discover(["https://news.example/sitemap.xml"], 10, reloaded)][-1].endswith("/4")
+
+
+def test_discover_candidates_prefers_sitemap_and_falls_back_to_listing(monkeypatch):
+    from adapters import news
+
+    _serve(monkeypatch, _files())
+    listing_calls = []
+    monkeypatch.setattr(news, "_fetch_listing", lambda *_args: listing_calls.append(1) or [])
+    source = Source(
+        key="n",
+        name="News",
+        url="https://news.example",
+        article_patterns=(r"^/articles/\d+$",),
+        sitemaps=("https://news.example/sitemap.xml",),
+    )
+
+    state = SitemapState("n")
+    first = news.discover_candidates(source, limit=5, sitemap_state=state)
+    state.commit()
+    second = news.discover_candidates(source, limit=5, sitemap_state=SitemapState("n"))
+
+    assert [item["url"] for item in first] == [f"https://news.example/articles/{index}" for index in (2, 1, 0, 3)]
+    assert second == []
+    assert listing_calls == []
+
+    broken = Source(key="b", name="B", url="https://news.example", sitemaps=("https://news.example/missing.xml",))
+    assert news.discover_candidates(broken, limit=5) == []
+    assert listing_calls == [1]
+
+
+def test_truncated_discovery_leaves_the_backlog_for_later_runs(monkeypatch):
+    # Six new entries, two sharing the same <lastmod>, taken two per run.
+    urls = "".join(
+        f"<url><loc>https://news.example/articles/{index}</loc><lastmod>2026-10-{day}T08:00:00+00:00</lastmod></url>"
+        for index, day in enumerate((18, 17, 16, 16, 15, 14))
+    )
+    sitemap = f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+    _serve(monkeypatch, {"https://news.example/sitemap.xml": sitemap.encode("utf-8")})
+
+    previous = SitemapState("news")
+    previous.stage(datetime(2026, 10, 10, tzinfo=timezone.utc), [], False)
+    previous.commit()
+
+    runs = []
+    for _ in range(4):
+        state = SitemapState("news")
+        runs.append([entry.url.rsplit("/", 1)[1] for entry in discover(["https://news.example/sitemap.xml"], 2, state)])
+        state.commit()
+
+    assert runs == [["0", "1"], ["2", "3"], ["4", "5"], []]
+    # A discovery whose records were never stored leaves the watermark alone.
+    discover(["https://news.example/sitemap.xml"], 2, SitemapState("news"))
+    assert SitemapState("news").crawled_at > datetime(2026, 10, 14, tzinfo=timezone.utc)
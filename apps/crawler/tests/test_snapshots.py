@@ -0,0 +1,109 @@
+from records import ModelRecord
+from snapshots import CatalogSnapshot
+from sources import Source
+
+
+def _record(name, description=""):
+    return ModelRecord(name=name, provider="HuggingFace", description=description, source_url=f"https://x/{name}")
+
+
+def test_snapshot_reports_added_changed_and_removed(tmp_path):
+    path = tmp_path / "hf.jsonl.gz"
+    first = CatalogSnapshot("huggingface", path=path)
+    for name in ["a", "b", "c"]:
+        assert first.observe(name, {"id": name}, _record(name)) is True
+    first.mark_complete()
+    first.commit()
+
+    second = CatalogSnapshot("huggingface", path=path)
+    assert second.observe("a", {"id": "a"}, _record("a")) is False
+    assert second.observe("b", {"id": "b", "x": 1}, _record("b", "new text")) is True
+    assert second.observe("d", {"id": "d"}, _record("d")) is True
+    second.mark_complete()
+
+    assert (second.added, second.changed) == (1, 1)
+    assert second.removed() == [("HuggingFace", "c")]
+
+    second.commit()
+    third = CatalogSnapshot("huggingface", path=path)
+    assert sorted(third.previous) == ["a", "b", "d"]
+
+
+def test_snapshot_does_not_report_removals_for_partial_walk(tmp_path):
+    path = tmp_path / "hf.jsonl.gz"
+    first = CatalogSnapshot("huggingface", path=path)
+    first.observe("a", {"id": "a"}, _record("a"))
+    first.observe("b", {"id": "b"}, _record("b"))
+    first.commit()
+
+    second = CatalogSnapshot("huggingface", path=path)
+    second.observe("a", {"id": "a"}, _record("a"))
+
+    assert second.removed() == []
+
+
+def test_fetch_models_only_returns_delta_against_snapshot(monkeypatch, tmp_path):
+    from adapters import models
+
+    rows = [{"id": f"org/m{i}", "pipeline_tag": "text-generation"} for i in range(6)]
+    monkeypatch.setattr(models, "iter_json_items", lambda *_args, **_kwargs: iter(rows))
+    source = Source(key="huggingface", name="HF", url="https://huggingface.co/models")
+    path = tmp_path / "hf.jsonl.gz"
+
+    first = CatalogSnapshot("huggingface", path=path)
+    assert len(models.fetch_models_for_source(source, limit=4, snapshot=first)) == 4
+    first.commit()
+
+    rows[0]["pipeline_tag"] = "translation"
+    second = CatalogSnapshot("huggingface", path=path)
+    delta = models.fetch_models_for_source(source, limit=4, snapshot=second)
+
+    assert [row.name for row in delta] == ["org/m0", "org/m4", "org/m5"]
+    assert (second.added, second.changed) == (2, 1)
+
+
+def test_walk_cut_at_max_pages_reports_no_removals(monkeypatch, tmp_path):
+    from dataclasses import replace
+
+    import http_client
+    from adapters import models
+
+    pages = {
+        "https://hf.example/api/models": ('[{"id": "org/a"}, {"id": "org/b"}]', "https://hf.example/api/models?p=2"),
+        "https://hf.example/api/models?p=2": ('[{"id": "org/c"}]', None),
+    }
+
+    class FakeResponse:
+        def __init__(self, url):
+            self.body, next_url = pages[url]
+            self.links = {"next": {"url": next_url}} if next_url else {}
+            self.encoding = "utf-8"
+
+        def raise_for_status(self):
+            return None
+
+        def iter_content(self, chunk_size):
+            yield self.body.encode("utf-8")
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *_exc):
+            return False
+
+    class FakeSession:
+        def get(self, url, **_kwargs):
+            return FakeResponse(url)
+
+    monkeypatch.setattr(http_client, "session", FakeSession)
+    path = tmp_path / "hf.jsonl.gz"
+    source = Source(key="huggingface", name="HF", url="https://hf.example/api/models")
+    first = CatalogSnapshot("huggingface", path=path)
+    models.fetch_models_for_source(source, limit=10, snapshot=first)
+    assert first.complete
+    first.commit()
+
+    second = CatalogSnapshot("huggingface", path=path)
+    models.fetch_models_for_source(replace(source, max_pages=1), limit=10, snapshot=second)
+
+    assert second.removed() == []
@@ -0,0 +1,73 @@
+import pytest
+
+from sources import MODEL_SOURCES, NEWS_SOURCES, Source, load_sources
+
+VALID = """
+[adapters]
+catalog = "adapters.models:OPENROUTER"
+
+[[models]]
+key = "catalog"
+name = "Catalog"
+url = "https://catalog.example"
+max_pages = 5
+
+[[news]]
+key = "site"
+name = "Site"
+url = "https://site.example"
+article_patterns = ['^/p/\\d+$']
+concurrency = 3
+rate_limit = 2
+parser = "lxml"
+"""
+
+
+def test_bundled_registry_loads_and_validates():
+    assert [source.key for source in MODEL_SOURCES] == ["openrouter", "huggingface", "litellm"]
+    assert {source.key for source in NEWS_SOURCES} >= {"jiqizhixin", "qbitai"}
+    assert all(source.concurrency >= 1 for source in NEWS_SOURCES)
+
+
+def test_load_sources_reads_per_source_settings(tmp_path):
+    path = tmp_path / "sources.toml"
+    path.write_text(VALID, encoding="utf-8")
+
+    models, news, adapters = load_sources(path)
+
+    assert models[0].max_pages == 5 and adapters == {"catalog": "adapters.models:OPENROUTER"}
+    assert news[0].article_patterns == (r"^/p/\d+$",)
+    assert (news[0].concurrency, news[0].rate_limit, news[0].parser) == (3, 2.0, "lxml")
+
+
+@pytest.mark.parametrize(
+    ("change", "message"),
+    [
+        (('parser = "lxml"', 'parser = "regex"'), "parser must be one of"),
+        (("concurrency = 3", "concurrency = 0"), "concurrency must be at least 1"),
+        (("rate_limit = 2", 'rate_limit = "fast"'), "rate_limit must be a number"),
+        (("max_pages = 5", "adapter = \"missing\""), "no catalog adapter 'missing'"),
+        (("concurrency = 3", "max_pages = 3"), "unknown setting 'max_pages' for news"),
+        (('key = "site"', 'key = "catalog"'), "duplicate source key(s) catalog"),
+        (("url = \"https://site.example\"", "url = \"site.example\""), "url must be an http(s) URL"),
+    ],
+)
+def test_load_sources_rejects_invalid_entries(tmp_path, change, message):
+    path = tmp_path / "sources.toml"
+    path.write_text(VALID.replace(*change), encoding="utf-8")
+
+    with pytest.raises(ValueError, match="sources.toml") as error:
+        load_sources(path)
+
+    assert message in str(error.value)
+
+
+def test_startup_check_rejects_parser_backends_that_are_not_installed(monkeypatch):
+    import adapters
+
+    site = Source(key="site", name="Site", url="https://site.example", parser="html5lib")
+    monkeypatch.setattr(adapters, "NEWS_SOURCES", [site])
+    monkeypatch.setattr(adapters, "find_spec", lambda name: None)
+
+    with pytest.raises(ValueError, match="site: parser html5lib needs the html5lib package"):
+        adapters.check_parser_backends()
@@ -0,0 +1,34 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from loadtest.import_bench import parse_importtime
+from main import select_sources
+
+CRAWLER_DIR = Path(__file__).resolve().parent.parent
+
+
+def test_importing_main_does_not_load_heavy_dependencies():
+    probe = "import sys, main; print(','.join(m for m in ('openai', 'bs4', 'pipelines.news_pipeline') if m in sys.modules))"
+    completed = subprocess.run(
+        [sys.executable, "-c", probe], cwd=CRAWLER_DIR, capture_output=True, text=True, check=True
+    )
+
+    assert completed.stdout.strip() == ""
+
+
+def test_select_sources_supports_pipelines_and_single_sources():
+    assert set(select_sources(None)) == {"models", "news"}
+    assert set(select_sources("models")) == {"models"}
+    assert [source.key for source in select_sources("source=qbitai")["news"]] == ["qbitai"]
+    assert [source.key for source in select_sources("source=litellm")["models"]] == ["litellm"]
+    with pytest.raises(ValueError):
+        select_sources("source=missing")
+
+
+def test_parse_importtime_reads_self_and_cumulative_microseconds():
+    stderr = "import time: self [us] | cumulative | imported package\nimport time:       120 |       450 |   requests\n"
+
+    assert parse_importtime(stderr) == {"requests": (120, 450)}
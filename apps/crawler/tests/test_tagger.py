@@ -0,0 +1,119 @@
+import random
+
+import pytest
+
+PHRASES = {
+    "知识问答": ["企业知识库检索增强问答", "RAG 检索召回文档片段", "员工问答助手查询制度"],
+    "代码辅助": ["代码补全与编程助手", "自动 review 合并请求", "debug 定位线上异常堆栈"],
+    "多模态": ["图文理解与视频生成", "多模态模型识别语音和图像", "视频字幕与画面描述"],
+    "客服对话": ["智能客服机器人对话", "聊天机器人接待售后咨询", "客服工单自动回复"],
+}
+FILLER = ["本周发布", "行业观察", "据报道", "新版本上线", "多家公司", "用户反馈积极", "成本下降明显"]
+
+
+def _examples(count, seed=3):
+    rng = random.Random(seed)
+    labels = list(PHRASES)
+    texts, targets = [], []
+    for index in range(count):
+        label = labels[index % len(labels)]
+        words = rng.sample(FILLER, 3) + rng.sample(PHRASES[label], 2)
+        rng.shuffle(words)
+        texts.append(f"第{index}篇 " + "，".join(words))
+        targets.append([label])
+    return texts, targets
+
+
+def test_fit_predicts_confident_labels_that_agree_with_training_labels():
+    from tagger import ScenarioTagger
+
+    texts, labels = _examples(400)
+    tagger = ScenarioTagger.fit(texts[:320], labels[:320])
+
+    predictions = tagger.predict(texts[320:])
+    handled = [(predicted, expected) for predicted, expected in zip(predictions, labels[320:]) if predicted]
+
+    assert len(handled) > 40
+    assert sum(predicted[0] == expected[0] for predicted, expected in handled) / len(handled) >= 0.9
+    assert tagger.predict(["完全无关的一段体育新闻，比分二比一"]) == [None]
+
+
+def test_fit_requires_enough_examples():
+    from tagger import ScenarioTagger
+
+    texts, labels = _examples(20)
+    with pytest.raises(ValueError):
+        ScenarioTagger.fit(texts, labels)
+
+
+def test_train_saves_model_from_logged_examples_and_evaluate_reports_agreement():
+    import tagger
+
+    texts, labels = _examples(400)
+    for text, row in zip(texts, labels):
+        tagger.record_example("article", text, row + ["不在标签集里"])
+
+    summary = tagger.train("article")
+    report = tagger.evaluate_kind("article")
+    loaded = tagger.load_tagger("article")
+
+    assert summary["examples"] == 400
+    assert set(summary["labels_enabled"]) <= set(PHRASES)
+    assert loaded is tagger.load_tagger("article")
+    assert loaded.predict(texts[:5]) == tagger.ScenarioTagger.fit(texts, labels).predict(texts[:5])
+    assert report["holdout"] > 0 and report["coverage"] > 0.5
+    assert report["label_precision"] >= 0.8
+
+
+def test_enrich_articles_skips_llm_tags_for_confident_rows(monkeypatch):
+    import tagger
+    from ark_enrich import ArkStats, enrich_articles
+    from records import ArticleRecord
+
+    texts, labels = _examples(400)
+    tagger.ScenarioTagger.fit(texts, labels).save(tagger.model_path("article"))
+    prompts = []
+
+    def fake_call(_client, prompt, **_kwargs):
+        prompts.append(prompt)
+        return {"summary": "摘要", "tags": ["数据分析"]}
+
+    monkeypatch.setattr("ark_enrich._build_client", lambda: object())
+    monkeypatch.setattr("ark_enrich._call_ark_json", fake_call)
+    rows = [
+        ArticleRecord(title="代码补全与编程助手", source="s", url="https://a/1", content="自动 review 合并请求，debug 定位线上异常堆栈"),
+        ArticleRecord(title="季度财报", source="s", url="https://a/2", content="营收同比增长"),
+    ]
+    stats = ArkStats()
+
+    enriched = enrich_articles(rows, stats=stats)
+
+    assert enriched[0].tags == ["代码辅助"]
+    assert '"tags"' not in prompts[0]
+    assert enriched[1].tags == ["数据分析"]
+    assert '"tags"' in prompts[1]
+    assert stats.as_dict()["local_tagged"] == 1
+    assert tagger.load_examples("article") == ([tagger.article_text("季度财报", "营收同比增长")], [["数据分析"]])
+
+
+def test_enrich_articles_logs_examples_only_for_valid_payloads_when_enabled(monkeypatch):
+    import tagger
+    from ark_enrich import ArkCallPolicy, enrich_articles
+    from records import ArticleRecord
+
+    # The first row's payload has no summary and is dead-lettered, not learned from.
+    summaries = {"财报1": "", "财报2": "摘要"}
+
+    def fake_call(_client, prompt, **_kwargs):
+        title = prompt.split("title=")[1].split("\n")[0]
+        return {"summary": summaries[title], "tags": ["数据分析"]}
+
+    monkeypatch.setattr("ark_enrich._build_client", lambda: object())
+    monkeypatch.setattr("ark_enrich._call_ark_json", fake_call)
+    rows = [ArticleRecord(title=f"财报{index}", source="s", url=f"https://a/{index}", content="营收") for index in (1, 2)]
+
+    enrich_articles(rows, policy=ArkCallPolicy(local_tagger=False, record_examples=False), failures=[])
+    assert tagger.load_examples("article") == ([], [])
+
+    enrich_articles(rows, policy=ArkCallPolicy(local_tagger=False), failures=[])
+    assert tagger.load_examples("article") == ([tagger.article_text("财报2", "营收")], [["数据分析"]])
@@ -0,0 +1,48 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import timeparse
+from timeparse import TimestampParser, normalize_timestamp
+
+NOW = datetime(2026, 10, 19, 4, 0, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize(
+    ("raw", "expected"),
+    [
+        ("2026年10月17日 08:30", "2026-10-17T00:30:00+00:00"),
+        ("2026年10月17日08时30分", "2026-10-17T00:30:00+00:00"),
+        ("10月17日", "2026-10-16T16:00:00+00:00"),
+        ("12月30日", "2025-12-29T16:00:00+00:00"),
+        ("3小时前", "2026-10-19T01:00:00+00:00"),
+        ("5 minutes ago", "2026-10-19T03:55:00+00:00"),
+        ("昨天 09:15", "2026-10-18T01:15:00+00:00"),
+        ("2026-10-17 08:30", "2026-10-17T00:30:00+00:00"),
+        ("2026-10-17T08:30:00Z", "2026-10-17T08:30:00+00:00"),
+        ("Fri, 17 Oct 2026 08:30:00 +0800", "2026-10-17T00:30:00+00:00"),
+        ("2026-02-30", None),
+        ("下周见", None),
+        ("", None),
+    ],
+)
+def test_normalize_timestamp_handles_chinese_relative_and_standard_formats(raw, expected):
+    assert normalize_timestamp(raw, now=NOW) == expected
+
+
+def test_parser_learns_and_persists_the_winning_format(monkeypatch):
+    parser = TimestampParser("qbitai", now=NOW)
+    assert parser.normalize("2026年10月17日 08:30") is not None
+    assert parser.format == "cn_datetime"
+    parser.save()
+
+    attempts = []
+    original = timeparse.FORMATS["iso"]
+    monkeypatch.setitem(timeparse.FORMATS, "iso", lambda raw, now: attempts.append(raw) or original(raw, now))
+
+    reloaded = TimestampParser("qbitai", now=NOW)
+    assert reloaded.normalize_many(["2026年10月18日 09:00", "2026年10月18日 10:00"]) == [
+        "2026-10-18T01:00:00+00:00",
+        "2026-10-18T02:00:00+00:00",
+    ]
+    assert attempts == []
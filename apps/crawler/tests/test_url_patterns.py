@@ -0,0 +1,74 @@
+from sources import Source
+from url_patterns import LinkFilter, UrlPatternStats, generalize_path
+
+
+def test_generalize_path_abstracts_ids_and_slugs():
+    assert generalize_path("https://36kr.com/p/2845123") == r"^/p/\d+$"
+    assert generalize_path("https://www.qbitai.com/2026/10/123456.html") == r"^/\d+/\d+/\d+\.html$"
+    assert generalize_path("https://www.jiqizhixin.com/articles/2026-10-17-3") == r"^/articles/[^/]+$"
+
+
+def test_link_filter_uses_configured_patterns_and_excludes_navigation():
+    source = Source(key="36kr", name="36kr", url="https://36kr.com", article_patterns=(r"^/p/\d+$",))
+    link_filter = LinkFilter(source)
+
+    assert link_filter.accepts("https://36kr.com/p/2845123", "一篇关于大模型的文章")
+    assert not link_filter.accepts("https://36kr.com/column/104812", "AI 专栏首页入口链接")
+    assert not link_filter.accepts("https://36kr.com/user/12345678", "作者主页的链接标题")
+
+
+def test_link_filter_scores_links_without_patterns():
+    link_filter = LinkFilter(Source(key="x", name="X", url="https://x.example"))
+
+    assert link_filter.accepts("https://x.example/news/20261017001", "足够长的文章标题文本")
+    assert not link_filter.accepts("https://x.example/tag/llm", "标签页面也有长标题")
+    assert not link_filter.accepts("https://x.example/about", "关于我们以及联系方式")
+
+
+def test_pattern_stats_learn_from_successful_extractions():
+    stats = UrlPatternStats("learned")
+    for index in range(4):
+        stats.record(f"https://x.example/articles/launch-{index}", success=True)
+    stats.record("https://x.example/special/summit", success=False)
+    stats.save()
+
+    learned = UrlPatternStats("learned").learned_patterns()
+    link_filter = LinkFilter(Source(key="learned", name="L", url="https://x.example"), learned=learned)
+
+    assert learned == (r"^/articles/[^/]+$",)
+    # Learned patterns raise a link's score rather than excluding other layouts.
+    assert link_filter.accepts("https://x.example/articles/agents-recap")
+    assert not link_filter.accepts("https://x.example/events/agents-recap")
+    assert link_filter.accepts("https://x.example/news/20261017001", "足够长的文章标题文本")
+
+
+def test_link_filter_uses_the_sources_min_link_score():
+    strict = Source(key="x", name="X", url="https://x.example", min_link_score=2.0)
+
+    assert LinkFilter(Source(key="x", name="X", url="https://x.example")).accepts("https://x.example/news/20261017")
+    assert not LinkFilter(strict).accepts("https://x.example/news/20261017")
+    assert LinkFilter(strict).accepts("https://x.example/news/20261017", "一篇足够长的文章标题文本")
+
+
+def test_pattern_stats_file_keeps_the_most_observed_patterns(monkeypatch):
+    import url_patterns
+
+    monkeypatch.setattr(url_patterns, "MAX_TRACKED_PATTERNS", 2)
+    stats = UrlPatternStats("bounded")
+    for url, times in (("/news/1", 3), ("/special/summit", 1), ("/p/2", 2)):
+        for _ in range(times):
+            stats.record(f"https://x.example{url}", success=True)
+    stats.save()
+
+    assert set(UrlPatternStats("bounded").counts) == {r"^/news/\d+$", r"^/p/\d+$"}
+
+
+def test_pattern_stats_saved_by_concurrent_workers_add_up():
+    first, second = UrlPatternStats("shared"), UrlPatternStats("shared")
+    for stats in (first, second):
+        stats.record("https://x.example/news/1001", success=True)
+        stats.record("https://x.example/news/1002", success=True)
+    first.save()
+    second.save()
+
+    assert UrlPatternStats("shared").counts == {r"^/news/\d+$": {"ok": 4, "fail": 0}}
@@ -0,0 +1,167 @@
+import time
+from dataclasses import asdict
+
+from records import ArticleRecord
+from sources import Source
+from workqueue import DONE, FAILED, PENDING, WorkQueue
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_enqueue_is_idempotent_and_leases_hide_tasks(tmp_path):
+    queue = WorkQueue(tmp_path / "q.sqlite3", clock=FakeClock())
+
+    assert queue.enqueue("detail", "run:1", {"url": "a"})
+    assert not queue.enqueue("detail", "run:1", {"url": "a"})
+    [task] = queue.lease("w1", visibility=60)
+
+    assert task.payload == {"url": "a"}
+    assert queue.lease("w2") == []
+
+
+def test_expired_lease_is_retaken_and_completion_is_idempotent(tmp_path):
+    clock = FakeClock()
+    queue = WorkQueue(tmp_path / "q.sqlite3", clock=clock)
+    queue.enqueue("detail", "run:1", {})
+    [first] = queue.lease("w1", visibility=60)
+
+    clock.now += 61
+    [second] = queue.lease("w2", visibility=60)
+    assert second.attempts == 2
+
+    assert queue.complete(second)
+    assert not queue.complete(first)
+    assert queue.counts() == {"detail": {DONE: 1}}
+
+
+def test_failures_back_off_then_park_after_max_attempts(tmp_path):
+    clock = FakeClock()
+    queue = WorkQueue(tmp_path / "q.sqlite3", clock=clock)
+    queue.enqueue("detail", "run:1", {}, max_attempts=2)
+
+    [task] = queue.lease("w1")
+    assert queue.fail(task, "boom")
+    assert queue.counts() == {"detail": {PENDING: 1}}
+    assert queue.lease("w1") == []
+
+    clock.now += 3600
+    [task] = queue.lease("w1")
+    queue.fail(task, "boom again")
+    assert queue.counts() == {"detail": {FAILED: 1}}
+    assert queue.outstanding() == 0
+
+
+def test_expired_lease_on_the_last_attempt_parks_the_task(tmp_path):
+    clock = FakeClock()
+    queue = WorkQueue(tmp_path / "q.sqlite3", clock=clock)
+    queue.enqueue("detail", "run:1", {}, max_attempts=2)
+
+    for _ in range(2):
+        assert len(queue.lease("w1", visibility=60)) == 1
+        clock.now += 61
+
+    assert queue.lease("w2") == []
+    [parked] = queue.park_expired()
+    assert (parked.key, parked.attempts) == ("run:1", 2)
+    assert queue.counts() == {"detail": {FAILED: 1}}
+    assert queue.connection.execute("select last_error from tasks").fetchone() == ("lease expired",)
+
+
+def test_worker_drains_listing_detail_and_enrich_tasks(tmp_path, monkeypatch):
+    import worker as worker_module
+    from adapters import news
+
+    source = Source(key="n", name="News", url="https://news.example")
+    monkeypatch.setitem(worker_module._SOURCES, "news", {"n": source})
+    monkeypatch.setattr(
+        news, "discover_candidates", lambda *_args: [{"title": "t", "url": "https://news.example/a/1"}]
+    )
+    monkeypatch.setattr(
+        news,
+        "fetch_details",
+        lambda urls, *_args, **_kwargs: {url: ("标题", "正文", "2026-10-17 08:30") for url in urls},
+    )
+    monkeypatch.setattr(
+        worker_module, "enrich_articles", lambda rows, **_kwargs: [ArticleRecord(**{**asdict(rows[0]), "summary": "s"})]
+    )
+
+    class FakeSink:
+        rows: list[ArticleRecord] = []
+
+        def upsert_articles(self, rows, run_id=None, errors=None):
+            self.rows.extend(rows)
+            return len(rows)
+
+    sink = FakeSink()
+    queue = WorkQueue(tmp_path / "q.sqlite3")
+    assert worker_module.enqueue_run(queue, {"news": [source]}, "run_1", {"news": 5}) == 1
+
+    summary = worker_module.Worker(queue, sink, owner="w1").drain(idle_exit=0.01, poll=0.01)
+
+    assert summary["processed"] == {"listing": 1, "detail": 1, "enrich_article": 1}
+    assert [(row.title, row.summary, row.published_at) for row in sink.rows] == [
+        ("标题", "s", "2026-10-17T00:30:00+00:00")
+    ]
+
+
+def test_worker_renews_the_lease_while_a_task_runs(tmp_path):
+    import threading
+
+    import worker as worker_module
+
+    clock = FakeClock()
+    queue = WorkQueue(tmp_path / "q.sqlite3", clock=clock)
+    queue.enqueue("slow", "run:1", {"run_id": "run_1"})
+    renewed = threading.Event()
+    taken = []
+
+    def slow(payload):
+        # Past the lease's original expiry: another worker may only take the
+        # task if nothing renewed it.
+        clock.now += 250
+        other = WorkQueue(tmp_path / "q.sqlite3", clock=clock)
+        deadline = time.monotonic() + 5
+        while not renewed.is_set() and time.monotonic() < deadline:
+            expires = other.connection.execute("select lease_expires_at from tasks").fetchone()[0]
+            if expires > 1300:
+                renewed.set()
+            time.sleep(0.01)
+        clock.now += 100
+        taken.extend(other.lease("w2"))
+        other.close()
+
+    worker = worker_module.Worker(queue, sink=None, owner="w1", heartbeat=0.01)
+    worker.handlers["slow"] = slow
+
+    assert worker.run_one() is not None
+    assert renewed.is_set() and taken == []
+    assert queue.counts() == {"slow": {DONE: 1}}
+
+
+def test_enrich_tasks_that_give_up_go_to_dead_letters_and_are_requeued(tmp_path, monkeypatch):
+    import worker as worker_module
+    from deadletter import DeadLetters
+
+    record = ArticleRecord(title="标题", source="Site", url="https://site.example/a/1", content="正文")
+    monkeypatch.setattr(worker_module, "enrich_articles", lambda rows, **_kwargs: [])
+    queue = WorkQueue(tmp_path / "q.sqlite3")
+    queue.enqueue(
+        worker_module.ENRICH_ARTICLE, "run_1:a", {"run_id": "run_1", "record": asdict(record)}, max_attempts=1
+    )
+    clock = FakeClock()
+    dead_letters = DeadLetters(clock=clock)
+
+    worker_module.Worker(queue, sink=None, owner="w1", dead_letters=dead_letters).run_one()
+    clock.now += 86400
+
+    assert dead_letters.due("article", 10) == [(record.url, asdict(record))]
+    monkeypatch.setattr(worker_module, "DeadLetters", lambda: dead_letters)
+    assert worker_module.enqueue_run(queue, {"news": []}, "run_2", {"news": 5}) == 1
+    [task] = queue.lease("w1")
+    assert (task.kind, task.payload["record"]) == (worker_module.ENRICH_ARTICLE, asdict(record))
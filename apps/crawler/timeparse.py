@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import json
+import re
+from collections.abc import Callable, Iterable
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+
+from paths import locked, state_path, write_atomic
+
+# Every configured news source publishes in China time; naive timestamps are
+# read as UTC+8 (Asia/Shanghai has no DST, so a fixed offset is exact).
+SOURCE_TZ = timezone(timedelta(hours=8), "Asia/Shanghai")
+
+_CN_DATETIME = re.compile(
+    r"(\d{4})\s*年\s*(\d{1,2})\s*月\s*(\d{1,2})\s*日(?:\s*(\d{1,2})\s*[:：时]\s*(\d{1,2})(?:\s*[:：分]\s*(\d{1,2}))?)?"
+)
+_CN_MONTH_DAY = re.compile(r"^(\d{1,2})\s*月\s*(\d{1,2})\s*日(?:\s*(\d{1,2})[:：](\d{2}))?$")
+_NUMERIC = re.compile(
+    r"^(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})(?:[ T]+(\d{1,2}):(\d{2})(?::(\d{2}))?(?:\.\d+)?)?\s*(Z|[+-]\d{2}:?\d{2})?$"
+)
+_SHORT_NUMERIC = re.compile(r"^(\d{1,2})-(\d{1,2})\s+(\d{1,2}):(\d{2})$")
+_RELATIVE = re.compile(
+    r"^(\d+)\s*(秒|分钟|分|小时|天|日|周|星期|个月|月|seconds?|minutes?|mins?|hours?|days?|weeks?)\s*(?:前|ago)$",
+    re.IGNORECASE,
+)
+_DAY_WORD = re.compile(r"^(今天|昨天|前天)\s*(?:(\d{1,2})[:：](\d{2}))?$")
+_EPOCH = re.compile(r"^\d{10}(\d{3})?$")
+
+_RELATIVE_UNITS = {
+    "秒": timedelta(seconds=1),
+    "second": timedelta(seconds=1),
+    "分钟": timedelta(minutes=1),
+    "分": timedelta(minutes=1),
+    "minute": timedelta(minutes=1),
+    "min": timedelta(minutes=1),
+    "小时": timedelta(hours=1),
+    "hour": timedelta(hours=1),
+    "天": timedelta(days=1),
+    "日": timedelta(days=1),
+    "day": timedelta(days=1),
+    "周": timedelta(weeks=1),
+    "星期": timedelta(weeks=1),
+    "week": timedelta(weeks=1),
+    "个月": timedelta(days=30),
+    "月": timedelta(days=30),
+}
+_DAY_OFFSETS = {"今天": 0, "昨天": 1, "前天": 2}
+
+Parser = Callable[[str, datetime], "datetime | None"]
+
+
+def _local(
+    year: int, month: int, day: int, hour: str | None = None, minute: str | None = None, second: str | None = None
+) -> datetime | None:
+    try:
+        return datetime(year, month, day, int(hour or 0), int(minute or 0), int(second or 0), tzinfo=SOURCE_TZ)
+    except ValueError:
+        return None
+
+
+def _offset(raw: str) -> timezone:
+    if raw == "Z":
+        return timezone.utc
+    sign = -1 if raw[0] == "-" else 1
+    digits = raw[1:].replace(":", "")
+    return timezone(sign * timedelta(hours=int(digits[:2]), minutes=int(digits[2:])))
+
+
+def _parse_iso(raw: str, now: datetime) -> datetime | None:
+    try:
+        parsed = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=SOURCE_TZ)
+
+
+def _parse_rfc2822(raw: str, now: datetime) -> datetime | None:
+    try:
+        parsed = parsedate_to_datetime(raw)
+    except Exception:  # noqa: BLE001
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=SOURCE_TZ)
+
+
+def _parse_numeric(raw: str, now: datetime) -> datetime | None:
+    match = _NUMERIC.match(raw)
+    if not match:
+        return None
+    year, month, day, hour, minute, second, offset = match.groups()
+    parsed = _local(int(year), int(month), int(day), hour, minute, second)
+    if parsed is not None and offset:
+        return parsed.replace(tzinfo=_offset(offset))
+    return parsed
+
+
+def _parse_cn_datetime(raw: str, now: datetime) -> datetime | None:
+    match = _CN_DATETIME.search(raw)
+    if not match:
+        return None
+    year, month, day, hour, minute, second = match.groups()
+    return _local(int(year), int(month), int(day), hour, minute, second)
+
+
+def _in_past_year(month: int, day: int, hour: str | None, minute: str | None, now: datetime) -> datetime | None:
+    # Year-less dates ("10月17日", "10-17 08:30") belong to the most recent
+    # occurrence that is not in the future.
+    local_now = now.astimezone(SOURCE_TZ)
+    parsed = _local(local_now.year, month, day, hour, minute)
+    if parsed is not None and parsed > local_now + timedelta(days=1):
+        parsed = _local(local_now.year - 1, month, day, hour, minute)
+    return parsed
+
+
+def _parse_cn_month_day(raw: str, now: datetime) -> datetime | None:
+    match = _CN_MONTH_DAY.match(raw) or _SHORT_NUMERIC.match(raw)
+    if not match:
+        return None
+    month, day, hour, minute = match.groups()
+    return _in_past_year(int(month), int(day), hour, minute, now)
+
+
+def _parse_relative(raw: str, now: datetime) -> datetime | None:
+    if raw in ("刚刚", "just now"):
+        return now
+    match = _RELATIVE.match(raw)
+    if match:
+        unit = match.group(2).lower().rstrip("s")
+        return now - int(match.group(1)) * _RELATIVE_UNITS[unit]
+    match = _DAY_WORD.match(raw)
+    if match:
+        word, hour, minute = match.groups()
+        day = now.astimezone(SOURCE_TZ) - timedelta(days=_DAY_OFFSETS[word])
+        return _local(day.year, day.month, day.day, hour, minute)
+    return None
+
+
+def _parse_epoch(raw: str, now: datetime) -> datetime | None:
+    if not _EPOCH.match(raw):
+        return None
+    seconds = int(raw) / (1000 if len(raw) == 13 else 1)
+    return datetime.fromtimestamp(seconds, tz=timezone.utc)
+
+
+# Tried in this order for a source that has no learned format yet.
+FORMATS: dict[str, Parser] = {
+    "iso": _parse_iso,
+    "numeric": _parse_numeric,
+    "rfc2822": _parse_rfc2822,
+    "cn_datetime": _parse_cn_datetime,
+    "cn_month_day": _parse_cn_month_day,
+    "relative": _parse_relative,
+    "epoch": _parse_epoch,
+}
+
+
+class TimestampParser:
+    # Remembers which format last parsed a value for the source, so a batch
+    # from one site normally takes a single attempt per row. The learned format
+    # is kept in the state dir so the next run starts on the fast path.
+    def __init__(self, source_key: str | None = None, now: datetime | None = None) -> None:
+        self.source_key = source_key
+        self.now = now or datetime.now(timezone.utc)
+        self.path = state_path("time_formats.json") if source_key else None
+        self.learned: dict[str, str] = {}
+        if self.path is not None and self.path.exists():
+            self.learned = json.loads(self.path.read_text(encoding="utf-8"))
+        self._dirty = False
+
+    @property
+    def format(self) -> str | None:
+        return self.learned.get(self.source_key or "")
+
+    def parse(self, value: str | None) -> datetime | None:
+        raw = " ".join((value or "").split())
+        if not raw:
+            return None
+        winner = self.format
+        if winner is not None:
+            parsed = FORMATS[winner](raw, self.now)
+            if parsed is not None:
+                return parsed
+        for name, parser in FORMATS.items():
+            if name == winner:
+                continue
+            parsed = parser(raw, self.now)
+            if parsed is not None:
+                if self.source_key:
+                    self.learned[self.source_key] = name
+                    self._dirty = True
+                return parsed
+        return None
+
+    def normalize(self, value: str | None) -> str | None:
+        parsed = self.parse(value)
+        return parsed.astimezone(timezone.utc).isoformat() if parsed is not None else None
+
+    def normalize_many(self, values: Iterable[str | None]) -> list[str | None]:
+        return [self.normalize(value) for value in values]
+
+    def save(self) -> None:
+        if self.path is None or not self._dirty:
+            return
+        # Other sources may have learned formats in the meantime; only this
+        # source's entry is replaced.
+        with locked(self.path):
+            current = json.loads(self.path.read_text(encoding="utf-8")) if self.path.exists() else {}
+            current[str(self.source_key)] = self.learned[str(self.source_key)]
+            write_atomic(self.path, json.dumps(current, ensure_ascii=False, indent=2))
+        self._dirty = False
+
+
+def normalize_timestamp(value: str | None, now: datetime | None = None) -> str | None:
+    return TimestampParser(now=now).normalize(value)
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import json
+import re
+from functools import lru_cache
+from urllib.parse import urlparse
+
+from paths import locked, state_path, write_atomic
+from sources import Source
+
+NON_ARTICLE_PATTERNS = (
+    r"/(tag|tags|topic|topics|author|authors|user|users|column|columns|category|categories)(/|$)",
+    r"/(search|login|register|signup|about|contact|privacy|terms|download|app)(/|$)",
+    r"/(page|p)/\d{1,3}/?$",
+    r"\.(jpg|jpeg|png|gif|svg|pdf|zip|apk)$",
+)
+
+LEARN_MIN_SUCCESSES = 3
+LEARN_MIN_PRECISION = 0.6
+# Score added to a link matching a learned pattern: enough to admit a link the
+# heuristics alone would not, without shutting out new URL layouts.
+LEARNED_PATTERN_BOOST = 1.0
+MIN_LINK_SCORE = 1.0
+# Patterns kept per source in the stats file, most observed first; one-off
+# layouts (specials, campaign pages) are dropped as the file fills up.
+MAX_TRACKED_PATTERNS = 200
+
+_DIGITS = re.compile(r"\d+")
+_SLUG = re.compile(r"^[\w.-]*[-_][\w.-]*$")
+_ID_LIKE = re.compile(r"\d{4,}")
+
+
+@lru_cache(maxsize=256)
+def compile_patterns(patterns: tuple[str, ...]) -> tuple[re.Pattern[str], ...]:
+    return tuple(re.compile(pattern) for pattern in patterns)
+
+
+def generalize_path(url: str) -> str:
+    # /articles/2026-10-17-3 -> ^/articles/[^/]+$ ; /p/2845123 -> ^/p/\d+$
+    segments = [segment for segment in urlparse(url).path.split("/") if segment]
+    if not segments:
+        return "^/$"
+    parts = [re.escape(segments[0]) if not _DIGITS.fullmatch(segments[0]) else r"\d+"]
+    for segment in segments[1:]:
+        if _DIGITS.fullmatch(segment):
+            parts.append(r"\d+")
+        elif _DIGITS.fullmatch(segment.rsplit(".", 1)[0]) and "." in segment:
+            parts.append(r"\d+\." + re.escape(segment.rsplit(".", 1)[1]))
+        elif _SLUG.match(segment) or _ID_LIKE.search(segment):
+            parts.append(r"[^/]+")
+        else:
+            parts.append(re.escape(segment))
+    return "^/" + "/".join(parts) + "$"
+
+
+class UrlPatternStats:
+    def __init__(self, source_key: str) -> None:
+        self.source_key = source_key
+        self.path = state_path("url_patterns", f"{source_key}.json")
+        self.counts = self._load()
+        # Outcomes recorded since loading, added to the stored counts on save.
+        self._recorded: dict[str, dict[str, int]] = {}
+
+    def _load(self) -> dict[str, dict[str, int]]:
+        return json.loads(self.path.read_text(encoding="utf-8")) if self.path.exists() else {}
+
+    def record(self, url: str, success: bool) -> None:
+        pattern = generalize_path(url)
+        for counts in (self.counts, self._recorded):
+            counts.setdefault(pattern, {"ok": 0, "fail": 0})["ok" if success else "fail"] += 1
+
+    def suggest(self) -> list[dict[str, object]]:
+        suggestions = []
+        for pattern, entry in self.counts.items():
+            total = entry["ok"] + entry["fail"]
+            precision = entry["ok"] / total if total else 0.0
+            suggestions.append({"pattern": pattern, "ok": entry["ok"], "fail": entry["fail"], "precision": precision})
+        return sorted(suggestions, key=lambda item: (-float(item["precision"]), -int(item["ok"])))
+
+    def learned_patterns(self) -> tuple[str, ...]:
+        return tuple(
+            str(item["pattern"])
+            for item in self.suggest()
+            if int(item["ok"]) >= LEARN_MIN_SUCCESSES and float(item["precision"]) >= LEARN_MIN_PRECISION
+        )
+
+    def save(self) -> None:
+        # Detail tasks of the same source run on several workers; each adds its
+        # own outcomes to the counts stored under the lock.
+        with locked(self.path):
+            current = self._load()
+            for pattern, recorded in self._recorded.items():
+                entry = current.setdefault(pattern, {"ok": 0, "fail": 0})
+                entry["ok"] += recorded["ok"]
+                entry["fail"] += recorded["fail"]
+            if len(current) > MAX_TRACKED_PATTERNS:
+                busiest = sorted(current.items(), key=lambda item: item[1]["ok"] + item[1]["fail"], reverse=True)
+                current = dict(busiest[:MAX_TRACKED_PATTERNS])
+            write_atomic(self.path, json.dumps(current, ensure_ascii=False, indent=2))
+        self.counts = current
+        self._recorded = {}
+
+
+class LinkFilter:
+    # Configured `article_patterns` are an include-list; without them links are
+    # scored, and patterns learned for the source raise the score of links that
+    # match them. `min_link_score` sets the source's own acceptance threshold.
+    def __init__(self, source: Source, learned: tuple[str, ...] = ()) -> None:
+        self.include = compile_patterns(source.article_patterns)
+        self.learned = compile_patterns(learned)
+        self.exclude = compile_patterns(NON_ARTICLE_PATTERNS + source.exclude_patterns)
+        self.min_score = source.min_link_score or MIN_LINK_SCORE
+
+    def score(self, url: str, text: str = "") -> float:
+        path = urlparse(url).path or "/"
+        if path == "/" or any(pattern.search(path) for pattern in self.exclude):
+            return float("-inf")
+        if self.include:
+            return 3.0 if any(pattern.search(path) for pattern in self.include) else float("-inf")
+        score = LEARNED_PATTERN_BOOST if any(pattern.search(path) for pattern in self.learned) else 0.0
+        if _ID_LIKE.search(path):
+            score += 1.0
+        if path.strip("/").count("/") >= 1:
+            score += 0.5
+        if len(text) >= 12:
+            score += 0.5
+        return score
+
+    def accepts(self, url: str, text: str = "") -> bool:
+        return self.score(url, text) >= self.min_score
@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import os
+import socket
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any
+
+from archive import ArchiveSession, RawArchive
+from archive import activate as activate_archive
+from ark_enrich import ArkCallPolicy, enrich_articles, enrich_models
+from deadletter import DeadLetters
+from entities import EntityIndex
+from parser_pool import ParserPool
+from records import ArticleRecord, ModelRecord
+from scheduler import SourceHistory, plan_sources, unplanned
+from sinks import Sink
+from sitemaps import SitemapState
+from snapshots import CatalogSnapshot
+from sources import (
+    DLQ_RETRY_BATCH,
+    MODEL_SOURCES,
+    NEWS_DETAIL_RETRY,
+    NEWS_SOURCES,
+    QUEUE_HEARTBEAT_INTERVAL,
+    QUEUE_IDLE_EXIT,
+    QUEUE_MODEL_BATCH,
+    Source,
+)
+from workqueue import Task, WorkQueue
+
+LISTING = "listing"
+DETAIL = "detail"
+ENRICH_ARTICLE = "enrich_article"
+ENRICH_MODELS = "enrich_models"
+TASK_KINDS = (LISTING, DETAIL, ENRICH_ARTICLE, ENRICH_MODELS)
+
+_SOURCES = {
+    "models": {source.key: source for source in MODEL_SOURCES},
+    "news": {source.key: source for source in NEWS_SOURCES},
+}
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_run(
+    queue: WorkQueue,
+    selection: dict[str, list[Source]],
+    run_id: str,
+    limits: dict[str, int],
+    adaptive: bool = True,
+) -> int:
+    # One listing task per source; listing tasks fan out into detail and
+    # enrichment tasks. Keys carry the run id, so re-enqueueing a run is a no-op.
+    # Dead-lettered rows that are due again get an enrichment task of their own.
+    enqueued = 0
+    dead_letters = DeadLetters()
+    for pipeline, sources in selection.items():
+        if pipeline == "news":
+            for url, payload in dead_letters.due("article", DLQ_RETRY_BATCH):
+                enqueued += queue.enqueue(
+                    ENRICH_ARTICLE, f"{run_id}:{ENRICH_ARTICLE}:{url}", {"run_id": run_id, "record": payload}
+                )
+        else:
+            for key, payload in dead_letters.due("model", DLQ_RETRY_BATCH):
+                row = {name: value for name, value in payload.items() if name != "partial"}
+                partial = [[row["provider"], row["name"]]] if payload.get("partial") else []
+                enqueued += queue.enqueue(
+                    ENRICH_MODELS,
+                    f"{run_id}:{ENRICH_MODELS}:retry:{key}",
+                    {"run_id": run_id, "records": [row], "partial": partial},
+                )
+        history = SourceHistory(pipeline)
+        if adaptive:
+            plans = plan_sources(sources, history, limits[pipeline])[0]
+        else:
+            plans = unplanned(sources, limits[pipeline])
+        for plan in plans:
+            payload = {"run_id": run_id, "pipeline": pipeline, "source": plan.source.key, "limit": plan.limit}
+            enqueued += queue.enqueue(LISTING, f"{run_id}:{LISTING}:{pipeline}:{plan.source.key}", payload)
+    dead_letters.close()
+    return enqueued
+
+
+class Worker:
+    def __init__(
+        self,
+        queue: WorkQueue,
+        sink: Sink,
+        parser: ParserPool | None = None,
+        ark_policy: ArkCallPolicy | None = None,
+        owner: str | None = None,
+        archive: RawArchive | None = None,
+        heartbeat: float = QUEUE_HEARTBEAT_INTERVAL,
+        dead_letters: DeadLetters | None = None,
+    ) -> None:
+        self.queue = queue
+        self.sink = sink
+        self.parser = parser or ParserPool()
+        self.ark_policy = ark_policy
+        self.owner = owner or worker_id()
+        self.archive = archive
+        self.heartbeat = heartbeat
+        self.dead_letters = dead_letters or DeadLetters()
+        self.processed: dict[str, int] = {}
+        self.failed: dict[str, int] = {}
+        self.handlers: dict[str, Callable[[dict[str, Any]], None]] = {
+            LISTING: self._listing,
+            DETAIL: self._detail,
+            ENRICH_ARTICLE: self._enrich_article,
+            ENRICH_MODELS: self._enrich_models,
+        }
+
+    def _listing(self, payload: dict[str, Any]) -> None:
+        pipeline, run_id, limit = payload["pipeline"], payload["run_id"], int(payload["limit"])
+        source = _SOURCES[pipeline][payload["source"]]
+        history = SourceHistory(pipeline)
+        started = time.monotonic()
+        if pipeline == "models":
+            from adapters.models import fetch_models_for_source
+
+            snapshot = CatalogSnapshot(source.key)
+            records = fetch_models_for_source(source, limit=limit, snapshot=snapshot)
+            entities = EntityIndex()
+            records, aliases = entities.resolve(records)
+            entities.save()
+            self.sink.upsert_model_aliases(aliases, run_id=run_id)
+            for start in range(0, len(records), QUEUE_MODEL_BATCH):
+                rows = records[start : start + QUEUE_MODEL_BATCH]
+                # Canonical rows resolved from alias data only, written field by
+                # field (see EntityIndex.resolve).
+                partial = [[row.provider, row.name] for row in rows if (row.provider, row.name) in entities.partial]
+                self.queue.enqueue(
+                    ENRICH_MODELS,
+                    f"{run_id}:{ENRICH_MODELS}:{source.key}:{start}",
+                    {"run_id": run_id, "records": [asdict(row) for row in rows], "partial": partial},
+                )
+            # The snapshot advances once the work is queued; failed enrichment is
+            # retried by the queue rather than by re-diffing the catalog.
+            snapshot.commit()
+            history.record(source.key, limit, len(records), failed=False, seconds=time.monotonic() - started)
+        else:
+            from adapters.news import discover_candidates
+
+            latest = history.get(source.key).latest_published
+            since = datetime.fromisoformat(latest) if latest else None
+            sitemap_state = SitemapState(source.key) if source.sitemaps else None
+            candidates = discover_candidates(source, limit, self.parser, since, sitemap_state)
+            urls = [item["url"] for item in candidates]
+            new = history.unseen(source.key, urls)
+            for item in candidates:
+                self.queue.enqueue(
+                    DETAIL,
+                    f"{run_id}:{DETAIL}:{item['url']}",
+                    {"run_id": run_id, "source": source.key, "item": item},
+                )
+            # As with catalog snapshots, the sitemap watermark advances once the
+            # detail work is queued; the queue retries it from there.
+            if sitemap_state is not None:
+                sitemap_state.commit()
+            history.record(
+                source.key, limit, len(new), failed=False, seconds=time.monotonic() - started, urls=urls
+            )
+        history.save()
+
+    def _detail(self, payload: dict[str, Any]) -> None:
+        from adapters.news import build_article_records, feed_details, fetch_details
+
+        source = _SOURCES["news"][payload["source"]]
+        item = payload["item"]
+        details = feed_details([item])
+        if not details:
+            retries = source.retries or NEWS_DETAIL_RETRY
+            details = fetch_details([item["url"]], retries, self.parser, features=source.parser)
+        for record in build_article_records(source, [item], details):
+            self.queue.enqueue(
+                ENRICH_ARTICLE,
+                f"{payload['run_id']}:{ENRICH_ARTICLE}:{record.url}",
+                {"run_id": payload["run_id"], "record": asdict(record)},
+            )
+
+    def _enrich_article(self, payload: dict[str, Any]) -> None:
+        record = ArticleRecord(**payload["record"])
+        enriched = enrich_articles([record], policy=self.ark_policy)
+        if not enriched:
+            raise RuntimeError(f"Enrichment budget exhausted for {record.url}")
+        errors: list[str] = []
+        if not self.sink.upsert_articles(enriched, run_id=payload["run_id"], errors=errors):
+            raise RuntimeError("; ".join(errors) or f"Article not persisted: {record.url}")
+        self.dead_letters.resolve("article", [record.url])
+        self._refresh_scenarios([tag for row in enriched for tag in row.tags], payload["run_id"])
+
+    def _enrich_models(self, payload: dict[str, Any]) -> None:
+        records = [ModelRecord(**row) for row in payload["records"]]
+        enriched = enrich_models(records, policy=self.ark_policy)
+        if len(enriched) < len(records):
+            raise RuntimeError("Enrichment budget exhausted for model batch")
+        partial = {tuple(key) for key in payload.get("partial", [])}
+        self.sink.upsert_models(
+            [row for row in enriched if (row.provider, row.name) not in partial], run_id=payload["run_id"]
+        )
+        merged = [row for row in enriched if (row.provider, row.name) in partial]
+        if merged:
+            self.sink.upsert_models(merged, run_id=payload["run_id"], partial=True)
+        self.dead_letters.resolve("model", [f"{row.provider}/{row.name}" for row in enriched])
+        self._refresh_scenarios([tag for row in enriched for tag in row.business_scenarios], payload["run_id"])
+
+    def _refresh_scenarios(self, scenarios: list[str], run_id: str) -> None:
+        # The rows are already stored, so a failed aggregate refresh is counted
+        # rather than failing the task (a retry would re-run enrichment); the
+        # next task touching the same scenarios recomputes them.
+        if not scenarios:
+            return
+        try:
+            self.sink.refresh_scenario_stats(sorted(set(scenarios)), run_id=run_id)
+        except RuntimeError:
+            self.failed["scenario_stats"] = self.failed.get("scenario_stats", 0) + 1
+
+    def _dead_letter(self, task: Task, reason: str) -> None:
+        # The listing already advanced its catalog snapshot or sitemap watermark
+        # past these rows, so once the queue gives up on their enrichment they
+        # go to the dead-letter store, as in-process runs do, to be retried.
+        if task.kind == ENRICH_ARTICLE:
+            record = task.payload["record"]
+            self.dead_letters.add("article", record["url"], record, reason)
+        elif task.kind == ENRICH_MODELS:
+            partial = {tuple(key) for key in task.payload.get("partial", [])}
+            for row in task.payload["records"]:
+                payload = {**row, "partial": (row["provider"], row["name"]) in partial}
+                self.dead_letters.add("model", f"{row['provider']}/{row['name']}", payload, reason)
+
+    @contextmanager
+    def _renewing(self, task: Task) -> Iterator[None]:
+        # Renews the lease every `heartbeat` seconds while the handler runs, so
+        # a task that outlasts the visibility timeout (a large listing, slow Ark
+        # calls) is not leased to a second worker mid-way. The renewals use
+        # their own connection: the queue's belongs to this thread.
+        done = threading.Event()
+
+        def renew() -> None:
+            queue = WorkQueue(self.queue.path, clock=self.queue.clock)
+            try:
+                while not done.wait(self.heartbeat) and queue.extend(task):
+                    pass
+            finally:
+                queue.close()
+
+        thread = threading.Thread(target=renew, name=f"lease-{task.id}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            done.set()
+            thread.join()
+
+    def run_one(self, kinds: tuple[str, ...] = ()) -> Task | None:
+        for expired in self.queue.park_expired(kinds):
+            self._dead_letter(expired, "lease expired")
+            self.failed[expired.kind] = self.failed.get(expired.kind, 0) + 1
+        tasks = self.queue.lease(self.owner, kinds=kinds)
+        if not tasks:
+            return None
+        task = tasks[0]
+        # Pages fetched by the task are archived under its run, so a queued run
+        # can be reparsed like an in-process one.
+        if self.archive is not None:
+            activate_archive(ArchiveSession(self.archive, task.payload["run_id"]))
+        try:
+            with self._renewing(task):
+                self.handlers[task.kind](task.payload)
+        except Exception as error:  # noqa: BLE001
+            reason = f"{type(error).__name__}: {error}"
+            self.queue.fail(task, reason)
+            if task.attempts >= task.max_attempts:
+                self._dead_letter(task, reason)
+            self.failed[task.kind] = self.failed.get(task.kind, 0) + 1
+        else:
+            self.queue.complete(task)
+            self.processed[task.kind] = self.processed.get(task.kind, 0) + 1
+        finally:
+            activate_archive(None)
+        return task
+
+    def drain(
+        self,
+        kinds: tuple[str, ...] = (),
+        idle_exit: float = QUEUE_IDLE_EXIT,
+        stop_event: threading.Event | None = None,
+        poll: float = 1.0,
+    ) -> dict[str, dict[str, int]]:
+        # Works until nothing has been leasable for `idle_exit` seconds (0 keeps
+        # polling forever) or `stop_event` is set; a task in progress always
+        # finishes and is acknowledged first.
+        stop_event = stop_event or threading.Event()
+        idle_since = time.monotonic()
+        while not stop_event.is_set():
+            if self.run_one(kinds) is not None:
+                idle_since = time.monotonic()
+                continue
+            if idle_exit and time.monotonic() - idle_since >= idle_exit:
+                break
+            stop_event.wait(poll)
+        return {"processed": dict(self.processed), "failed": dict(self.failed)}
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from paths import state_path
+from sources import QUEUE_MAX_ATTEMPTS, QUEUE_RETRY_BASE, QUEUE_VISIBILITY_TIMEOUT
+
+SCHEMA = """
+create table if not exists tasks (
+  id integer primary key,
+  kind text not null,
+  key text not null unique,
+  payload text not null,
+  status text not null default 'pending',
+  attempts integer not null default 0,
+  max_attempts integer not null,
+  available_at real not null,
+  lease_owner text,
+  lease_expires_at real,
+  last_error text,
+  created_at real not null,
+  finished_at real
+);
+
+create index if not exists tasks_ready on tasks (status, available_at);
+"""
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass(frozen=True)
+class Task:
+    id: int
+    kind: str
+    key: str
+    payload: dict[str, Any]
+    attempts: int
+    lease_owner: str
+    max_attempts: int = QUEUE_MAX_ATTEMPTS
+
+
+class WorkQueue:
+    # SQLite-backed task queue with leases. A leased task is invisible to other
+    # workers until its lease expires, after which any worker may take it again,
+    # so a crashed worker only delays its tasks. Task keys are unique: enqueueing
+    # the same key twice is a no-op, and completing a task twice is harmless.
+    # Any number of processes can share one database file (WAL mode); workers on
+    # other hosts need it on a shared filesystem with working POSIX locks.
+    def __init__(self, path: str | Path | None = None, clock: Callable[[], float] = time.time) -> None:
+        self.path = Path(path) if path else state_path("queue", "tasks.sqlite3")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.clock = clock
+        self.connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self.connection.execute("pragma journal_mode=wal")
+        self.connection.execute("pragma synchronous=normal")
+        self.connection.executescript(SCHEMA)
+
+    def enqueue(
+        self,
+        kind: str,
+        key: str,
+        payload: dict[str, Any],
+        delay: float = 0.0,
+        max_attempts: int = QUEUE_MAX_ATTEMPTS,
+    ) -> bool:
+        now = self.clock()
+        cursor = self.connection.execute(
+            "insert into tasks (kind, key, payload, max_attempts, available_at, created_at) "
+            "values (?, ?, ?, ?, ?, ?) on conflict (key) do nothing",
+            (kind, key, json.dumps(payload, ensure_ascii=False), max_attempts, now + delay, now),
+        )
+        return cursor.rowcount > 0
+
+    def lease(
+        self,
+        owner: str,
+        kinds: tuple[str, ...] = (),
+        limit: int = 1,
+        visibility: float = QUEUE_VISIBILITY_TIMEOUT,
+    ) -> list[Task]:
+        now = self.clock()
+        kind_filter = f" and kind in ({', '.join('?' for _ in kinds)})" if kinds else ""
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers can never
+        # select the same ready rows.
+        self.connection.execute("begin immediate")
+        try:
+            # A lease that ran out on its last attempt means the task keeps killing
+            # or hanging its worker; it is never leased again (see park_expired).
+            rows = self.connection.execute(
+                "select id, kind, key, payload, attempts, max_attempts from tasks "
+                "where ((status = ? and available_at <= ?) "
+                "or (status = ? and lease_expires_at <= ? and attempts < max_attempts))"
+                f"{kind_filter} order by available_at, id limit ?",
+                (PENDING, now, LEASED, now, *kinds, limit),
+            ).fetchall()
+            self.connection.executemany(
+                "update tasks set status = ?, lease_owner = ?, lease_expires_at = ?, attempts = attempts + 1 "
+                "where id = ?",
+                [(LEASED, owner, now + visibility, row[0]) for row in rows],
+            )
+            self.connection.execute("commit")
+        except BaseException:
+            self.connection.execute("rollback")
+            raise
+        return [
+            Task(
+                id=row[0],
+                kind=row[1],
+                key=row[2],
+                payload=json.loads(row[3]),
+                attempts=row[4] + 1,
+                lease_owner=owner,
+                max_attempts=row[5],
+            )
+            for row in rows
+        ]
+
+    def park_expired(self, kinds: tuple[str, ...] = ()) -> list[Task]:
+        # Moves tasks whose lease expired on their last attempt to failed and
+        # returns them, so the caller can hand their work on (dead letters).
+        now = self.clock()
+        kind_filter = f" and kind in ({', '.join('?' for _ in kinds)})" if kinds else ""
+        rows = self.connection.execute(
+            "update tasks set status = ?, finished_at = ?, last_error = ?, lease_expires_at = null "
+            f"where status = ? and lease_expires_at <= ? and attempts >= max_attempts{kind_filter} "
+            "returning id, kind, key, payload, attempts, max_attempts, lease_owner",
+            (FAILED, now, "lease expired", LEASED, now, *kinds),
+        ).fetchall()
+        return [
+            Task(
+                id=row[0],
+                kind=row[1],
+                key=row[2],
+                payload=json.loads(row[3]),
+                attempts=row[4],
+                lease_owner=row[6],
+                max_attempts=row[5],
+            )
+            for row in rows
+        ]
+
+    def extend(self, task: Task, visibility: float = QUEUE_VISIBILITY_TIMEOUT) -> bool:
+        cursor = self.connection.execute(
+            "update tasks set lease_expires_at = ? where id = ? and status = ? and lease_owner = ?",
+            (self.clock() + visibility, task.id, LEASED, task.lease_owner),
+        )
+        return cursor.rowcount > 0
+
+    def complete(self, task: Task) -> bool:
+        # First completion wins; a worker whose lease expired and was re-taken
+        # may still finish, but a second completion changes nothing.
+        cursor = self.connection.execute(
+            "update tasks set status = ?, finished_at = ?, lease_owner = null, lease_expires_at = null "
+            "where id = ? and status != ?",
+            (DONE, self.clock(), task.id, DONE),
+        )
+        return cursor.rowcount > 0
+
+    def fail(self, task: Task, error: str) -> bool:
+        # Retries back off exponentially; after max_attempts the task is parked
+        # as failed for inspection instead of being retried forever.
+        now = self.clock()
+        cursor = self.connection.execute(
+            "update tasks set "
+            "status = case when attempts >= max_attempts then ? else ? end, "
+            "available_at = ? + ? * (1 << min(attempts - 1, 10)), "
+            "finished_at = case when attempts >= max_attempts then ? else null end, "
+            "last_error = ?, lease_owner = null, lease_expires_at = null "
+            "where id = ? and status = ? and lease_owner = ?",
+            (FAILED, PENDING, now, QUEUE_RETRY_BASE, now, error[:2000], task.id, LEASED, task.lease_owner),
+        )
+        return cursor.rowcount > 0
+
+    def counts(self) -> dict[str, dict[str, int]]:
+        counts: dict[str, dict[str, int]] = {}
+        for kind, status, count in self.connection.execute(
+            "select kind, status, count(*) from tasks group by kind, status"
+        ):
+            counts.setdefault(kind, {})[status] = count
+        return counts
+
+    def outstanding(self) -> int:
+        row = self.connection.execute(
+            "select count(*) from tasks where status in (?, ?)", (PENDING, LEASED)
+        ).fetchone()
+        return int(row[0])
+
+    def purge(self, older_than: float) -> int:
+        cursor = self.connection.execute(
+            "delete from tasks where status in (?, ?) and finished_at < ?", (DONE, FAILED, self.clock() - older_than)
+        )
+        return cursor.rowcount
+
+    def close(self) -> None:
+        self.connection.close()
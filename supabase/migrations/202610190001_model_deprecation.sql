@@ -0,0 +1,4 @@
+alter table models
+  add column if not exists deprecated_at timestamptz;
+
+create index if not exists models_deprecated_at_idx on models (deprecated_at);
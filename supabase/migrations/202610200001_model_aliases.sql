@@ -0,0 +1,13 @@
+create table if not exists model_aliases (
+  id uuid primary key default gen_random_uuid(),
+  alias_provider text not null,
+  alias_name text not null,
+  canonical_provider text not null,
+  canonical_name text not null,
+  crawl_run_id text,
+  created_at timestamptz not null default now(),
+  updated_at timestamptz not null default now(),
+  unique (alias_provider, alias_name)
+);
+
+create index if not exists model_aliases_canonical_idx on model_aliases (canonical_provider, canonical_name);
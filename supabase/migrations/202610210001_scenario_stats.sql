@@ -0,0 +1,74 @@
+create index if not exists models_business_scenarios_idx on models using gin (business_scenarios);
+create index if not exists articles_tags_idx on articles using gin (tags);
+
+create table if not exists scenario_stats (
+  scenario text primary key,
+  model_count int not null default 0,
+  article_count int not null default 0,
+  top_model_ids uuid[] not null default '{}',
+  top_article_ids uuid[] not null default '{}',
+  latest_model_at timestamptz,
+  latest_article_at timestamptz,
+  crawl_run_id text,
+  updated_at timestamptz not null default now()
+);
+
+-- Recomputes the rows for the given scenarios only (the crawler passes the
+-- scenarios/tags it persisted in a run); scenarios left with no models and no
+-- articles are dropped. Array containment uses the GIN indexes above.
+create or replace function refresh_scenario_stats(scenarios text[], top_n int default 10, run_id text default null)
+returns int
+language plpgsql
+as $$
+declare
+  refreshed int;
+begin
+  insert into scenario_stats (
+    scenario, model_count, article_count, top_model_ids, top_article_ids,
+    latest_model_at, latest_article_at, crawl_run_id, updated_at
+  )
+  select
+    touched.scenario,
+    model_totals.total,
+    article_totals.total,
+    array(
+      select m.id from models m
+      where m.business_scenarios @> array[touched.scenario] and m.deprecated_at is null
+      order by m.updated_at desc
+      limit top_n
+    ),
+    array(
+      select a.id from articles a
+      where a.tags @> array[touched.scenario]
+      order by a.published_at desc nulls last, a.created_at desc
+      limit top_n
+    ),
+    model_totals.latest,
+    article_totals.latest,
+    run_id,
+    now()
+  from (select distinct unnest(scenarios) as scenario) touched
+  cross join lateral (
+    select count(*)::int as total, max(m.updated_at) as latest from models m
+    where m.business_scenarios @> array[touched.scenario] and m.deprecated_at is null
+  ) model_totals
+  cross join lateral (
+    select count(*)::int as total, max(a.published_at) as latest from articles a
+    where a.tags @> array[touched.scenario]
+  ) article_totals
+  on conflict (scenario) do update set
+    model_count = excluded.model_count,
+    article_count = excluded.article_count,
+    top_model_ids = excluded.top_model_ids,
+    top_article_ids = excluded.top_article_ids,
+    latest_model_at = excluded.latest_model_at,
+    latest_article_at = excluded.latest_article_at,
+    crawl_run_id = excluded.crawl_run_id,
+    updated_at = excluded.updated_at;
+  get diagnostics refreshed = row_count;
+
+  delete from scenario_stats
+  where scenario = any(scenarios) and model_count = 0 and article_count = 0;
+  return refreshed;
+end;
+$$;
@@ -0,0 +1,118 @@
+-- Scenarios whose stored aggregates may be stale because a row left them: a
+-- model or article re-tagged, a model deprecated, a row deleted. The crawler
+-- only knows the scenarios it wrote, so the old ones are recorded here by
+-- trigger and folded into the next refresh_scenario_stats call.
+create table if not exists scenario_stats_dirty (
+  scenario text primary key
+);
+
+create or replace function mark_scenarios_dirty()
+returns trigger
+language plpgsql
+as $$
+begin
+  if tg_table_name = 'models' then
+    insert into scenario_stats_dirty (scenario)
+    select distinct unnest(old.business_scenarios) on conflict do nothing;
+  else
+    insert into scenario_stats_dirty (scenario)
+    select distinct unnest(old.tags) on conflict do nothing;
+  end if;
+  return null;
+end;
+$$;
+
+drop trigger if exists models_scenarios_changed on models;
+create trigger models_scenarios_changed
+after update of business_scenarios, deprecated_at on models
+for each row
+when (
+  old.business_scenarios is distinct from new.business_scenarios
+  or old.deprecated_at is distinct from new.deprecated_at
+)
+execute function mark_scenarios_dirty();
+
+drop trigger if exists models_scenarios_deleted on models;
+create trigger models_scenarios_deleted
+after delete on models
+for each row execute function mark_scenarios_dirty();
+
+drop trigger if exists articles_scenarios_changed on articles;
+create trigger articles_scenarios_changed
+after update of tags on articles
+for each row
+when (old.tags is distinct from new.tags)
+execute function mark_scenarios_dirty();
+
+drop trigger if exists articles_scenarios_deleted on articles;
+create trigger articles_scenarios_deleted
+after delete on articles
+for each row execute function mark_scenarios_dirty();
+
+-- As before, plus every scenario marked dirty since the last refresh.
+create or replace function refresh_scenario_stats(scenarios text[], top_n int default 10, run_id text default null)
+returns int
+language plpgsql
+as $$
+declare
+  touched text[];
+  refreshed int;
+begin
+  touched := array(
+    select distinct scenario from (
+      select unnest(scenarios) as scenario
+      union all
+      select scenario from scenario_stats_dirty
+    ) pending
+  );
+  delete from scenario_stats_dirty where scenario = any(touched);
+
+  insert into scenario_stats (
+    scenario, model_count, article_count, top_model_ids, top_article_ids,
+    latest_model_at, latest_article_at, crawl_run_id, updated_at
+  )
+  select
+    target.scenario,
+    model_totals.total,
+    article_totals.total,
+    array(
+      select m.id from models m
+      where m.business_scenarios @> array[target.scenario] and m.deprecated_at is null
+      order by m.updated_at desc
+      limit top_n
+    ),
+    array(
+      select a.id from articles a
+      where a.tags @> array[target.scenario]
+      order by a.published_at desc nulls last, a.created_at desc
+      limit top_n
+    ),
+    model_totals.latest,
+    article_totals.latest,
+    run_id,
+    now()
+  from unnest(touched) as target(scenario)
+  cross join lateral (
+    select count(*)::int as total, max(m.updated_at) as latest from models m
+    where m.business_scenarios @> array[target.scenario] and m.deprecated_at is null
+  ) model_totals
+  cross join lateral (
+    select count(*)::int as total, max(a.published_at) as latest from articles a
+    where a.tags @> array[target.scenario]
+  ) article_totals
+  on conflict (scenario) do update set
+    model_count = excluded.model_count,
+    article_count = excluded.article_count,
+    top_model_ids = excluded.top_model_ids,
+    top_article_ids = excluded.top_article_ids,
+    latest_model_at = excluded.latest_model_at,
+    latest_article_at = excluded.latest_article_at,
+    crawl_run_id = excluded.crawl_run_id,
+    updated_at = excluded.updated_at;
+  get diagnostics refreshed = row_count;
+
+  delete from scenario_stats
+  where scenario = any(touched) and model_count = 0 and article_count = 0;
+  return refreshed;
+end;
+$$;